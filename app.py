@@ -1,11 +1,19 @@
-import streamlit as st
-import joblib
-import pandas as pd
+import os
 import time
-from pathlib import Path
+import uuid
 
-from utils.data_processor import get_product_insights
-from utils.llm_chains import run_regret_chain
+from utils.evidence import EvidenceProgress, iter_progress, start_evidence, start_prefetch, wait_for_evidence
+from utils.feature_store import default_user_id, get_feature_store, user_features
+from utils.features import get_transformer
+from utils.import_budget import timed_import
+from utils.model_loader import load_model_bundle
+from utils.score_grid import load_score_grid
+from utils.surrogate import guarded_predict, load_surrogate, near_edge
+from utils.tracing import new_trace, prometheus_text, span, trace_spans
+
+# Heavy libraries go through timed_import so each view only pays for what it needs
+# (sklearn and cohere are never imported just to render the home screen).
+st = timed_import("streamlit")
 
 # 1. NATIVE MOBILE APP STYLING (The "Revolut" Skin)
 st.set_page_config(page_title="Regret Guard • Revolut", layout="centered", initial_sidebar_state="collapsed")
@@ -198,52 +206,81 @@ st.markdown("""
     </style>
     """, unsafe_allow_html=True)
 
-# 2. LOAD THE "BRAIN" (or build a fallback for Streamlit Cloud / missing file)
-def _make_fallback_bundle():
-    """Build a minimal in-memory model so the app runs without data/regret_bundle.pkl (e.g. on Streamlit Cloud)."""
-    import numpy as np
-    from sklearn.ensemble import RandomForestRegressor
-    # Match feature names and order expected by the app when building inputs
-    features = [
-        "price", "account_balance", "mood_score", "is_limited_offer", "sleep_hours",
-        "category_risk", "relative_price", "impulsivity_index",
-    ]
-    np.random.seed(42)
-    n = 200
-    price = np.random.uniform(10, 200, n)
-    account_balance = np.full(n, 2840.50) + np.random.uniform(-500, 500, n)
-    mood_score = np.random.randint(1, 11, n)
-    is_limited_offer = np.random.randint(0, 2, n)
-    sleep_hours = np.random.uniform(3, 11, n)
-    category_risk = np.random.choice([0.05, 0.15, 0.25, 0.30, 0.55], n)
-    relative_price = price / np.maximum(account_balance, 1)
-    impulsivity_index = (11 - mood_score) * 0.3 + (11 - sleep_hours) * 0.3 + (is_limited_offer * 1.5)
-    # Synthetic regret_score: higher when impulsivity/relative price high
-    regret_score = np.clip(
-        impulsivity_index * 3 + relative_price * 50 + np.random.normal(0, 5, n), 0, 100
-    )
-    X = pd.DataFrame({
-        "price": price, "account_balance": account_balance, "mood_score": mood_score,
-        "is_limited_offer": is_limited_offer, "sleep_hours": sleep_hours,
-        "category_risk": category_risk, "relative_price": relative_price,
-        "impulsivity_index": impulsivity_index,
-    })
-    y = regret_score
-    model = RandomForestRegressor(n_estimators=50, random_state=42)
-    model.fit(X, y)
-    return {"model": model, "features": features, "mae": 0.0}
-
-bundle_path = Path("data/regret_bundle.pkl")
-if bundle_path.exists():
+# 2. LOAD THE "BRAIN" (once per process, shared by every rerun and session)
+# Prefers data/regret_forest.npz (no sklearn import), then data/regret_bundle.pkl, then the
+# fallback prebuilt by `python train_model.py --fallback` for Streamlit Cloud / missing file.
+@st.cache_resource(show_spinner=False)
+def _load_model_bundle():
+    bundle = load_model_bundle()
+    bundle["transformer"] = get_transformer(bundle)
+    # Distilled single tree for the instant score (None if absent or from another forest)
+    bundle["surrogate"] = load_surrogate(bundle)
+    # Precomputed scores over the slider inputs (None if absent or from another forest)
+    bundle["grid"] = load_score_grid(bundle)
+    return bundle
+
+
+def _record_decision(kind, amount, regret_score):
+    """Append a purchase/stop to the feature store; a store failure never blocks the checkout."""
+    store = get_feature_store()
+    if store is None:
+        return
     try:
-        bundle = joblib.load(bundle_path)
-        model, features = bundle["model"], bundle["features"]
+        store.record(st.session_state.user_id, kind, amount, regret_score)
     except Exception:
-        bundle = _make_fallback_bundle()
-        model, features = bundle["model"], bundle["features"]
-else:
-    bundle = _make_fallback_bundle()
-    model, features = bundle["model"], bundle["features"]
+        pass
+
+
+def _grid_score(bundle, slider_values):
+    """Score from the precomputed grid, or None off the grid or too close to a 20/40 band edge."""
+    grid = bundle.get("grid")
+    if grid is None:
+        return None
+    score = grid.lookup(**slider_values)
+    if score is None or near_edge(score, grid.meta["margin"])[0]:
+        return None
+    return score
+
+# Verdict for a purchase from an overdrawn account: top of the high band, no model call
+OVERDRAWN_SCORE = 100.0
+
+# Optional deliberate pause before the verdict (behavioral friction); off by default.
+FRICTION_SECONDS = float(os.getenv("REGRET_GUARD_FRICTION_SECONDS", "0"))
+# Per-step latency trace under the evaluator (REGRET_GUARD_DEBUG_PANEL=1)
+DEBUG_PANEL = os.getenv("REGRET_GUARD_DEBUG_PANEL", "0").strip().lower() in ("1", "true", "yes", "on")
+
+
+def _reset_evidence_state():
+    st.session_state.rag_regret_probability = None
+    st.session_state.rag_core_failure_points = ""
+    st.session_state.rag_counter_argument = ""
+    st.session_state.rag_raw_reviews = []
+    st.session_state.rag_matched_query = ""
+    st.session_state.rag_rating_band = "1-2"
+    st.session_state.rag_empty_reason = None
+    st.session_state.rag_chain_mode = None
+    st.session_state.rag_error = None
+
+
+def _apply_evidence(result, product_query):
+    """Copy a finished evidence result (utils/evidence.py) into session state."""
+    insights = result.get("insights") or {}
+    complaints_text = insights.get("complaints_text", "")
+    if not complaints_text.strip():
+        st.session_state.rag_empty_reason = insights.get("empty_reason")
+    else:
+        # Store review data first so we can show it even if the chain fails
+        st.session_state.rag_raw_reviews = insights.get("raw_reviews", [])
+        st.session_state.rag_matched_query = insights.get("matched_query", product_query)
+        st.session_state.rag_rating_band = insights.get("rating_band") or "1-2"
+        st.session_state.rag_complaints_text = complaints_text  # for fallback snippet
+    chain_result = result.get("chain") or {}
+    st.session_state.rag_regret_probability = chain_result.get("regret_probability")
+    st.session_state.rag_core_failure_points = chain_result.get("core_failure_points", "")
+    st.session_state.rag_counter_argument = chain_result.get("counter_argument", "")
+    st.session_state.rag_chain_mode = chain_result.get("chain_mode")
+    st.session_state.rag_error = result.get("error")
+
 
 # 3. STATE CONTROLLER (simple state machine)
 if "ui_state" not in st.session_state:
@@ -258,6 +295,9 @@ if "current_item" not in st.session_state:
         "category_risk": 0.25,
         "suggested_price": 59.99,
     }
+if "user_id" not in st.session_state:
+    st.session_state.user_id = default_user_id()
+    st.session_state.user_features = None
 if "last_outcome" not in st.session_state:
     st.session_state.last_outcome = None
 if "rag_regret_probability" not in st.session_state:
@@ -268,6 +308,17 @@ if "rag_regret_probability" not in st.session_state:
     st.session_state.rag_matched_query = ""
     st.session_state.rag_rating_band = "1-2"  # "1-2", "1-3", or "2-3"
     st.session_state.rag_empty_reason = None
+    st.session_state.rag_chain_mode = None
+    st.session_state.rag_error = None
+if "evidence_future" not in st.session_state:
+    st.session_state.evidence_future = None
+    st.session_state.evidence_prefetch = None
+    st.session_state.evidence_progress = None
+    st.session_state.evidence_prefetch_query = None
+    st.session_state.trace_ids = {}
+if "chain_mode" not in st.session_state:
+    # Sticky per session, so an A/B split (REGRET_GUARD_CHAIN_MODE=ab) stays consistent
+    st.session_state.chain_mode = timed_import("utils.llm_chains").chain_mode_for(uuid.uuid4().hex)
 
 # Phone frame wrapper (all views live inside)
 st.markdown('<div class="phone-shell">', unsafe_allow_html=True)
@@ -291,14 +342,14 @@ st.markdown(
 
 # --- VIEW 1: PREMIUM HOME / SIMULATION DASHBOARD ---
 if st.session_state.ui_state == "home":
-    # Hero Card
+    # Hero Card (balance from the per-user feature store: demo balance minus recorded purchases)
     st.markdown(
-        """
+        f"""
         <div class="rev-card">
             <p style="font-size:11px; text-transform:uppercase; letter-spacing:0.12em; color:#a5b4fc; margin-bottom:4px;">
                 Main account • EUR
             </p>
-            <h1 style="font-size: 32px; margin: 0 0 2px 0;">€ 2,840.50</h1>
+            <h1 style="font-size: 32px; margin: 0 0 2px 0;">€ {user_features(st.session_state.user_id).account_balance:,.2f}</h1>
             <p style="color:#4ade80; font-size:11px; margin:0;">Regret Guard is <b>on</b> for online checkouts</p>
         </div>
         """,
@@ -404,6 +455,13 @@ elif st.session_state.ui_state == "payment_input":
         st.caption(
             "Default is **earbuds** so you’ll get real Amazon review evidence in the result. Change to *headphones*, *wireless earbuds*, or other product words that appear in your review data."
         )
+        # Review retrieval + the Analyst step only depend on the product, so start
+        # them now in the background while the user fills in the rest of the form.
+        _query_key = product_query.strip().lower()
+        if _query_key and st.session_state.evidence_prefetch_query != _query_key:
+            st.session_state.trace_ids = {"prefetch": new_trace()}
+            st.session_state.evidence_prefetch = start_prefetch(product_query, st.session_state.chain_mode)
+            st.session_state.evidence_prefetch_query = _query_key
         user_reason = st.text_area(
             "Why do you want to buy this?",
             placeholder="Be honest – what is the main reason you want this purchase right now?",
@@ -437,6 +495,20 @@ elif st.session_state.ui_state == "payment_input":
         )
         fomo = st.toggle("", label_visibility="collapsed")
 
+        # Live risk preview from the precomputed grid: no model call on slider reruns
+        preview_grid = _load_model_bundle().get("grid")
+        preview_user = user_features(st.session_state.user_id)
+        if preview_user.overdrawn:
+            preview = OVERDRAWN_SCORE
+        else:
+            preview = preview_grid.lookup(
+                price=price, mood_score=mood, is_limited_offer=int(fomo), sleep_hours=sleep, merchant_risk_score=risk,
+                account_balance=preview_user.model_balance,
+            ) if preview_grid is not None else None
+        if preview is not None:
+            preview_band = "low" if preview <= 20 else "medium" if preview <= 40 else "high"
+            st.caption(f"Live risk preview: ≈{preview:.0f}% ({preview_band})")
+
     # Primary call to action: run the AI check
     st.markdown('<div class="primary-cta">', unsafe_allow_html=True)
     run_clicked = st.button("Run Regret Guard check", type="primary", use_container_width=True)
@@ -445,65 +517,58 @@ elif st.session_state.ui_state == "payment_input":
     back_clicked = st.button("← Back", key="back_from_checkout")
 
     if run_clicked:
-        with st.spinner("Analyzing your situation with the AI model..."):
-            time.sleep(1.5)
-
-            rel_price = price / 2840.50
-            imp_index = (11 - mood) * 0.3 + (11 - sleep) * 0.3 + (int(fomo) * 1.5)
+        if FRICTION_SECONDS > 0:
+            with st.spinner("Analyzing your situation with the AI model..."):
+                time.sleep(FRICTION_SECONDS)
+
+        st.session_state.trace_ids["check"] = new_trace()
+        bundle = _load_model_bundle()
+        with span("features.store_lookup"):
+            # Rolling aggregates for this user: one primary-key lookup, maintained per event
+            st.session_state.user_features = user_features(st.session_state.user_id)
+        slider_values = dict(
+            account_balance=st.session_state.user_features.model_balance,
+            price=price,
+            mood_score=mood,
+            is_limited_offer=int(fomo),
+            sleep_hours=sleep,
+            merchant_risk_score=risk,
+        )
+        if st.session_state.user_features.overdrawn:
+            # The model never saw a negative balance; any purchase now is high risk
+            score = OVERDRAWN_SCORE
+        else:
+            with span("model.grid_lookup"):
+                score = _grid_score(bundle, slider_values)
+        if score is None:
+            with span("features.build"):
+                # Plain float32 row in the bundle's feature order (no per-request DataFrame)
+                inputs = bundle["transformer"].transform_row(**slider_values)
+            with span("model.predict", model_source=bundle.get("source")) as s:
+                # Surrogate unless the score is near the 20/40 band edges, where the full forest decides
+                score, used_forest = guarded_predict(bundle, inputs)
+                s.set(scorer="forest" if used_forest else "surrogate")
+
+        # --- RAG‑light pipeline: runs in the background; the evaluator shows the
+        # ML score right away and fills in the review evidence when it arrives ---
+        _reset_evidence_state()
+        prefetch = st.session_state.evidence_prefetch
+        if prefetch is None or st.session_state.evidence_prefetch_query != product_query.strip().lower():
+            prefetch = start_prefetch(product_query, st.session_state.chain_mode)
+        st.session_state.evidence_progress = EvidenceProgress()
+        st.session_state.evidence_future = start_evidence(
+            prefetch,
+            product_query,
+            user_reason,
+            st.session_state.evidence_progress,
+            st.session_state.chain_mode,
+        )
+        st.session_state.evidence_query = product_query
 
-            inputs = pd.DataFrame(
-                [[price, 2840.50, mood, int(fomo), sleep, risk, rel_price, imp_index]],
-                columns=features,
-            )
-            score = model.predict(inputs)[0]
-
-            # --- RAG‑light pipeline: fetch real complaints and run the LLM chain ---
-            st.session_state.rag_regret_probability = None
-            st.session_state.rag_core_failure_points = ""
-            st.session_state.rag_counter_argument = ""
-            st.session_state.rag_raw_reviews = []
-            st.session_state.rag_matched_query = ""
-            st.session_state.rag_rating_band = "1-2"
-            st.session_state.rag_empty_reason = None
-
-            try:
-                insights = get_product_insights(product_query)
-                complaints_text = insights.get("complaints_text", "")
-                if not complaints_text.strip():
-                    st.session_state.rag_empty_reason = insights.get("empty_reason")
-                if complaints_text.strip():
-                    # Store review data first so we can show it even if the chain fails
-                    st.session_state.rag_raw_reviews = insights.get("raw_reviews", [])
-                    st.session_state.rag_matched_query = insights.get(
-                        "matched_query", product_query
-                    )
-                    st.session_state.rag_rating_band = insights.get("rating_band") or "1-2"
-                    st.session_state.rag_complaints_text = complaints_text  # for fallback snippet
-                    chain_result = run_regret_chain(
-                        product_query=insights.get("matched_query", product_query),
-                        user_reason=user_reason or "No explicit reason provided.",
-                        complaints_text=complaints_text,
-                    )
-                    st.session_state.rag_regret_probability = chain_result.get(
-                        "regret_probability"
-                    )
-                    st.session_state.rag_core_failure_points = chain_result.get(
-                        "core_failure_points", ""
-                    )
-                    st.session_state.rag_counter_argument = chain_result.get(
-                        "counter_argument", ""
-                    )
-            except Exception as e:
-                # Fail gracefully – keep the core ML guard working even if RAG fails.
-                st.warning(
-                    f"Regret Guard evidence lookup is temporarily unavailable ({e}). "
-                    "Core risk score is still shown below."
-                )
-
-            st.session_state.last_score = score
-            st.session_state.last_price = price
-            st.session_state.ui_state = "ai_evaluator"
-            st.rerun()
+        st.session_state.last_score = score
+        st.session_state.last_price = price
+        st.session_state.ui_state = "ai_evaluator"
+        st.rerun()
 
     if back_clicked:
         st.session_state.ui_state = "home"
@@ -530,8 +595,11 @@ elif st.session_state.ui_state == "ai_evaluator":
         score_source_note = "based on your past data"
 
     item = st.session_state.current_item
-    importances = pd.Series(model.feature_importances_, index=features)
-    top_features = ", ".join(importances.sort_values(ascending=False).head(3).index.tolist())
+    bundle = _load_model_bundle()
+    importances = sorted(
+        zip(bundle["model"].feature_importances_, bundle["features"]), reverse=True
+    )
+    top_features = ", ".join(name for _, name in importances[:3])
 
     st.markdown(
         "<div class='step-label'>Step 2 · AI review</div>",
@@ -576,6 +644,19 @@ elif st.session_state.ui_state == "ai_evaluator":
 
     # Build reasoning text: ML factors + optional Cohere/review evidence
     reasoning_ml = f"The behavioral model pays most attention to: <b>{top_features}</b>."
+    history = st.session_state.user_features
+    if history is not None and history.overdrawn:
+        reasoning_ml = (
+            f"Your account is overdrawn (€{history.account_balance:,.2f}), so any further purchase "
+            "is rated high risk regardless of the other factors."
+        )
+    if history is not None and history.n_purchases + history.n_stops > 0:
+        reasoning_ml += (
+            f" Your recent history: €{history.spend_7d:,.2f} across {history.purchases_7d} purchase"
+            f"{'s' if history.purchases_7d != 1 else ''} in the last 7 days ({history.purchases_24h} in the last 24h), "
+            f"{history.n_stops} stopped transaction{'s' if history.n_stops != 1 else ''}"
+            + (f", average regret risk at decision time {history.regret_mean:.0f}%." if history.regret_mean is not None else ".")
+        )
     reasoning_reviews = ""
     raw_reviews = getattr(st.session_state, "rag_raw_reviews", []) or []
     if st.session_state.rag_regret_probability is not None:
@@ -638,6 +719,20 @@ elif st.session_state.ui_state == "ai_evaluator":
     )
 
     # --- RAG‑light visualisation (or why it's missing) ---
+    evidence_pending = st.session_state.evidence_future is not None
+    if evidence_pending:
+        st.markdown(
+            "<div class='step-label' style='margin-top:12px;'>Evidence from similar buyers</div>",
+            unsafe_allow_html=True,
+        )
+        st.caption("Reading real Amazon reviews for this product… the score above will update.")
+        stream_slot = st.empty()  # filled with the streamed Negotiator answer below
+    if st.session_state.rag_error:
+        # Fail gracefully – keep the core ML guard working even if RAG fails.
+        st.warning(
+            f"Regret Guard evidence lookup is temporarily unavailable ({st.session_state.rag_error}). "
+            "Core risk score is still shown above."
+        )
     if getattr(st.session_state, "rag_empty_reason", None):
         st.info(
             "**Review evidence not loaded.** "
@@ -662,6 +757,8 @@ elif st.session_state.ui_state == "ai_evaluator":
             max(st.session_state.rag_regret_probability / 100.0, 0.0), 1.0
         )
         st.progress(progress, text="Evidence‑based regret probability")
+        if st.session_state.rag_chain_mode:
+            st.caption(f"Evidence chain: {st.session_state.rag_chain_mode}")
 
         if st.session_state.rag_core_failure_points:
             st.markdown("**Core failure points from real reviews:**")
@@ -717,6 +814,7 @@ elif st.session_state.ui_state == "ai_evaluator":
     st.markdown("</div>", unsafe_allow_html=True)
 
     if buy_clicked:
+        _record_decision("purchase", st.session_state.last_price, score_for_display)
         st.session_state.last_outcome = {
             "action": "bought",
             "item": item["name"],
@@ -734,6 +832,7 @@ elif st.session_state.ui_state == "ai_evaluator":
                 "Risk": f"{score_for_display:.1f}%",
             }
         )
+        _record_decision("stop", st.session_state.last_price, score_for_display)
         st.toast("Transaction stopped and kept on file.")
         st.session_state.last_outcome = {
             "action": "stopped",
@@ -748,6 +847,48 @@ elif st.session_state.ui_state == "ai_evaluator":
         st.session_state.ui_state = "payment_input"
         st.rerun()
 
+    if DEBUG_PANEL:
+        with st.expander("Latency trace (debug)"):
+            rows = []
+            for label, trace_id in st.session_state.trace_ids.items():
+                for s in trace_spans(trace_id):
+                    rows.append(
+                        {
+                            "trace": label,
+                            "span": s["name"],
+                            "ms": s["duration_ms"],
+                            "cache": {True: "hit", False: "miss"}.get(s.get("cache_hit"), ""),
+                            "prompt_tokens": s.get("prompt_tokens"),
+                            "response_tokens": s.get("response_tokens"),
+                            "error": s["error"] or "",
+                        }
+                    )
+            if rows:
+                st.table(rows)
+            else:
+                st.caption("No spans recorded yet.")
+            st.download_button("Prometheus metrics", prometheus_text(), file_name="regret_guard.prom")
+
+    # Rendered the ML verdict first; now wait for the background evidence and redraw.
+    if evidence_pending:
+        with st.spinner("Gathering review evidence..."):
+            future = st.session_state.evidence_future
+            for snapshot in iter_progress(future, st.session_state.evidence_progress):
+                with stream_slot.container():
+                    if snapshot.get("regret_probability") is not None:
+                        st.write(
+                            "Based on these reviews, Regret Guard estimates a "
+                            f"**{snapshot['regret_probability']:.1f}%** "
+                            "chance that you would feel buyer's remorse."
+                        )
+                    if snapshot.get("counter_argument"):
+                        st.markdown("**Regret Guard's critical counter‑argument:**")
+                        st.info(snapshot["counter_argument"] + " ▌")
+            result = wait_for_evidence(future, timeout=1.0)
+        st.session_state.evidence_future = None
+        _apply_evidence(result, st.session_state.evidence_query)
+        st.rerun()
+
 # --- VIEW 4: TRANSACTION SUMMARY / SUCCESS LAYER ---
 elif st.session_state.ui_state == "success":
     outcome = st.session_state.last_outcome or {}
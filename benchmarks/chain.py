@@ -0,0 +1,85 @@
+"""
+run_regret_chain latency and throughput against the mock LLM backend
+(utils/mock_llm.py), with the response cache off and on.
+"""
+
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List
+
+from benchmarks.common import measure
+
+CONCURRENCY = (1, 8, 32)
+N_PRODUCTS = 20  # distinct complaint sets; repeated requests can hit the cache
+
+
+def _complaints(i: int) -> str:
+    return f"- Product {i % N_PRODUCTS} stopped working after a week.\n- Battery life is far below the advertised hours."
+
+
+def _request(i: int, mode: str) -> None:
+    from utils.llm_chains import run_regret_chain
+
+    run_regret_chain(f"product {i % N_PRODUCTS}", "I want it", _complaints(i), mode=mode)
+
+
+def run(quick: bool = False, profile: str = "fast") -> List[Dict[str, Any]]:
+    tmp = tempfile.mkdtemp(prefix="regret-guard-bench-")
+    saved = {k: os.environ.get(k) for k in (
+        "REGRET_GUARD_LLM_BACKEND", "REGRET_GUARD_MOCK_LLM_PROFILE", "REGRET_GUARD_LLM_CACHE",
+        "REGRET_GUARD_LLM_CACHE_PATH", "REGRET_GUARD_FAILURE_POINTS_PATH", "REGRET_GUARD_TRACING",
+    )}
+    os.environ.update(
+        REGRET_GUARD_LLM_BACKEND="mock",
+        REGRET_GUARD_MOCK_LLM_PROFILE=profile,
+        REGRET_GUARD_LLM_CACHE_PATH=os.path.join(tmp, "llm_cache.sqlite3"),
+        REGRET_GUARD_FAILURE_POINTS_PATH=os.path.join(tmp, "absent.sqlite3"),
+        REGRET_GUARD_TRACING="0",
+    )
+    results: List[Dict[str, Any]] = []
+    n_requests = 40 if quick else 200
+    try:
+        for cache in ("off", "on"):
+            os.environ["REGRET_GUARD_LLM_CACHE"] = "1" if cache == "on" else "0"
+            for mode in ("two-step", "single"):
+                counter = iter(range(10**9))
+                stats = measure(lambda: _request(next(counter), mode), repeat=5 if quick else 20)
+                results.append({
+                    "suite": "chain",
+                    "name": "run_regret_chain.latency",
+                    "params": {"mode": mode, "cache": cache, "profile": profile},
+                    **stats,
+                })
+                for workers in CONCURRENCY:
+                    errors = 0
+
+                    def one(i: int) -> None:
+                        nonlocal errors
+                        try:
+                            _request(i, mode)
+                        except Exception:
+                            errors += 1
+
+                    t0 = time.perf_counter()
+                    with ThreadPoolExecutor(workers) as pool:
+                        list(pool.map(one, range(n_requests)))
+                    elapsed = time.perf_counter() - t0
+                    results.append({
+                        "suite": "chain",
+                        "name": "run_regret_chain.throughput",
+                        "params": {"mode": mode, "cache": cache, "profile": profile, "concurrency": workers},
+                        "unit": "req/s",
+                        "median": n_requests / elapsed,
+                        "rounds": 1,
+                        "requests": n_requests,
+                        "errors": errors,
+                    })
+    finally:
+        for key, value in saved.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+    return results
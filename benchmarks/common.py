@@ -0,0 +1,149 @@
+"""
+Shared helpers for the benchmark suites: timing, environment metadata and
+reproducible synthetic review corpora.
+"""
+
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+DATA_DIR = BASE_DIR / "benchmarks" / ".data"  # generated corpora (gitignored)
+RESULTS_DIR = BASE_DIR / "benchmarks" / "results"
+
+
+def parse_size(text: str) -> int:
+    """'10k' → 10_000, '5M' → 5_000_000."""
+    text = text.strip().lower()
+    scale = {"k": 1_000, "m": 1_000_000}.get(text[-1:], 1)
+    return int(float(text.rstrip("km")) * scale)
+
+
+def format_size(n: int) -> str:
+    if n >= 1_000_000 and n % 1_000_000 == 0:
+        return f"{n // 1_000_000}M"
+    if n >= 1_000 and n % 1_000 == 0:
+        return f"{n // 1_000}k"
+    return str(n)
+
+
+def measure(
+    fn: Callable[[], Any],
+    repeat: int = 5,
+    number: int = 1,
+    warmup: int = 1,
+    min_time_s: float = 0.0,
+) -> Dict[str, float]:
+    """
+    Time `fn` over `repeat` rounds of `number` calls each. Returns per-call times
+    in milliseconds. With `min_time_s`, rounds continue until that much time has
+    been spent (at least `repeat` rounds).
+    """
+    for _ in range(warmup):
+        fn()
+    samples: List[float] = []
+    started = time.perf_counter()
+    while len(samples) < repeat or time.perf_counter() - started < min_time_s:
+        t0 = time.perf_counter()
+        for _ in range(number):
+            fn()
+        samples.append((time.perf_counter() - t0) * 1000.0 / number)
+    samples.sort()
+    return {
+        "unit": "ms",
+        "min": samples[0],
+        "median": statistics.median(samples),
+        "p95": samples[min(len(samples) - 1, int(round(0.95 * (len(samples) - 1))))],
+        "mean": statistics.fmean(samples),
+        "rounds": len(samples),
+        "calls_per_round": number,
+    }
+
+
+def _git(*args: str) -> Optional[str]:
+    try:
+        out = subprocess.run(["git", *args], cwd=BASE_DIR, capture_output=True, text=True, timeout=10)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return (out.stdout.strip() or None) if out.returncode == 0 else None
+
+
+def environment() -> Dict[str, Any]:
+    """What the numbers were measured on, so runs from different versions can be compared."""
+    import pandas as pd
+
+    return {
+        "git_commit": _git("rev-parse", "HEAD"),
+        "git_dirty": bool(_git("status", "--porcelain", "--untracked-files=no")),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+    }
+
+
+_PRODUCTS = np.array([
+    "earbuds", "wireless earbuds", "headphones", "charger", "phone case", "keyboard", "mouse",
+    "monitor", "speaker", "usb cable", "smart watch", "fitness tracker", "tablet", "power bank",
+    "webcam", "microphone", "router", "hard drive", "memory card", "gaming chair",
+])
+_PROBLEMS = np.array([
+    "stopped working after a week", "battery dies within hours", "keeps disconnecting",
+    "arrived broken", "sound is muffled", "cheap plastic that cracked", "does not charge",
+    "nothing like the photos", "customer support never replied", "overheats constantly",
+    "the left side died", "returned it the next day", "way too expensive for this quality",
+])
+_TITLES = np.array([
+    "Waste of money", "Broke quickly", "Very disappointed", "Not as advertised", "Meh",
+    "Returned it", "Do not buy", "Okay for the price", "Stopped working", "Mediocre at best",
+])
+_FILLER = np.array([
+    "I really wanted to like it.", "Bought it as a gift.", "Used it daily for work.",
+    "Second one I ordered.", "Expected much better.", "Packaging was fine.", "",
+])
+
+
+def synthetic_reviews(n_rows: int, seed: int = 0):
+    """A reproducible Amazon-style review corpus (all ratings 1–5) as a DataFrame."""
+    import pandas as pd
+
+    rng = np.random.default_rng(seed)
+    product = _PRODUCTS[rng.integers(0, len(_PRODUCTS), n_rows)]
+    problem = _PROBLEMS[rng.integers(0, len(_PROBLEMS), n_rows)]
+    filler = _FILLER[rng.integers(0, len(_FILLER), n_rows)]
+    text = pd.Series(filler, dtype=object) + " The " + pd.Series(product, dtype=object) + " " + pd.Series(problem, dtype=object) + "."
+    return pd.DataFrame({
+        "Rating": rng.choice([1, 2, 3, 4, 5], size=n_rows, p=[0.25, 0.2, 0.15, 0.15, 0.25]),
+        "Review Title": _TITLES[rng.integers(0, len(_TITLES), n_rows)],
+        "Review Text": text.str.strip(),
+    })
+
+
+def synthetic_reviews_csv(n_rows: int, seed: int = 0) -> Path:
+    """Write (once) and return the CSV for a synthetic corpus of `n_rows` reviews."""
+    path = DATA_DIR / f"reviews_{format_size(n_rows)}_seed{seed}.csv"
+    if not path.exists():
+        DATA_DIR.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(".csv.tmp")
+        synthetic_reviews(n_rows, seed).to_csv(tmp, index=False)
+        tmp.replace(path)
+    return path
+
+
+def peak_rss_mb() -> Optional[float]:
+    """Peak resident set size of this process in MiB (None where unsupported)."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024.0 * 1024.0) if sys.platform == "darwin" else peak / 1024.0
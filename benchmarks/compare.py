@@ -0,0 +1,53 @@
+"""
+Compare two benchmark reports (baseline first) by median.
+
+Usage:
+    python -m benchmarks.compare benchmarks/results/before.json benchmarks/results/after.json
+"""
+
+import argparse
+import json
+from pathlib import Path
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+# Units where larger is better; everything else (ms, MiB) is a cost
+_HIGHER_IS_BETTER = {"req/s", "rows/s"}
+
+
+def _key(result: Dict[str, Any]) -> Tuple[str, str, str]:
+    params = json.dumps(result.get("params", {}), sort_keys=True)
+    return result["suite"], result["name"], params
+
+
+def _load(path: Path) -> Dict[Tuple[str, str, str], Dict[str, Any]]:
+    report = json.loads(path.read_text(encoding="utf-8"))
+    return {_key(r): r for r in report["results"] if "median" in r}
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Compare two benchmark reports.")
+    parser.add_argument("baseline", type=Path)
+    parser.add_argument("candidate", type=Path)
+    parser.add_argument("--threshold", type=float, default=0.10, help="relative change reported as a regression/improvement")
+    args = parser.parse_args(argv)
+
+    before, after = _load(args.baseline), _load(args.candidate)
+    regressions = 0
+    for key in sorted(before.keys() & after.keys()):
+        old, new = before[key]["median"], after[key]["median"]
+        if old <= 0:
+            continue
+        ratio = new / old
+        better = ratio > 1 if before[key]["unit"] in _HIGHER_IS_BETTER else ratio < 1
+        changed = abs(ratio - 1) >= args.threshold
+        verdict = ("faster" if better else "SLOWER") if changed else ""
+        regressions += changed and not better
+        suite, name, params = key
+        print(f"{suite}/{name} {params}: {old:.3f} → {new:.3f} {before[key]['unit']} (x{ratio:.2f}) {verdict}")
+    for key in sorted(before.keys() ^ after.keys()):
+        print(f"{key[0]}/{key[1]} {key[2]}: only in {'baseline' if key in before else 'candidate'}")
+    print(f"Success: {len(before.keys() & after.keys())} compared, {regressions} regressions beyond {args.threshold:.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Cold `_load_reviews` time and peak memory, each measured in a fresh process:
+
+- first_load: no Parquet cache yet (streaming ingest + read + index build);
+- parquet_cache: the cache written by the first load is reused.
+"""
+
+import json
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List, Sequence
+
+from benchmarks.common import BASE_DIR, format_size, peak_rss_mb, synthetic_reviews_csv
+
+
+def _child(csv_path: str) -> None:
+    import os
+
+    import utils.data_processor as dp
+
+    baseline = peak_rss_mb()
+    os.environ["REGRET_GUARD_REVIEWS_CSV"] = csv_path
+    t0 = time.perf_counter()
+    df = dp._load_reviews()
+    elapsed_ms = (time.perf_counter() - t0) * 1000.0
+    print(json.dumps({"ms": elapsed_ms, "rows_kept": int(len(df)), "baseline_rss_mb": baseline, "peak_rss_mb": peak_rss_mb()}))
+
+
+def _measure_in_subprocess(csv_path: str) -> Dict[str, Any]:
+    out = subprocess.run(
+        [sys.executable, "-m", "benchmarks.loading", csv_path],
+        cwd=BASE_DIR,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def run(sizes: Sequence[int], quick: bool = False) -> List[Dict[str, Any]]:
+    import utils.data_processor as dp
+
+    results: List[Dict[str, Any]] = []
+    for n_rows in sizes:
+        csv_path = synthetic_reviews_csv(n_rows)
+        dp._reviews_cache_path(csv_path).unlink(missing_ok=True)
+        for phase in ("first_load", "parquet_cache"):
+            m = _measure_in_subprocess(str(csv_path))
+            results.append({
+                "suite": "loading",
+                "name": f"load_reviews.{phase}",
+                "params": {"corpus": format_size(n_rows), "rows_kept": m["rows_kept"]},
+                "unit": "ms",
+                "median": m["ms"],
+                "rounds": 1,
+                "peak_rss_mb": m["peak_rss_mb"],
+                "load_rss_mb": (m["peak_rss_mb"] - m["baseline_rss_mb"]) if m["peak_rss_mb"] is not None else None,
+            })
+    return results
+
+
+if __name__ == "__main__":
+    _child(sys.argv[1])
@@ -0,0 +1,53 @@
+"""get_product_insights latency on synthetic review corpora of increasing size."""
+
+import os
+import time
+from typing import Any, Dict, List, Sequence
+
+from benchmarks.common import format_size, measure, synthetic_reviews_csv
+
+QUERIES = ("earbuds", "wireless headphones battery", "gaming chair cracked", "zzzz no match")
+RANKINGS = ("keyword", "bm25")  # "semantic" would (re)build the shared embedding index in data/
+
+
+def run(sizes: Sequence[int], quick: bool = False) -> List[Dict[str, Any]]:
+    import utils.data_processor as dp
+
+    results: List[Dict[str, Any]] = []
+    previous = os.environ.get("REGRET_GUARD_REVIEWS_CSV")
+    try:
+        for n_rows in sizes:
+            os.environ["REGRET_GUARD_REVIEWS_CSV"] = str(synthetic_reviews_csv(n_rows))
+            dp._clear_review_caches()
+            t0 = time.perf_counter()
+            df = dp._load_reviews()
+            load_ms = (time.perf_counter() - t0) * 1000.0
+            results.append({
+                "suite": "retrieval",
+                "name": "load_and_index",
+                "params": {"corpus": format_size(n_rows), "rows_kept": int(len(df))},
+                "unit": "ms",
+                "median": load_ms,
+                "rounds": 1,
+            })
+            for ranking in RANKINGS:
+                for query in QUERIES:
+                    # the first bm25 query builds its index; warmup keeps that out of the numbers
+                    stats = measure(
+                        lambda: dp.get_product_insights(query, ranking=ranking),
+                        repeat=3 if quick else 10,
+                        warmup=1,
+                    )
+                    results.append({
+                        "suite": "retrieval",
+                        "name": f"get_product_insights.{ranking}",
+                        "params": {"corpus": format_size(n_rows), "query": query},
+                        **stats,
+                    })
+    finally:
+        if previous is None:
+            os.environ.pop("REGRET_GUARD_REVIEWS_CSV", None)
+        else:
+            os.environ["REGRET_GUARD_REVIEWS_CSV"] = previous
+        dp._clear_review_caches()
+    return results
@@ -0,0 +1,74 @@
+"""
+Run the benchmark suites and write one machine-readable JSON report.
+
+Usage:
+    python -m benchmarks.run                         # all suites, default sizes
+    python -m benchmarks.run --quick                 # fewer rounds, smallest corpus only
+    python -m benchmarks.run --suites scoring chain
+    python -m benchmarks.run --suites retrieval loading --sizes 10k 1M 5M
+    python -m benchmarks.compare benchmarks/results/a.json benchmarks/results/b.json
+"""
+
+import argparse
+import json
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+from benchmarks.common import RESULTS_DIR, environment, format_size, parse_size
+
+SUITES = ("scoring", "retrieval", "loading", "chain")
+DEFAULT_SIZES = ("10k", "100k", "1M")
+
+
+def _run_suite(name: str, sizes: Sequence[int], quick: bool) -> List[Dict[str, Any]]:
+    if name == "scoring":
+        from benchmarks import scoring
+
+        return scoring.run(quick=quick)
+    if name == "retrieval":
+        from benchmarks import retrieval
+
+        return retrieval.run(sizes, quick=quick)
+    if name == "loading":
+        from benchmarks import loading
+
+        return loading.run(sizes, quick=quick)
+    from benchmarks import chain
+
+    return chain.run(quick=quick)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Run the Regret Guard benchmark suites.")
+    parser.add_argument("--suites", nargs="+", choices=SUITES, default=list(SUITES))
+    parser.add_argument("--sizes", nargs="+", help=f"synthetic corpus sizes (default {' '.join(DEFAULT_SIZES)})")
+    parser.add_argument("--quick", action="store_true", help="fewer rounds; only the smallest corpus unless --sizes is given")
+    parser.add_argument("--output", type=Path, help="JSON report path (default benchmarks/results/<time>-<commit>.json)")
+    args = parser.parse_args(argv)
+
+    sizes = [parse_size(s) for s in (args.sizes or (DEFAULT_SIZES[:1] if args.quick else DEFAULT_SIZES))]
+    meta = environment()
+    meta.update(quick=args.quick, sizes=[format_size(n) for n in sizes])
+    results: List[Dict[str, Any]] = []
+    for name in args.suites:
+        t0 = time.perf_counter()
+        suite_results = _run_suite(name, sizes, args.quick)
+        results += suite_results
+        print(f"{name}: {len(suite_results)} results in {time.perf_counter() - t0:.1f}s")
+        for r in suite_results:
+            params = ", ".join(f"{k}={v}" for k, v in r.get("params", {}).items())
+            value = f"{r['median']:.3f} {r['unit']}" if "median" in r else r.get("note", "")
+            print(f"  {r['name']:<42} {params:<60} {value}")
+
+    output = args.output
+    if output is None:
+        stamp = time.strftime("%Y%m%d-%H%M%S", time.gmtime())
+        output = RESULTS_DIR / f"{stamp}-{(meta['git_commit'] or 'nogit')[:8]}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps({"meta": meta, "results": results}, indent=2) + "\n", encoding="utf-8")
+    print(f"Success: {len(results)} results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
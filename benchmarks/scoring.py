@@ -0,0 +1,48 @@
+"""Single-row and batched regret-model prediction for each available model artifact."""
+
+from typing import Any, Dict, List
+
+import numpy as np
+
+from benchmarks.common import BASE_DIR, measure
+from utils.features import DEFAULT_ACCOUNT_BALANCE, get_transformer
+from utils.model_loader import DEFAULT_BUNDLE_PATH, FOREST_PATH, MODEL_DIR, load_bundle, predict_array
+
+BATCH_SIZES = (1_000, 10_000, 100_000)
+
+
+def _random_rows(n: int, seed: int = 0) -> Dict[str, np.ndarray]:
+    rng = np.random.default_rng(seed)
+    return {
+        "price": rng.uniform(5, 400, n),
+        "account_balance": np.full(n, DEFAULT_ACCOUNT_BALANCE),
+        "mood_score": rng.integers(1, 11, n).astype(float),
+        "is_limited_offer": rng.integers(0, 2, n).astype(float),
+        "sleep_hours": rng.uniform(3, 11, n),
+        "merchant_risk_score": rng.choice([0.05, 0.15, 0.25, 0.30, 0.55], n),
+    }
+
+
+def run(quick: bool = False) -> List[Dict[str, Any]]:
+    results: List[Dict[str, Any]] = []
+    artifacts = [("pickle", DEFAULT_BUNDLE_PATH), ("flat_forest", FOREST_PATH), ("model_dir", MODEL_DIR)]
+    for label, rel_path in artifacts:
+        path = BASE_DIR / rel_path
+        if not path.exists():
+            results.append({"suite": "scoring", "name": f"{label}.skipped", "params": {"path": str(rel_path)},
+                            "note": "artifact missing; run python train_model.py"})
+            continue
+        bundle = load_bundle(path)
+        transformer = get_transformer(bundle)
+        model = bundle["model"]
+
+        row = transformer.transform_row(**{k: v[0] for k, v in _random_rows(1).items()})
+        stats = measure(lambda: predict_array(model, row), repeat=20 if quick else 200, warmup=5)
+        results.append({"suite": "scoring", "name": f"{label}.predict_single_row", "params": {}, **stats})
+
+        for batch in BATCH_SIZES[:2] if quick else BATCH_SIZES:
+            X = transformer.transform(_random_rows(batch))
+            stats = measure(lambda: predict_array(model, X), repeat=3 if quick else 7)
+            stats["rows_per_s"] = batch / (stats["median"] / 1000.0)
+            results.append({"suite": "scoring", "name": f"{label}.predict_batch", "params": {"rows": batch}, **stats})
+    return results
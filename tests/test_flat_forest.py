@@ -0,0 +1,34 @@
+import numpy as np
+from sklearn.ensemble import RandomForestRegressor
+
+from utils.flat_forest import FlatForest
+
+
+def _fitted_forest(n_rows=600, n_features=6, seed=0):
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(n_rows, n_features))
+    y = X[:, 0] * 3 - X[:, 1] ** 2 + rng.normal(scale=0.1, size=n_rows)
+    return RandomForestRegressor(n_estimators=25, random_state=seed).fit(X, y), n_features
+
+
+def test_predict_matches_sklearn():
+    model, n_features = _fitted_forest()
+    flat = FlatForest.from_sklearn(model)
+    X = np.random.default_rng(1).normal(scale=2, size=(5000, n_features))
+    np.testing.assert_allclose(flat.predict(X), model.predict(X), rtol=1e-9, atol=1e-9)
+
+
+def test_predict_single_row_and_multiple_blocks():
+    model, n_features = _fitted_forest()
+    flat = FlatForest.from_sklearn(model)
+    X = np.random.default_rng(2).normal(size=(9000, n_features))  # > _BLOCK_ROWS, not a multiple
+    np.testing.assert_allclose(flat.predict(X[0]), model.predict(X[:1]), rtol=1e-9, atol=1e-9)
+    np.testing.assert_allclose(flat.predict(X), model.predict(X), rtol=1e-9, atol=1e-9)
+
+
+def test_save_load_round_trip(tmp_path):
+    model, n_features = _fitted_forest()
+    path = tmp_path / "forest.npz"
+    FlatForest.from_sklearn(model).save(path)
+    X = np.random.default_rng(3).normal(size=(200, n_features))
+    np.testing.assert_allclose(FlatForest.load(path).predict(X), model.predict(X), rtol=1e-9, atol=1e-9)
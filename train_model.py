@@ -2,48 +2,266 @@ import pandas as pd
 from sklearn.ensemble import RandomForestRegressor
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import mean_absolute_error
+import argparse
 import joblib
+import json
+import numpy as np
 import os
+import time
 
-def train_professional_model():
+from utils.features import DEFAULT_ACCOUNT_BALANCE, FEATURES, RegretFeatureTransformer
+from utils.flat_forest import FlatForest
+from utils.model_loader import FALLBACK_PATH, MODEL_DIR
+from utils.model_search import SEARCH_SPACE, format_report, run_search
+from utils.model_store import file_sha256, save_model_dir
+from utils.score_grid import GRID_PATH, build_and_save
+from utils.surrogate import SURROGATE_PATH, distill, save_surrogate
+from utils.training_data import CACHE_DIR, load_training_matrix
+
+DATA_PATH = 'data/transaction_history.csv'
+BUNDLE_PATH = 'data/regret_bundle.pkl'
+SEARCH_REPORT_PATH = 'data/model_search.json'
+
+
+def _holdout_split(n_rows, seed=42):
+    """Row indices of the train/test split for the first `n_rows` rows (reproducible for a given n_rows)."""
+    return train_test_split(np.arange(n_rows), test_size=0.2, random_state=seed)
+
+
+def _previous_bundle(data_path):
+    """
+    The current bundle if it can be grown with new trees: it was trained by this
+    pipeline and the CSV it saw is still an unmodified prefix of `data_path`.
+    """
+    if not os.path.exists(BUNDLE_PATH):
+        return None
+    bundle = joblib.load(BUNDLE_PATH)
+    trained_bytes, trained_sha = bundle.get('training_bytes'), bundle.get('training_data_sha256')
+    if trained_bytes is None or trained_sha is None or not hasattr(bundle['model'], 'warm_start'):
+        return None
+    if os.path.getsize(data_path) < trained_bytes or file_sha256(data_path, limit=trained_bytes) != trained_sha:
+        return None
+    return bundle
+
+
+def _search_hyperparameters(X_train, y_train, n_candidates, n_jobs, latency_budget_ms, mae_tolerance):
+    """Run the hyperparameter search, write its report and return the chosen parameters."""
+    workers = os.cpu_count() if n_jobs is None or n_jobs < 1 else n_jobs
+    report = run_search(
+        X_train, y_train, n_candidates=n_candidates, workers=workers,
+        latency_budget_ms=latency_budget_ms, mae_tolerance=mae_tolerance,
+    )
+    with open(SEARCH_REPORT_PATH, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"Search: {report['meta']['candidates']} candidates in {report['meta']['search_s']:.1f}s "
+          f"on {workers} processes; Pareto frontier (* = chosen):")
+    print(format_report(report))
+    if not report['meta']['within_budget']:
+        print(f"Warning: no candidate met the {latency_budget_ms} ms latency budget; using the fastest one.")
+    return report['candidates'][report['chosen']]['params']
+
+
+def train_professional_model(data_path=DATA_PATH, n_estimators=100, n_jobs=-1, warm_start=False, add_trees=20,
+                             use_feature_cache=True, search_candidates=0, latency_budget_ms=None, mae_tolerance=0.01,
+                             surrogate_depth=10, build_grid=True):
+    """
+    Train (or, with warm_start, grow) the regret forest and export all model artifacts.
+
+    Full training fits `n_estimators` trees on 80% of the CSV using `n_jobs` cores.
+    Warm start keeps the existing trees and fits `add_trees` new ones on the rows
+    appended since the last run only. That needs the CSV to be append-only; if
+    the old rows changed, it falls back to full training.
+
+    With `search_candidates`, the hyperparameters come from a search instead
+    (utils/model_search.py). It picks the fastest forest within
+    `latency_budget_ms` whose MAE is within `mae_tolerance` of the best one.
+    The report is written to data/model_search.json.
+
+    Unless `surrogate_depth` is 0, a single tree of that depth is distilled
+    from the forest for the app's instant first score. With `build_grid`, the
+    forest is also evaluated over the app's slider inputs (utils/score_grid.py).
+    """
     # 1. LOAD RAW DATA
-    data_path = 'data/transaction_history.csv'
     if not os.path.exists(data_path):
         print("Error: CSV not found! Please ensure Step 1 was successful.")
         return
 
-    df = pd.read_csv(data_path)
-    
     # 2. FEATURE ENGINEERING (Preprocessing)
-    # This transforms raw data into 'intelligent' features
-    df['relative_price'] = df['price'] / df['account_balance']
-    df['impulsivity_index'] = (
-        (11 - df['mood_score']) * 0.3 + 
-        (11 - df['sleep_hours']) * 0.3 + 
-        (df['is_limited_offer'] * 1.5)
-    )
+    # The shared transformer turns raw data into 'intelligent' features
+    # (relative_price, impulsivity_index); app.py reuses it from the bundle.
+    # The engineered matrix is cached per CSV hash, so an unchanged CSV is not parsed again.
+    transformer = RegretFeatureTransformer(FEATURES)
+    data_sha256 = file_sha256(data_path)
 
     # 3. PREPARE X AND Y
-    X = df.drop('regret_score', axis=1)
-    y = df['regret_score']
-    
+    started = time.perf_counter()
+    X, y, cache_hit = load_training_matrix(
+        data_path, transformer.features, csv_sha256=data_sha256, cache_dir=CACHE_DIR if use_feature_cache else None,
+    )
+    print(f"Features: {len(y)} rows in {time.perf_counter() - started:.1f}s ({'cached' if cache_hit else 'built'})")
+
+    previous = _previous_bundle(data_path) if warm_start else None
+    if warm_start and previous is None:
+        print("Warm start not possible (no compatible bundle or the CSV was rewritten); training from scratch.")
+
     # 4. TRAIN-TEST SPLIT
-    # This fulfills the 'Accuracy' requirement
-    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+    # This fulfills the 'Accuracy' requirement. New rows get their own 80/20
+    # split; the old rows keep the held-out rows stored in the bundle, so no
+    # row the forest was trained on ever enters the test set.
+    n_old = previous['training_rows'] if previous is not None else 0
+    if previous is not None and len(y) == n_old:
+        print("Success: No new transactions since the last training; model unchanged.")
+        return
+    if previous is not None and 'holdout_rows' in previous:
+        old_test = np.asarray(previous['holdout_rows'], dtype=int)
+    else:  # bundles from before holdout_rows came from one full training run
+        old_test = _holdout_split(n_old)[1] if n_old else np.array([], dtype=int)
+    if len(y) - n_old >= 5:
+        new_train, new_test = _holdout_split(len(y) - n_old)
+    else:  # too few new rows to hold any out
+        new_train, new_test = np.arange(len(y) - n_old), np.array([], dtype=int)
+    test_idx = np.concatenate([old_test, new_test + n_old])
 
     # 5. TRAIN THE EVALUATOR
-    model = RandomForestRegressor(n_estimators=100, random_state=42)
-    model.fit(X_train, y_train)
+    started = time.perf_counter()
+    if previous is not None:
+        model = previous['model']
+        # Keep the fitted trees; fit() only grows the new ones, on the new rows
+        model.set_params(warm_start=True, n_estimators=len(model.estimators_) + add_trees, n_jobs=n_jobs)
+        model.fit(X[new_train + n_old], y[new_train + n_old])
+        print(f"Grew forest by {add_trees} trees on {len(new_train)} new rows in {time.perf_counter() - started:.1f}s")
+    else:
+        params = {'n_estimators': n_estimators}
+        if search_candidates:
+            params = _search_hyperparameters(
+                X[new_train], y[new_train], search_candidates, n_jobs, latency_budget_ms, mae_tolerance,
+            )
+            started = time.perf_counter()
+        model = RandomForestRegressor(**params, random_state=42, n_jobs=n_jobs)
+        model.fit(X[new_train], y[new_train])
+        print(f"Trained {model.n_estimators} trees on {len(new_train)} rows in {time.perf_counter() - started:.1f}s")
+    mae = mean_absolute_error(y[test_idx], model.predict(X[test_idx]))
+    # The app predicts one row at a time; a process-wide n_jobs=-1 would add
+    # thread dispatch overhead to every call.
+    model.set_params(n_jobs=None, warm_start=False)
 
     # 6. EXPORT THE BUNDLE
-    # We save the model and feature names for app.py
+    # We save the model, feature names and the feature transformer for app.py,
+    # plus what warm start needs to recognise the rows it has already seen.
     bundle = {
-        'model': model, 
-        'features': X.columns.tolist(), 
-        'mae': mean_absolute_error(y_test, model.predict(X_test))
+        'model': model,
+        'features': transformer.features,
+        'transformer': transformer,
+        'mae': mae,
+        'training_rows': int(len(y)),
+        'training_bytes': os.path.getsize(data_path),
+        'training_data_sha256': data_sha256,
+        'holdout_rows': np.sort(test_idx).astype(np.int32),
+        'hyperparameters': {k: model.get_params()[k] for k in SEARCH_SPACE},
     }
-    joblib.dump(bundle, 'data/regret_bundle.pkl')
+    joblib.dump(bundle, BUNDLE_PATH)
     print(f"Success: Model trained from CSV. Accuracy (MAE): {bundle['mae']:.2f}")
 
+    # 7. EXPORT THE FLAT FOREST
+    # Same trees as plain NumPy arrays: smaller on disk and scored without sklearn
+    flat = FlatForest.from_sklearn(model)
+    flat.save('data/regret_forest.npz', features=transformer.features, mae=bundle['mae'])
+    print(f"Success: Flat forest exported ({flat.n_estimators} trees, {flat.n_nodes} nodes) to data/regret_forest.npz")
+
+    # 8. EXPORT THE MEMORY-MAPPABLE MODEL DIRECTORY
+    # Uncompressed .npy arrays + meta.json; worker processes share the pages via mmap
+    save_model_dir(
+        flat, MODEL_DIR, features=transformer.features, mae=bundle['mae'],
+        training_data_sha256=data_sha256,
+    )
+    print(f"Success: Versioned model directory written to {MODEL_DIR}")
+
+    # 9. DISTILL THE INSTANT-SCORE SURROGATE
+    # One shallow tree fitted to the forest's predictions; the app uses it unless
+    # the score lands near a 20/40 band edge (utils/surrogate.py)
+    if surrogate_depth:
+        train_idx = np.setdiff1d(np.arange(len(y)), test_idx)
+        surrogate, fidelity = distill(model, X[train_idx], X[test_idx], max_depth=surrogate_depth)
+        save_surrogate(surrogate, transformer.features, fidelity, teacher=flat, path=SURROGATE_PATH)
+        print(
+            f"Success: Surrogate ({fidelity['n_leaves']} leaves) written to {SURROGATE_PATH}. "
+            f"Fidelity: MAE vs forest {fidelity['mae_vs_forest']:.2f}, band agreement "
+            f"{fidelity['band_agreement']:.1%} ({fidelity['guarded_band_agreement']:.1%} with the forest "
+            f"used within {fidelity['margin']:.1f} of a band edge, {fidelity['forest_fallback_rate']:.0%} of rows)"
+        )
+
+    # 10. PRECOMPUTE THE SLIDER SCORE GRID
+    # Forest scores over every mood/risk/FOMO value and quantized sleep/price, for
+    # O(1) lookups and the live risk preview in the app
+    if build_grid:
+        grid = build_and_save(model, transformer.features, GRID_PATH)
+        print(
+            f"Success: Score grid ({grid.scores.size} points) written to {GRID_PATH}. "
+            f"Fidelity: MAE vs forest {grid.meta['mae_vs_forest']:.2f}, band agreement {grid.meta['band_agreement']:.1%}"
+        )
+
+def build_fallback_bundle():
+    """
+    Build the small synthetic model the app uses when data/regret_bundle.pkl is missing
+    (e.g. on Streamlit Cloud). Runs at build time so the app never trains on a request.
+    """
+    # Same feature names and order as the real model (shared transformer)
+    transformer = RegretFeatureTransformer(FEATURES)
+    np.random.seed(42)
+    n = 200
+    price = np.random.uniform(10, 200, n)
+    account_balance = np.full(n, DEFAULT_ACCOUNT_BALANCE) + np.random.uniform(-500, 500, n)
+    mood_score = np.random.randint(1, 11, n)
+    is_limited_offer = np.random.randint(0, 2, n)
+    sleep_hours = np.random.uniform(3, 11, n)
+    merchant_risk_score = np.random.choice([0.05, 0.15, 0.25, 0.30, 0.55], n)
+    X = transformer.transform({
+        "price": price, "account_balance": account_balance, "mood_score": mood_score,
+        "is_limited_offer": is_limited_offer, "sleep_hours": sleep_hours,
+        "merchant_risk_score": merchant_risk_score,
+    })
+    relative_price = X[:, transformer.features.index("relative_price")]
+    impulsivity_index = X[:, transformer.features.index("impulsivity_index")]
+    # Synthetic regret_score: higher when impulsivity/relative price high
+    y = np.clip(
+        impulsivity_index * 3 + relative_price * 50 + np.random.normal(0, 5, n), 0, 100
+    )
+    model = RandomForestRegressor(n_estimators=50, random_state=42)
+    model.fit(X, y)
+    return {"model": model, "features": transformer.features, "transformer": transformer, "mae": 0.0}
+
+
+def export_fallback_bundle(path=FALLBACK_PATH):
+    """Precompute the fallback model as a flat forest (no sklearn needed to load it)."""
+    bundle = build_fallback_bundle()
+    flat = FlatForest.from_sklearn(bundle["model"])
+    flat.save(path, features=bundle["features"], mae=bundle["mae"])
+    print(f"Success: Fallback model exported ({flat.n_estimators} trees) to {path}")
+
+
 if __name__ == "__main__":
-    train_professional_model()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Train the Regret Guard model and export its artifacts.")
+    parser.add_argument("--fallback", action="store_true", help="only export the small synthetic fallback model")
+    parser.add_argument("--data", default=DATA_PATH, help="transaction history CSV")
+    parser.add_argument("--trees", type=int, default=100, help="number of trees for full training")
+    parser.add_argument("--n-jobs", type=int, default=-1, help="cores used for fitting (-1 = all)")
+    parser.add_argument("--warm-start", action="store_true", help="grow the existing forest on rows appended since the last run")
+    parser.add_argument("--add-trees", type=int, default=20, help="trees added per warm-start run")
+    parser.add_argument("--no-feature-cache", action="store_true", help="always re-parse the CSV and rebuild features")
+    parser.add_argument("--search", type=int, default=0, metavar="N",
+                        help="search N hyperparameter candidates instead of using --trees")
+    parser.add_argument("--latency-budget-ms", type=float, help="single-row prediction budget for --search")
+    parser.add_argument("--mae-tolerance", type=float, default=0.01,
+                        help="relative MAE loss accepted for a faster/smaller forest (--search)")
+    parser.add_argument("--surrogate-depth", type=int, default=10, help="depth of the distilled surrogate tree (0 = skip)")
+    parser.add_argument("--no-grid", action="store_true", help="skip precomputing the slider score grid")
+    args = parser.parse_args()
+    if args.fallback:
+        export_fallback_bundle()
+    else:
+        train_professional_model(
+            args.data, n_estimators=args.trees, n_jobs=args.n_jobs, warm_start=args.warm_start,
+            add_trees=args.add_trees, use_feature_cache=not args.no_feature_cache,
+            search_candidates=args.search, latency_budget_ms=args.latency_budget_ms, mae_tolerance=args.mae_tolerance,
+            surrogate_depth=args.surrogate_depth, build_grid=not args.no_grid,
+        )
@@ -0,0 +1,118 @@
+"""
+Headless batch scoring for Regret Guard.
+
+Scores whole transaction files (shaped like data/transaction_history.csv) with the
+trained RandomForest from data/regret_bundle.pkl, without going through the
+Streamlit UI. Input is read in chunks, engineered features are computed
+vectorized by the shared utils.features transformer and each chunk is scored
+with a single `predict` call on a NumPy array.
+
+Usage:
+    python -m utils.batch_scoring data/transaction_history.csv data/scored.csv
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from utils.features import get_transformer
+from utils.model_loader import DEFAULT_BUNDLE_PATH, load_bundle, predict_array
+
+DEFAULT_CHUNK_SIZE = 250_000
+SCORE_COLUMN = "predicted_regret_score"
+
+
+def score_frame(df: pd.DataFrame, bundle: Dict[str, object]) -> np.ndarray:
+    """Score every row of a transactions DataFrame and return the predictions."""
+    X = get_transformer(bundle).transform(df)
+    return predict_array(bundle["model"], X)
+
+
+def _iter_chunks(input_path: Path, chunk_size: int) -> Iterator[pd.DataFrame]:
+    if input_path.suffix.lower() in (".parquet", ".pq"):
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            # Without pyarrow's batch reader, fall back to a whole-file read.
+            df = pd.read_parquet(input_path)
+            for start in range(0, len(df), chunk_size):
+                yield df.iloc[start : start + chunk_size]
+            return
+        for batch in pq.ParquetFile(input_path).iter_batches(batch_size=chunk_size):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(input_path, chunksize=chunk_size)
+
+
+def iter_scored_chunks(
+    input_path: Path, bundle: Dict[str, object], chunk_size: int = DEFAULT_CHUNK_SIZE
+) -> Iterator[pd.DataFrame]:
+    """Yield the input in chunks of `chunk_size` rows with a predicted_regret_score column."""
+    transformer = get_transformer(bundle)
+    for chunk in _iter_chunks(Path(input_path), chunk_size):
+        X = transformer.transform(chunk)
+        chunk[SCORE_COLUMN] = predict_array(bundle["model"], X)
+        yield chunk
+
+
+def score_file(
+    input_path: Path,
+    output_path: Path,
+    bundle_path: Path = DEFAULT_BUNDLE_PATH,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> int:
+    """
+    Score a CSV/Parquet file of transactions and write the result to `output_path`
+    (CSV or Parquet, chosen by extension). Returns the number of rows scored.
+    """
+    bundle = load_bundle(bundle_path)
+    output_path = Path(output_path)
+    to_parquet = output_path.suffix.lower() in (".parquet", ".pq")
+    writer = None
+    n_rows = 0
+    try:
+        for i, chunk in enumerate(iter_scored_chunks(input_path, bundle, chunk_size)):
+            if to_parquet:
+                import pyarrow as pa
+                import pyarrow.parquet as pq
+
+                table = pa.Table.from_pandas(chunk, preserve_index=False)
+                if writer is None:
+                    writer = pq.ParquetWriter(output_path, table.schema)
+                writer.write_table(table)
+            else:
+                chunk.to_csv(output_path, mode="w" if i == 0 else "a", header=i == 0, index=False)
+            n_rows += len(chunk)
+    finally:
+        if writer is not None:
+            writer.close()
+    return n_rows
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Batch-score transactions with the Regret Guard model.")
+    parser.add_argument("input", type=Path, help="CSV or Parquet file shaped like data/transaction_history.csv")
+    parser.add_argument("output", type=Path, help="Where to write the scored rows (.csv or .parquet)")
+    parser.add_argument("--bundle", type=Path, default=DEFAULT_BUNDLE_PATH, help="Model bundle to score with")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="Rows per predict call")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    try:
+        n_rows = score_file(args.input, args.output, args.bundle, args.chunk_size)
+    except (FileNotFoundError, KeyError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    elapsed = time.perf_counter() - start
+    rate = n_rows / elapsed if elapsed > 0 else float("inf")
+    print(f"Success: scored {n_rows} rows in {elapsed:.2f}s ({rate:,.0f} rows/s) -> {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,11 +1,28 @@
+import os
+import re
 import textwrap
+import threading
+from dataclasses import dataclass, field
 from pathlib import Path
 from typing import Dict, List, Optional
 
+import numpy as np
 import pandas as pd
 
+from utils.tracing import span, traced
+
 
 _REVIEWS_CACHE: Optional[pd.DataFrame] = None
+_REVIEW_INDEX: Optional["_InvertedIndex"] = None  # built alongside _REVIEWS_CACHE
+_BM25_INDEX: Optional["_BM25Index"] = None  # built on the first ranking="bm25" query
+_EMBEDDING_INDEX = None  # utils.embeddings.EmbeddingIndex, opened on the first ranking="semantic" query
+_EMBEDDING_BUILD: Optional[threading.Thread] = None  # background build of a missing/stale index
+_EMBEDDING_LOCK = threading.Lock()
+# Held while the corpus loads, so concurrent first queries wait for one load
+# instead of each parsing the CSV and building the indexes
+_REVIEWS_LOCK = threading.Lock()
+
+RANKING_MODES = ("keyword", "bm25", "semantic")
 _LOAD_ERROR: Optional[str] = None  # Hint when file missing/empty/wrong shape
 
 # Embedded fallback for Streamlit Cloud / no CSV in repo (data/*.csv is gitignored)
@@ -29,7 +46,10 @@ _EMBEDDED_REVIEWS = pd.DataFrame({
 
 
 def _find_reviews_csv(base_dir: Path) -> Path:
-    """Try amazon_reviews.csv then amazon_Reviews.csv (case variants)."""
+    """REGRET_GUARD_REVIEWS_CSV if set, else amazon_reviews.csv then amazon_Reviews.csv (case variants)."""
+    override = os.getenv("REGRET_GUARD_REVIEWS_CSV")
+    if override:
+        return Path(override)
     for name in ("amazon_reviews.csv", "amazon_Reviews.csv"):
         p = base_dir / "data" / name
         if p.exists():
@@ -53,15 +73,134 @@ def _normalize_columns(df: pd.DataFrame) -> pd.DataFrame:
     return df
 
 
+def _rating_values(rating: pd.Series) -> pd.Series:
+    """Rating as a float 1–5 from numbers or "Rated X out of 5 stars" strings."""
+    raw = rating.astype(str)
+    numeric = raw.str.extract(r"Rated\s+(\d)\s+out", expand=False).astype(float)
+    # Try plain numbers where the "Rated X out of 5" pattern did not match
+    plain = pd.to_numeric(raw.replace("", float("nan")), errors="coerce")
+    return numeric.fillna(plain).clip(1, 5)
+
+
+def _lower_haystack(df: pd.DataFrame) -> pd.Series:
+    """Lower-cased "title text" per review (positional index), built on demand."""
+    return pd.Series(
+        (df["Review Title"].astype(str) + " " + df["Review Text"].astype(str)).str.lower().to_numpy(),
+        dtype=object,
+    )
+
+
+def _reviews_cache_path(csv_path: Path) -> Path:
+    return csv_path.with_suffix(".parquet")
+
+
+def _source_stamp(csv_path: Path) -> Dict[str, str]:
+    stat = csv_path.stat()
+    return {"source_size": str(stat.st_size), "source_mtime_ns": str(stat.st_mtime_ns)}
+
+
+def ingest_reviews_csv(
+    csv_path: Path, cache_path: Optional[Path] = None, chunk_size: int = 200_000
+) -> Path:
+    """
+    Stream a (large) reviews CSV into a compact Parquet cache.
+
+    Reads only the Rating / Review Title / Review Text columns, `chunk_size` rows
+    at a time, normalizes "Rated X out of 5 stars" per chunk and keeps only the
+    1–3★ rows used for complaint evidence, so the full file is never in memory.
+    Requires pyarrow.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    csv_path = Path(csv_path)
+    cache_path = Path(cache_path) if cache_path is not None else _reviews_cache_path(csv_path)
+    header = _normalize_columns(pd.read_csv(csv_path, nrows=0))
+    wanted = {"Rating", "Review Title", "Review Text"}
+    if not wanted.issubset(header.columns):
+        raise ValueError(f"CSV must have columns: Rating, Review Title, Review Text. Found: {list(header.columns)}.")
+    original = pd.read_csv(csv_path, nrows=0).columns
+    usecols = [orig for orig, norm in zip(original, header.columns) if norm in wanted]
+
+    schema = pa.schema(
+        [("Rating", pa.float32()), ("Review Title", pa.string()), ("Review Text", pa.string())],
+        metadata=_source_stamp(csv_path),
+    )
+    # Per-process name: concurrent ingests (several app workers on a cold cache)
+    # each write their own file and the last rename wins
+    tmp_path = cache_path.with_name(f".{cache_path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        with pq.ParquetWriter(tmp_path, schema, compression="zstd") as writer:
+            for chunk in pd.read_csv(csv_path, usecols=usecols, dtype=str, chunksize=chunk_size):
+                chunk = _normalize_columns(chunk)
+                rating = _rating_values(chunk["Rating"])
+                keep = rating.between(1, 3)
+                out = pd.DataFrame({
+                    "Rating": rating[keep].astype("float32"),
+                    "Review Title": chunk.loc[keep, "Review Title"].fillna("").astype(str),
+                    "Review Text": chunk.loc[keep, "Review Text"].fillna("").astype(str),
+                })
+                writer.write_table(pa.Table.from_pandas(out, schema=schema, preserve_index=False))
+        tmp_path.replace(cache_path)
+    finally:
+        tmp_path.unlink(missing_ok=True)
+    return cache_path
+
+
+def _load_reviews_cache(csv_path: Path) -> Optional[pd.DataFrame]:
+    """
+    Load the Parquet cache for `csv_path`, (re)building it by streaming ingest if it
+    is missing or older than the CSV. Returns None when pyarrow is unavailable or
+    anything goes wrong, so the caller falls back to a plain read_csv.
+    """
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        return None
+    cache_path = _reviews_cache_path(csv_path)
+    try:
+        stale = True
+        if cache_path.exists():
+            metadata = pq.read_schema(cache_path).metadata or {}
+            stamp = {k.decode(): v.decode() for k, v in metadata.items() if k.decode().startswith("source_")}
+            stale = stamp != _source_stamp(csv_path)
+        if stale:
+            ingest_reviews_csv(csv_path, cache_path)
+        return pd.read_parquet(cache_path)
+    except Exception:
+        return None
+
+
 def _load_reviews() -> pd.DataFrame:
     """
     Lazy-load and cache the amazon_reviews.csv file.
     Tries amazon_reviews.csv and amazon_Reviews.csv. Handles empty file and column variants.
     """
-    global _REVIEWS_CACHE, _LOAD_ERROR
+    with span("reviews.load", cache_hit=_REVIEWS_CACHE is not None) as s:
+        df = _read_reviews()
+        s.set(rows=int(len(df)))
+    return df
+
+
+def _clear_review_caches() -> None:
+    """Forget the loaded corpus and its indexes (the next query reloads the CSV)."""
+    global _REVIEWS_CACHE, _REVIEW_INDEX, _BM25_INDEX, _EMBEDDING_INDEX
+    with _REVIEWS_LOCK:
+        _REVIEWS_CACHE = _REVIEW_INDEX = _BM25_INDEX = _EMBEDDING_INDEX = None
+
+
+def _read_reviews() -> pd.DataFrame:
+    if _REVIEWS_CACHE is not None:  # _LOAD_ERROR still describes this load
+        return _REVIEWS_CACHE
+    with _REVIEWS_LOCK:
+        return _read_reviews_locked()
+
+
+def _read_reviews_locked() -> pd.DataFrame:
+    global _REVIEWS_CACHE, _REVIEW_INDEX, _BM25_INDEX, _EMBEDDING_INDEX, _LOAD_ERROR
     _LOAD_ERROR = None
 
-    if _REVIEWS_CACHE is not None:
+    if _REVIEWS_CACHE is not None:  # another thread loaded it while we waited
         return _REVIEWS_CACHE
 
     base_dir = Path(__file__).resolve().parents[1]
@@ -86,9 +225,18 @@ def _load_reviews() -> pd.DataFrame:
             return _REVIEWS_CACHE
 
     else:
-        # Main CSV path exists; load it (or fall back to sample / embedded on read error or empty)
+        # Main CSV path exists; prefer the compact Parquet cache built by streaming ingest,
+        # else load it directly (or fall back to sample / embedded on read error or empty)
         try:
-            df = pd.read_csv(csv_path)
+            df = _load_reviews_cache(csv_path)
+            if df is not None and df.empty and not pd.read_csv(csv_path, nrows=1).empty:
+                # The cache keeps only 1–3★ rows: the CSV loaded fine but has no
+                # low-rated reviews. Never substitute the sample / embedded data.
+                _LOAD_ERROR = "No 1–2★ or 2–3★ reviews in the file. Add rows with Rating 1, 2, or 3."
+                _REVIEWS_CACHE = pd.DataFrame()
+                return _REVIEWS_CACHE
+            if df is None:
+                df = pd.read_csv(csv_path)
         except Exception as e:
             err = str(e).strip().lower()
             sample_path = base_dir / "data" / "amazon_reviews_sample.csv"
@@ -134,33 +282,212 @@ def _load_reviews() -> pd.DataFrame:
             _REVIEWS_CACHE = pd.DataFrame()
             return _REVIEWS_CACHE
 
-    # Rating: numeric 1–5 or "Rated X out of 5 stars"
-    raw = df["Rating"].astype(str)
-    numeric = raw.str.extract(r"Rated\s+(\d)\s+out", expand=False)
-    if numeric.notna().any():
-        df["rating_value"] = numeric.astype(float)
-    else:
-        # Try plain numbers
-        df["rating_value"] = pd.to_numeric(raw.replace("", float("nan")), errors="coerce")
-    df["rating_value"] = df["rating_value"].clip(1, 5)
-
-    df["review_title_lower"] = df["Review Title"].astype(str).str.lower()
-    df["review_text_lower"] = df["Review Text"].astype(str).str.lower()
+    df["rating_value"] = _rating_values(df["Rating"])
+    # Lower-cased text is only needed while building the search indexes, so it is not
+    # kept as extra columns (that would hold every review string twice).
+    df["review_text_len"] = df["Review Text"].astype(str).str.len()
     _REVIEWS_CACHE = df
+    _REVIEW_INDEX = _build_inverted_index(df)
+    _BM25_INDEX = None
+    _EMBEDDING_INDEX = None
     return _REVIEWS_CACHE
 
 
-def _score_match(row: pd.Series, query_tokens: List[str]) -> int:
+@dataclass
+class _InvertedIndex:
     """
-    Simple keyword match score: counts how many query tokens appear
-    in the concatenated title + text for the row.
+    Whitespace token → posting list of row positions, stored CSR-style.
+
+    Query tokens are matched as substrings of indexed tokens (a query token never
+    contains whitespace, so this is exactly the old `token in haystack` test).
+    Matching vocabulary entries are found with one regex scan over the
+    newline-joined vocabulary instead of one scan per review.
     """
-    haystack = f"{row['review_title_lower']} {row['review_text_lower']}"
-    return sum(1 for token in query_tokens if token in haystack)
+
+    n_rows: int
+    vocab_blob: str  # all tokens joined by "\n"
+    vocab_offsets: np.ndarray  # start offset of each token in vocab_blob
+    indptr: np.ndarray  # postings of token i are rows[indptr[i]:indptr[i + 1]]
+    rows: np.ndarray
+    _token_cache: Dict[str, np.ndarray] = field(default_factory=dict)
+
+    def rows_containing(self, token: str) -> np.ndarray:
+        """Sorted row positions whose title + text contain `token` as a substring."""
+        cached = self._token_cache.get(token)
+        if cached is not None:
+            return cached
+        starts = [m.start() for m in re.finditer(re.escape(token), self.vocab_blob)]
+        if starts:
+            word_ids = np.unique(np.searchsorted(self.vocab_offsets, starts, side="right") - 1)
+            hits = np.unique(
+                np.concatenate([self.rows[self.indptr[w] : self.indptr[w + 1]] for w in word_ids])
+            )
+        else:
+            hits = np.empty(0, dtype=np.int64)
+        self._token_cache[token] = hits
+        return hits
+
+    def match_counts(self, tokens: List[str]) -> np.ndarray:
+        """Per-row count of query tokens that appear in the row's title + text."""
+        counts = np.zeros(self.n_rows, dtype=np.int64)
+        for token in tokens:
+            counts[self.rows_containing(token)] += 1
+        return counts
 
 
+def _whitespace_tokens(haystack: pd.Series):
+    """
+    Split every text on whitespace (like str.split()) and return parallel
+    (row position, token code) arrays plus the token vocabulary. Uses Arrow's
+    vectorized string kernels when pyarrow is installed.
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.compute as pc
+    except ImportError:
+        exploded = haystack.str.split().explode().dropna()
+        codes, vocab = pd.factorize(exploded.to_numpy())
+        return exploded.index.to_numpy(dtype=np.int64), codes, list(vocab)
+    lists = pc.utf8_split_whitespace(pa.array(haystack.to_numpy(), type=pa.large_string()))
+    tokens = pc.list_flatten(lists)
+    parents = pc.list_parent_indices(lists)
+    non_empty = pc.not_equal(pc.utf8_length(tokens), 0)
+    encoded = pc.dictionary_encode(pc.filter(tokens, non_empty))
+    return (
+        pc.filter(parents, non_empty).to_numpy().astype(np.int64),
+        encoded.indices.to_numpy().astype(np.int64),
+        encoded.dictionary.to_pylist(),
+    )
+
+
+def _build_inverted_index(df: pd.DataFrame) -> _InvertedIndex:
+    """Build the token → rows index once, when the reviews are loaded."""
+    row_ids, codes, vocab = _whitespace_tokens(_lower_haystack(df))
+    # Sort by (token, row) and drop repeats of a token within one review
+    order = np.lexsort((row_ids, codes))
+    codes, row_ids = codes[order], row_ids[order]
+    keep = np.ones(len(codes), dtype=bool)
+    keep[1:] = (codes[1:] != codes[:-1]) | (row_ids[1:] != row_ids[:-1])
+    codes, row_ids = codes[keep], row_ids[keep]
+    indptr = np.zeros(len(vocab) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(codes, minlength=len(vocab)), out=indptr[1:])
+    lengths = np.fromiter((len(w) + 1 for w in vocab), dtype=np.int64, count=len(vocab))
+    offsets = np.zeros(len(vocab), dtype=np.int64)
+    if len(vocab):
+        offsets[1:] = np.cumsum(lengths)[:-1]
+    return _InvertedIndex(
+        n_rows=len(df),
+        vocab_blob="\n".join(vocab),
+        vocab_offsets=offsets,
+        indptr=indptr,
+        rows=row_ids,
+    )
+
+
+_WORD_RE = r"\w+"
+
+
+@dataclass
+class _BM25Index:
+    """
+    Okapi BM25 weights for every (review, term) pair as a sparse CSC matrix.
+
+    Scoring a query is one sparse product: the columns of the query terms times
+    the query's term counts, giving a relevance score for every review at once.
+    """
+
+    vocab: Dict[str, int]
+    weights: object  # scipy.sparse.csc_matrix, n_rows × n_terms
+
+    def score(self, query_terms: List[str]) -> np.ndarray:
+        term_ids: Dict[int, float] = {}
+        for term in query_terms:
+            j = self.vocab.get(term)
+            if j is not None:
+                term_ids[j] = term_ids.get(j, 0.0) + 1.0
+        if not term_ids:
+            return np.zeros(self.weights.shape[0])
+        cols = list(term_ids)
+        return np.asarray(self.weights[:, cols] @ np.fromiter(term_ids.values(), dtype=np.float64)).ravel()
+
+
+def _build_bm25_index(df: pd.DataFrame, k1: float = 1.5, b: float = 0.75) -> _BM25Index:
+    """Tokenize lower-cased title + text into words and precompute BM25 term weights."""
+    from scipy import sparse
+
+    exploded = _lower_haystack(df).str.findall(_WORD_RE).explode().dropna()
+    row_ids = exploded.index.to_numpy(dtype=np.int64)
+    codes, vocab = pd.factorize(exploded.to_numpy())
+    n_rows, n_terms = len(df), len(vocab)
+    # Duplicate (row, term) entries are summed into term frequencies
+    tf = sparse.csr_matrix(
+        (np.ones(len(codes), dtype=np.float64), (row_ids, codes)), shape=(n_rows, n_terms)
+    )
+    tf.sum_duplicates()
+    doc_len = np.bincount(row_ids, minlength=n_rows).astype(np.float64)
+    avg_len = doc_len.mean() if n_rows and doc_len.mean() > 0 else 1.0
+    doc_freq = np.bincount(tf.indices, minlength=n_terms)
+    idf = np.log1p((n_rows - doc_freq + 0.5) / (doc_freq + 0.5))
+    # Per-entry BM25: idf * tf * (k1 + 1) / (tf + k1 * (1 - b + b * len / avg_len))
+    norm = np.repeat(k1 * (1 - b + b * doc_len / avg_len), np.diff(tf.indptr))
+    tf.data = idf[tf.indices] * tf.data * (k1 + 1) / (tf.data + norm)
+    return _BM25Index(vocab={w: i for i, w in enumerate(vocab)}, weights=tf.tocsc())
+
+
+def _get_bm25_index(df: pd.DataFrame) -> _BM25Index:
+    global _BM25_INDEX
+    if _BM25_INDEX is None or _BM25_INDEX.weights.shape[0] != len(df):
+        _BM25_INDEX = _build_bm25_index(df)
+    return _BM25_INDEX
+
+
+def _build_embedding_index(df: pd.DataFrame) -> None:
+    global _EMBEDDING_INDEX, _EMBEDDING_BUILD
+    from utils.embeddings import build_index, review_texts
+
+    try:
+        index = build_index(review_texts(df))
+    except Exception:
+        index = None
+    with _EMBEDDING_LOCK:
+        if index is not None and _REVIEWS_CACHE is df:  # corpus not reloaded meanwhile
+            _EMBEDDING_INDEX = index
+        _EMBEDDING_BUILD = None
+
+
+def _get_embedding_index(df: pd.DataFrame):
+    """
+    Open the persisted review embedding index for the cached reviews. If it is
+    missing or stale, start building it in a background thread and return None
+    (the caller ranks with BM25 until the index is ready) rather than embedding
+    the whole corpus inside a request.
+    """
+    global _EMBEDDING_INDEX, _EMBEDDING_BUILD
+    index = _EMBEDDING_INDEX
+    if index is not None and len(index.vectors) == len(df):
+        return index
+    with _EMBEDDING_LOCK:
+        if _EMBEDDING_BUILD is not None:
+            return None
+        from utils.embeddings import corpus_fingerprint, load_index, review_texts
+
+        index = load_index(expected_fingerprint=corpus_fingerprint(review_texts(df)))
+        if index is not None:
+            _EMBEDDING_INDEX = index
+            return index
+        _EMBEDDING_BUILD = threading.Thread(
+            target=_build_embedding_index, args=(df,), name="embedding-index", daemon=True
+        )
+        _EMBEDDING_BUILD.start()
+    return None
+
+
+@traced("retrieval.get_product_insights")
 def get_product_insights(
-    product_query: str, max_reviews: int = 5, min_low_rating_count: int = 3
+    product_query: str,
+    max_reviews: int = 5,
+    min_low_rating_count: int = 3,
+    ranking: str = "keyword",
 ) -> Dict[str, object]:
     """
     Retrieve complaint evidence for a given product/query string.
@@ -168,33 +495,42 @@ def get_product_insights(
     1. Loads amazon_reviews.csv (cached).
     2. Prefers 1–2★ reviews; if there are fewer than min_low_rating_count, also
        includes 3★ reviews for more data. If there are no 1–2★ at all, uses 2–3★.
-    3. Uses simple keyword matching over title + text to find rows
-       most related to the `product_query`.
+    3. Finds the rows most related to the `product_query`:
+       - ranking="keyword" (default): counts matched query tokens over title + text
+         (answered from the inverted index built at load time), ties broken by length.
+       - ranking="bm25": Okapi BM25 relevance over title + text words, computed for
+         every review with one sparse matrix product, ties broken by length.
+       - ranking="semantic": cosine similarity between the query and precomputed
+         review embeddings (utils/embeddings.py), so synonyms match too. While a
+         missing or stale index builds in the background, ranks with BM25.
     4. Returns:
        - matched_query: the original query (for display).
        - complaints_text: concatenated string of the most descriptive complaints.
        - raw_reviews: list of individual complaint texts (for "Real‑World Evidence").
        - rating_band: "1-2", "1-3", or "2-3" (which star band was used).
     """
+    if ranking not in RANKING_MODES:
+        raise ValueError(f"ranking must be one of {RANKING_MODES}, got {ranking!r}")
     query = (product_query or "").strip()
     df = _load_reviews()
     if df.empty or "rating_value" not in df.columns:
         reason = _LOAD_ERROR or "No review data loaded. Add data/amazon_reviews.csv with columns: Rating, Review Title, Review Text."
         return {"matched_query": query, "complaints_text": "", "raw_reviews": [], "empty_reason": reason, "rating_band": None}
 
-    low_12 = df[df["rating_value"].isin([1.0, 2.0])].copy()
-    mid_23 = df[df["rating_value"].isin([2.0, 3.0])].copy()
+    ratings = df["rating_value"].to_numpy()
+    low_12 = np.isin(ratings, [1.0, 2.0])
+    mid_23 = np.isin(ratings, [2.0, 3.0])
 
     # Prefer 1–2★; if not enough, use 1–3★ (add 3★). If no 1–2★ at all, use 2–3★.
-    if len(low_12) >= min_low_rating_count:
-        use_df = low_12
+    if low_12.sum() >= min_low_rating_count:
+        band_mask = low_12
         rating_band = "1-2"
-    elif not low_12.empty:
+    elif low_12.any():
         # Few 1–2★: add 3★ for more data (1–3★ band)
-        use_df = df[df["rating_value"].isin([1.0, 2.0, 3.0])].copy()
+        band_mask = np.isin(ratings, [1.0, 2.0, 3.0])
         rating_band = "1-3"
-    elif not mid_23.empty:
-        use_df = mid_23
+    elif mid_23.any():
+        band_mask = mid_23
         rating_band = "2-3"
     else:
         reason = _LOAD_ERROR or "No 1–2★ or 2–3★ reviews in the file. Add rows with Rating 1, 2, or 3."
@@ -206,25 +542,35 @@ def get_product_insights(
             "rating_band": None,
         }
 
-    if query:
-        tokens = [t for t in query.lower().split() if len(t) > 2]
-        if tokens:
-            use_df["match_score"] = use_df.apply(_score_match, axis=1, query_tokens=tokens)
-            matched = use_df[use_df["match_score"] > 0]
-            if matched.empty:
-                matched = use_df
-        else:
-            matched = use_df
+    band_rows = np.flatnonzero(band_mask)
+    embedding_index = _get_embedding_index(df) if ranking == "semantic" and query else None
+    if ranking == "semantic" and embedding_index is None:
+        ranking = "bm25"  # index still building in the background
+    if embedding_index is not None:
+        # Dense-vector nearest neighbours: catches synonyms keyword matching misses
+        positions = embedding_index.top_k(query, max_reviews, rows=band_rows)
+        top_rows = band_rows[positions]
     else:
-        matched = use_df
-
-    # Rank by match score then by length (most descriptive)
-    matched = matched.copy()
-    matched["text_len"] = matched["Review Text"].astype(str).str.len()
-    matched = matched.sort_values(by=["match_score", "text_len"], ascending=[False, False])
+        match_score = np.zeros(len(band_rows), dtype=np.float64)
+        if ranking == "bm25":
+            tokens = [t for t in re.findall(_WORD_RE, query.lower()) if len(t) > 2]
+        else:
+            tokens = [t for t in query.lower().split() if len(t) > 2]
+        if tokens:
+            if ranking == "bm25":
+                match_score = _get_bm25_index(df).score(tokens)[band_rows]
+            else:
+                # Posting-list lookups instead of a per-row substring test
+                index = _REVIEW_INDEX if _REVIEW_INDEX is not None else _build_inverted_index(df)
+                match_score = index.match_counts(tokens)[band_rows]
+            hit = match_score > 0
+            if hit.any():
+                band_rows, match_score = band_rows[hit], match_score[hit]
 
-    top = matched.head(max_reviews)
-    raw_reviews = top["Review Text"].astype(str).tolist()
+        # Rank by match score then by length (most descriptive); lexsort is stable like sort_values
+        text_len = df["review_text_len"].to_numpy()[band_rows]
+        top_rows = band_rows[np.lexsort((-text_len, -match_score))[:max_reviews]]
+    raw_reviews = df["Review Text"].iloc[top_rows].astype(str).tolist()
 
     complaints_text = "\n\n---\n\n".join(textwrap.fill(r, width=400) for r in raw_reviews)
 
@@ -236,3 +582,11 @@ def get_product_insights(
         "rating_band": rating_band,
     }
 
+
+
+if __name__ == "__main__":
+    import sys
+
+    source = Path(sys.argv[1]) if len(sys.argv) > 1 else _find_reviews_csv(Path(__file__).resolve().parents[1])
+    target = ingest_reviews_csv(source)
+    print(f"Success: 1–3★ reviews from {source} cached in {target}")
@@ -0,0 +1,238 @@
+"""
+Offline dense-vector index for semantic review retrieval.
+
+Reviews are embedded once on the CPU and stored as a float32 .npy matrix that
+later processes memory-map. Two embedders are available, neither needs network
+access at query time:
+
+- "sentence-transformers": a local model (set REGRET_GUARD_EMBEDDING_MODEL to a
+  model name or path already on disk; used only if the package is installed).
+- "hashing-svd" (default): words plus 4-letter word prefixes are hashed into a
+  sparse TF-IDF matrix and reduced with a truncated SVD (latent semantic
+  analysis). Shared prefixes match inflections ("charging" / "charger"), and
+  co-occurrence in the corpus puts "earphones" next to "earbuds".
+
+Queries are answered with a blocked matrix–vector product and argpartition top-k.
+
+Usage (precompute the index offline):
+    python -m utils.embeddings
+"""
+
+import hashlib
+import json
+import os
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+try:
+    from sentence_transformers import SentenceTransformer
+except ImportError:
+    SentenceTransformer = None  # type: ignore[misc, assignment]
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+INDEX_DIR = BASE_DIR / "data" / "review_embeddings"
+EMBEDDING_MODEL_ENV = "REGRET_GUARD_EMBEDDING_MODEL"
+
+HASH_FEATURES = 2 ** 15
+EMBEDDING_DIM = 128
+_BLOCK_ROWS = 65_536
+_WORD_RE = r"\w+"
+
+
+def corpus_fingerprint(texts: pd.Series) -> str:
+    """Stable hash of the review texts, used to invalidate a stale index."""
+    hashed = pd.util.hash_pandas_object(texts.reset_index(drop=True), index=True).to_numpy()
+    return hashlib.sha256(hashed.tobytes()).hexdigest()
+
+
+def _hashed_features(texts: pd.Series) -> Any:
+    """Sparse count matrix of hashed words and word prefixes (rows = texts)."""
+    from scipy import sparse
+
+    words = pd.Series(texts.to_numpy(), dtype=object).str.lower().str.findall(_WORD_RE).explode().dropna()
+    words = words[words.str.len() > 1]
+    prefixes = words[words.str.len() > 4].str[:4].radd("p4:")
+    terms = pd.concat([words, prefixes])
+    rows = terms.index.to_numpy(dtype=np.int64)
+    cols = (pd.util.hash_array(terms.to_numpy(dtype=object)) % HASH_FEATURES).astype(np.int64)
+    counts = sparse.csr_matrix(
+        (np.ones(len(rows), dtype=np.float32), (rows, cols)), shape=(len(texts), HASH_FEATURES)
+    )
+    counts.sum_duplicates()
+    return counts
+
+
+def _normalize_rows(X: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(X, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (X / norms).astype(np.float32)
+
+
+class HashingSVDEmbedder:
+    """TF-IDF over hashed words → truncated SVD (LSA). Fitted on the review corpus."""
+
+    name = "hashing-svd"
+
+    def __init__(self, idf: Optional[np.ndarray] = None, components: Optional[np.ndarray] = None):
+        self.idf = idf
+        self.components = components  # dim × HASH_FEATURES
+
+    def _tfidf(self, texts: pd.Series) -> Any:
+        X = _hashed_features(texts)
+        X.data = np.log1p(X.data) * self.idf[X.indices]
+        return X
+
+    def fit_transform(self, texts: pd.Series, dim: int = EMBEDDING_DIM) -> np.ndarray:
+        from scipy.sparse.linalg import svds
+
+        counts = _hashed_features(texts)
+        doc_freq = np.bincount(counts.indices, minlength=HASH_FEATURES)
+        self.idf = (np.log((1 + len(texts)) / (1 + doc_freq)) + 1.0).astype(np.float32)
+        X = counts
+        X.data = np.log1p(X.data) * self.idf[X.indices]
+        if len(texts) < 2:
+            # svds needs k < min(X.shape): with at most one review there is no
+            # subspace to find, so the single row itself is the only axis.
+            dense = X.toarray() if len(texts) else np.zeros((1, HASH_FEATURES), dtype=np.float32)
+            self.components = _normalize_rows(dense)
+            return _normalize_rows(np.asarray(X @ self.components.T))
+        k = min(dim, min(X.shape) - 1)
+        _, _, vt = svds(X.astype(np.float64), k=k, random_state=0)
+        self.components = vt[::-1].astype(np.float32)
+        return _normalize_rows(np.asarray(X @ self.components.T))
+
+    def encode(self, texts: Sequence[str]) -> np.ndarray:
+        X = self._tfidf(pd.Series(list(texts), dtype=object))
+        return _normalize_rows(np.asarray(X @ self.components.T))
+
+    def save(self, index_dir: Path) -> None:
+        np.save(index_dir / "idf.npy", self.idf)
+        np.save(index_dir / "components.npy", self.components)
+
+    @classmethod
+    def load(cls, index_dir: Path) -> "HashingSVDEmbedder":
+        return cls(np.load(index_dir / "idf.npy"), np.load(index_dir / "components.npy"))
+
+
+class SentenceTransformerEmbedder:
+    """Local sentence-transformers model on the CPU (no download if the model is on disk)."""
+
+    name = "sentence-transformers"
+
+    def __init__(self, model_name: str):
+        self.model_name = model_name
+        self.model = SentenceTransformer(model_name, device="cpu")
+
+    def fit_transform(self, texts: pd.Series, dim: int = EMBEDDING_DIM) -> np.ndarray:
+        return self.encode(texts.tolist())
+
+    def encode(self, texts: Sequence[str]) -> np.ndarray:
+        vectors = self.model.encode(list(texts), batch_size=256, normalize_embeddings=True)
+        return np.asarray(vectors, dtype=np.float32)
+
+    def save(self, index_dir: Path) -> None:
+        pass
+
+
+@dataclass
+class EmbeddingIndex:
+    """Review embeddings (memory-mapped float32, L2-normalized) plus the query embedder."""
+
+    vectors: np.ndarray
+    embedder: Any
+    meta: Dict[str, Any]
+
+    def similarities(self, query: str, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """Cosine similarity of `query` to every review (or to `rows` only)."""
+        q = self.embedder.encode([query])[0]
+        n = len(self.vectors) if rows is None else len(rows)
+        out = np.empty(n, dtype=np.float32)
+        for start in range(0, n, _BLOCK_ROWS):
+            stop = start + _BLOCK_ROWS
+            # Gather one block at a time so a large `rows` never copies the whole band
+            block = self.vectors[start:stop] if rows is None else self.vectors[rows[start:stop]]
+            out[start:stop] = block @ q
+        return out
+
+    def top_k(self, query: str, k: int, rows: Optional[np.ndarray] = None) -> List[int]:
+        """Positions (into `rows` if given, else into the corpus) of the k most similar reviews."""
+        sims = self.similarities(query, rows)
+        if len(sims) == 0:
+            return []
+        k = min(k, len(sims))
+        top = np.argpartition(-sims, k - 1)[:k]
+        return top[np.argsort(-sims[top], kind="stable")].tolist()
+
+
+def _make_embedder() -> Any:
+    model_name = os.getenv(EMBEDDING_MODEL_ENV)
+    if model_name and SentenceTransformer is not None:
+        return SentenceTransformerEmbedder(model_name)
+    return HashingSVDEmbedder()
+
+
+def build_index(texts: pd.Series, index_dir: Path = INDEX_DIR) -> EmbeddingIndex:
+    """Embed every text and persist vectors + embedder state + meta.json to `index_dir`."""
+    index_dir = Path(index_dir)
+    index_dir.mkdir(parents=True, exist_ok=True)
+    embedder = _make_embedder()
+    vectors = embedder.fit_transform(texts)
+    np.save(index_dir / "vectors.npy", vectors)
+    embedder.save(index_dir)
+    meta = {
+        "backend": embedder.name,
+        "model": getattr(embedder, "model_name", None),
+        "corpus_sha256": corpus_fingerprint(texts),
+        "n_rows": int(len(texts)),
+        "dim": int(vectors.shape[1]),
+    }
+    with open(index_dir / "meta.json", "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2)
+    return EmbeddingIndex(np.load(index_dir / "vectors.npy", mmap_mode="r"), embedder, meta)
+
+
+def load_index(index_dir: Path = INDEX_DIR, expected_fingerprint: Optional[str] = None) -> Optional[EmbeddingIndex]:
+    """Open a persisted index, or return None if it is missing, stale or unreadable."""
+    index_dir = Path(index_dir)
+    try:
+        with open(index_dir / "meta.json", encoding="utf-8") as f:
+            meta = json.load(f)
+        if expected_fingerprint is not None and meta.get("corpus_sha256") != expected_fingerprint:
+            return None
+        if meta["backend"] == SentenceTransformerEmbedder.name:
+            if SentenceTransformer is None:
+                return None
+            embedder: Any = SentenceTransformerEmbedder(meta["model"])
+        else:
+            embedder = HashingSVDEmbedder.load(index_dir)
+        vectors = np.load(index_dir / "vectors.npy", mmap_mode="r")
+    except (OSError, KeyError, ValueError):
+        return None
+    return EmbeddingIndex(vectors, embedder, meta)
+
+
+def review_texts(df: pd.DataFrame) -> pd.Series:
+    """The text embedded for each review: title + body."""
+    return df["Review Title"].astype(str) + ". " + df["Review Text"].astype(str)
+
+
+def get_or_build_index(df: pd.DataFrame, index_dir: Path = INDEX_DIR) -> EmbeddingIndex:
+    texts = review_texts(df)
+    fingerprint = corpus_fingerprint(texts)
+    index = load_index(index_dir, expected_fingerprint=fingerprint)
+    return index if index is not None else build_index(texts, index_dir)
+
+
+if __name__ == "__main__":
+    from utils.data_processor import _load_reviews
+
+    reviews = _load_reviews()
+    if reviews.empty:
+        print("Error: no reviews loaded; nothing to embed.")
+    else:
+        idx = get_or_build_index(reviews)
+        print(f"Success: {idx.meta['n_rows']} reviews embedded with {idx.meta['backend']} ({idx.meta['dim']} dims) in {INDEX_DIR}")
@@ -0,0 +1,166 @@
+"""
+Background retrieval + LLM evidence for the checkout flow.
+
+The app shows the ML score immediately and gathers review evidence on a shared
+thread pool:
+
+1. `prefetch_evidence(product_query)` starts as soon as the product query is
+   known (before "Run Regret Guard check" is pressed): review retrieval plus the
+   Analyst step, which only depend on the query.
+2. `complete_evidence(...)` waits for the prefetch and runs the user-specific
+   Negotiator step.
+
+Workers never touch Streamlit session state. They return plain dicts, and
+publish streaming snapshots of the Negotiator's answer through an
+`EvidenceProgress`. The app polls those snapshots and copies the results into
+the session on its own thread.
+"""
+
+import asyncio
+import contextvars
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Any, Dict, Iterator, Optional
+
+RETRIEVAL_TIMEOUT_SECONDS = float(os.getenv("REGRET_GUARD_RETRIEVAL_TIMEOUT_S", "10"))
+
+_EXECUTOR: Optional[ThreadPoolExecutor] = None
+
+
+def evidence_executor() -> ThreadPoolExecutor:
+    """Process-wide pool shared by all sessions."""
+    global _EXECUTOR
+    if _EXECUTOR is None:
+        _EXECUTOR = ThreadPoolExecutor(max_workers=8, thread_name_prefix="regret-evidence")
+    return _EXECUTOR
+
+
+class EvidenceProgress:
+    """Latest streamed chain snapshot, shared between a worker and the app (thread-safe)."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._snapshot: Dict[str, Any] = {}
+        self.version = 0
+
+    def update(self, snapshot: Dict[str, Any]) -> None:
+        with self._lock:
+            self._snapshot = dict(snapshot)
+            self.version += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self._snapshot)
+
+
+def prefetch_evidence(product_query: str, mode: str = "two-step") -> Dict[str, Any]:
+    """Retrieve complaints for the query and, in two-step mode, summarise them (Analyst step)."""
+    from utils.data_processor import get_product_insights
+    from utils.llm_chains import analyst_step_async
+
+    insights = get_product_insights(product_query)
+    result: Dict[str, Any] = {"insights": insights, "core_failure_points": None, "error": None}
+    complaints_text = insights.get("complaints_text", "")
+    if complaints_text.strip() and mode != "single":
+        try:
+            result["core_failure_points"] = asyncio.run(analyst_step_async(complaints_text))
+        except Exception as e:
+            result["error"] = str(e)
+    return result
+
+
+def complete_evidence(
+    prefetch: "Future[Dict[str, Any]]",
+    product_query: str,
+    user_reason: str,
+    progress: Optional[EvidenceProgress] = None,
+    mode: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    Wait for the prefetch, then run the Negotiator step for this user's reason.
+    With `progress`, the Negotiator is streamed and every partial snapshot is
+    published to it. Either way each step runs under its own timeout.
+    """
+    from utils.llm_chains import ANALYST_TIMEOUT_SECONDS, run_regret_chain_async, run_regret_chain_stream_async
+
+    pre = prefetch.result(timeout=RETRIEVAL_TIMEOUT_SECONDS + ANALYST_TIMEOUT_SECONDS)
+    insights = pre["insights"]
+    complaints_text = insights.get("complaints_text", "")
+    result: Dict[str, Any] = {"insights": insights, "chain": None, "error": None}
+    if not complaints_text.strip():
+        return result
+    # If the prefetched Analyst step failed, the chain runs it again.
+    chain_kwargs = dict(
+        product_query=insights.get("matched_query", product_query),
+        user_reason=user_reason or "No explicit reason provided.",
+        complaints_text=complaints_text,
+        core_failure_points=pre["core_failure_points"],
+        mode=mode,
+    )
+    try:
+        if progress is not None:
+            result["chain"] = asyncio.run(run_regret_chain_stream_async(progress.update, **chain_kwargs))
+        else:
+            result["chain"] = asyncio.run(run_regret_chain_async(**chain_kwargs))
+    except Exception as e:
+        result["error"] = str(e)
+    return result
+
+
+def _deadline_seconds() -> float:
+    from utils.llm_chains import ANALYST_TIMEOUT_SECONDS, NEGOTIATOR_TIMEOUT_SECONDS
+
+    return RETRIEVAL_TIMEOUT_SECONDS + ANALYST_TIMEOUT_SECONDS + NEGOTIATOR_TIMEOUT_SECONDS
+
+
+def iter_progress(
+    future: "Future[Dict[str, Any]]", progress: EvidenceProgress, interval: float = 0.1
+) -> Iterator[Dict[str, Any]]:
+    """Yield each new streamed snapshot until the evidence future finishes (or times out)."""
+    deadline = _started_at(future) + _deadline_seconds()
+    seen = 0
+    while not future.done() and time.monotonic() < deadline:
+        if progress.version != seen:
+            seen = progress.version
+            yield progress.snapshot()
+        time.sleep(interval)
+
+
+def wait_for_evidence(future: "Future[Dict[str, Any]]", timeout: Optional[float] = None) -> Dict[str, Any]:
+    """Block until the evidence is ready; never raises (errors land in "error")."""
+    try:
+        return future.result(timeout=_deadline_seconds() if timeout is None else timeout)
+    except FutureTimeoutError:
+        # Report how long the lookup has really run, not just this final wait
+        elapsed = time.monotonic() - _started_at(future)
+        return {"insights": {}, "chain": None, "error": f"evidence lookup timed out after {elapsed:.0f}s"}
+    except Exception as e:
+        return {"insights": {}, "chain": None, "error": str(e)}
+
+
+def _started_at(future: "Future[Dict[str, Any]]") -> float:
+    return getattr(future, "started_at", time.monotonic())
+
+
+def _submit(func: Any, *args: Any) -> "Future[Dict[str, Any]]":
+    # Run in a copy of the caller's context so tracing spans keep its trace id
+    future = evidence_executor().submit(contextvars.copy_context().run, func, *args)
+    future.started_at = time.monotonic()  # type: ignore[attr-defined]
+    return future
+
+
+def start_prefetch(product_query: str, mode: str = "two-step") -> "Future[Dict[str, Any]]":
+    return _submit(prefetch_evidence, product_query, mode)
+
+
+def start_evidence(
+    prefetch: "Future[Dict[str, Any]]",
+    product_query: str,
+    user_reason: str,
+    progress: Optional[EvidenceProgress] = None,
+    mode: Optional[str] = None,
+) -> "Future[Dict[str, Any]]":
+    return _submit(complete_evidence, prefetch, product_query, user_reason, progress, mode)
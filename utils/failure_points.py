@@ -0,0 +1,226 @@
+"""
+Precomputed Analyst summaries ("core failure points") for popular products.
+
+An offline job runs retrieval and the Analyst step for the top-N product
+keywords in the reviews corpus. The summaries go into a SQLite lookup table,
+keyed by a hash of the complaints text the Analyst saw and the model that wrote
+the summary. At request time, `lookup` answers the Analyst step for any query
+whose retrieval returns the same complaints and runs on the same model, so only
+the user-specific Negotiator step needs a live call.
+
+The job limits concurrent LLM requests and commits each summary as soon as it
+arrives. An interrupted run picks up where it stopped; use --refresh to
+recompute everything, e.g. overnight.
+
+Usage:
+    python -m utils.failure_points --top 200 --concurrency 4
+    python -m utils.failure_points --queries earbuds headphones --refresh
+"""
+
+import argparse
+import asyncio
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+DEFAULT_TABLE_PATH = BASE_DIR / "data" / "failure_points.sqlite3"
+TABLE_PATH_ENV = "REGRET_GUARD_FAILURE_POINTS_PATH"
+
+# Frequent review words that are not product names
+_GENERIC_WORDS = {
+    "product", "quality", "work", "works", "worked", "working", "money", "great", "good", "bad",
+    "star", "stars", "item", "items", "bought", "buy", "purchase", "purchased", "dont", "didnt",
+    "doesnt", "just", "like", "really", "time", "months", "month", "week", "weeks", "days",
+    "amazon", "price", "return", "returned", "waste", "disappointed", "poor", "cheap", "better",
+    "review", "nice", "love", "used", "using", "does", "broke", "stopped", "terrible", "horrible",
+    "died", "awful", "junk", "garbage", "useless", "worst", "defective", "okay", "fine",
+}
+
+
+def complaints_sha256(complaints_text: str) -> str:
+    return hashlib.sha256(complaints_text.encode("utf-8")).hexdigest()
+
+
+class FailurePointsTable:
+    """SQLite lookup table: (complaints hash, model) → core failure points (thread-safe)."""
+
+    def __init__(self, path: Path = DEFAULT_TABLE_PATH):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, timeout=5.0)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._migrate()
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS failure_points ("
+            " complaints_sha256 TEXT NOT NULL, model TEXT NOT NULL, query TEXT NOT NULL,"
+            " core_failure_points TEXT NOT NULL, created_at REAL NOT NULL,"
+            " PRIMARY KEY (complaints_sha256, model))"
+        )
+        self._conn.commit()
+
+    def _migrate(self) -> None:
+        """Re-key a table from before summaries were keyed by model (its rows keep their model)."""
+        pk = [row[1] for row in self._conn.execute("PRAGMA table_info(failure_points)") if row[5]]
+        if pk != ["complaints_sha256"]:
+            return
+        with self._conn:
+            self._conn.execute("ALTER TABLE failure_points RENAME TO failure_points_unkeyed")
+            self._conn.execute(
+                "CREATE TABLE failure_points ("
+                " complaints_sha256 TEXT NOT NULL, model TEXT NOT NULL, query TEXT NOT NULL,"
+                " core_failure_points TEXT NOT NULL, created_at REAL NOT NULL,"
+                " PRIMARY KEY (complaints_sha256, model))"
+            )
+            self._conn.execute(
+                "INSERT INTO failure_points SELECT complaints_sha256, COALESCE(model, ''), query,"
+                " core_failure_points, created_at FROM failure_points_unkeyed"
+            )
+            self._conn.execute("DROP TABLE failure_points_unkeyed")
+
+    def get(self, complaints_text: str, model: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT core_failure_points FROM failure_points WHERE complaints_sha256 = ? AND model = ?",
+                (complaints_sha256(complaints_text), model),
+            ).fetchone()
+        return row[0] if row else None
+
+    def put(self, query: str, complaints_text: str, core_failure_points: str, model: str) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO failure_points"
+                " (complaints_sha256, model, query, core_failure_points, created_at) VALUES (?, ?, ?, ?, ?)",
+                (complaints_sha256(complaints_text), model, query, core_failure_points, time.time()),
+            )
+            self._conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM failure_points").fetchone()[0]
+
+
+_TABLE: Optional[FailurePointsTable] = None
+_TABLE_LOCK = threading.Lock()
+
+
+def get_failure_points_table() -> Optional[FailurePointsTable]:
+    """The precomputed table, or None if the job has not produced one yet."""
+    global _TABLE
+    path = Path(os.getenv(TABLE_PATH_ENV, str(DEFAULT_TABLE_PATH)))
+    with _TABLE_LOCK:
+        if _TABLE is None or _TABLE.path != path:
+            if not path.exists():
+                return None
+            try:
+                _TABLE = FailurePointsTable(path)
+            except sqlite3.Error:
+                return None
+        return _TABLE
+
+
+def lookup(complaints_text: str, model: str) -> Optional[str]:
+    """Precomputed failure points for exactly these complaints from `model`, if the job produced them."""
+    table = get_failure_points_table()
+    if table is None or not complaints_text.strip():
+        return None
+    try:
+        return table.get(complaints_text, model)
+    except sqlite3.Error:
+        return None
+
+
+def top_product_keywords(n: int = 100) -> List[str]:
+    """The `n` most frequent product-like words in review titles (document frequency)."""
+    from sklearn.feature_extraction.text import ENGLISH_STOP_WORDS
+
+    from utils.data_processor import _load_reviews
+
+    df = _load_reviews()
+    if df.empty:
+        return []
+    words = df["Review Title"].astype(str).str.lower().str.findall(r"[a-z]{4,}").explode().dropna()
+    words = words[~words.isin(ENGLISH_STOP_WORDS) & ~words.isin(_GENERIC_WORDS)]
+    doc_freq = words.groupby(level=0).unique().explode().value_counts()
+    return doc_freq.index[:n].tolist()
+
+
+async def _summarise(
+    query: str,
+    table: FailurePointsTable,
+    semaphore: asyncio.Semaphore,
+    refresh: bool,
+    stats: Dict[str, int],
+) -> None:
+    from utils.data_processor import get_product_insights
+    from utils.llm_chains import analyst_step_async, get_llm_backend
+
+    complaints_text = (await asyncio.to_thread(get_product_insights, query)).get("complaints_text", "")
+    if not complaints_text.strip():
+        stats["empty"] += 1
+        return
+    model = get_llm_backend().model
+    if not refresh and table.get(complaints_text, model) is not None:
+        stats["skipped"] += 1
+        return
+    async with semaphore:
+        try:
+            # --refresh must reach the model: a cached answer would just be rewritten unchanged
+            points = await analyst_step_async(complaints_text, use_table=False, use_cache=not refresh)
+        except Exception as e:
+            stats["failed"] += 1
+            print(f"Error: {query!r}: {e}")
+            return
+    table.put(query, complaints_text, points, model=model)
+    stats["done"] += 1
+
+
+async def precompute(
+    queries: Sequence[str],
+    table: FailurePointsTable,
+    concurrency: int = 4,
+    refresh: bool = False,
+) -> Dict[str, int]:
+    """Summarise the complaints for every query, at most `concurrency` LLM calls at a time."""
+    from utils.data_processor import _load_reviews
+
+    semaphore = asyncio.Semaphore(concurrency)
+    stats = {"done": 0, "skipped": 0, "empty": 0, "failed": 0}
+    # Load the corpus once up front; retrieval runs outside the semaphore and
+    # would otherwise start every query on a cold cache at the same time
+    await asyncio.to_thread(_load_reviews)
+    await asyncio.gather(*(_summarise(q, table, semaphore, refresh, stats) for q in queries))
+    return stats
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Precompute Analyst failure points for popular product queries.")
+    parser.add_argument("--top", type=int, default=100, help="number of product keywords to mine from the corpus")
+    parser.add_argument("--queries", nargs="*", help="explicit product queries (instead of mining --top keywords)")
+    parser.add_argument("--concurrency", type=int, default=4, help="maximum concurrent LLM requests")
+    parser.add_argument("--refresh", action="store_true", help="recompute summaries already in the table")
+    parser.add_argument("--table", type=Path, default=Path(os.getenv(TABLE_PATH_ENV, str(DEFAULT_TABLE_PATH))))
+    args = parser.parse_args(argv)
+
+    queries = args.queries or top_product_keywords(args.top)
+    if not queries:
+        print("Error: no product queries (is the reviews CSV loaded?).")
+        return
+    queries = list(dict.fromkeys(re.sub(r"\s+", " ", q.strip().lower()) for q in queries if q.strip()))
+    table = FailurePointsTable(args.table)
+    stats = asyncio.run(precompute(queries, table, concurrency=args.concurrency, refresh=args.refresh))
+    print(
+        f"Success: {stats['done']} summarised, {stats['skipped']} already present, "
+        f"{stats['empty']} without complaints, {stats['failed']} failed; "
+        f"{len(table)} entries in {args.table}"
+    )
+
+
+if __name__ == "__main__":
+    main()
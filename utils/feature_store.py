@@ -0,0 +1,281 @@
+"""
+Per-user feature store with incrementally maintained aggregates.
+
+Every checkout decision is appended to an `events` log, a purchase or a vault
+stop with its amount and the regret score shown at decision time. In the same
+transaction, the user's row in `user_features` is updated in O(1):
+- balance;
+- purchase/stop counts and amounts;
+- mean, EWMA and last regret score;
+- spend and purchase count over rolling 24h / 7d windows.
+
+Checkout then reads everything with one primary-key lookup instead of scanning
+the transaction history.
+
+The balance is a running total and can go negative. The model only ever sees
+`model_balance` (floored at MIN_ACCOUNT_BALANCE). The app treats an
+`overdrawn` account as high risk without asking the model.
+
+Rolling windows are kept exact without rescans. Each window stores the cutoff
+timestamp it was last expired to. Expiry subtracts only the purchases in
+[previous cutoff, new cutoff), an index range scan over (user_id, kind, ts).
+Every event is therefore added and subtracted exactly once, which is amortised
+O(1) per event. `recompute` rebuilds the same features from the raw log and
+serves as the slow reference path for audits.
+
+Configuration (environment):
+    REGRET_GUARD_FEATURE_STORE_PATH=...   SQLite file (default data/feature_store.sqlite3)
+    REGRET_GUARD_USER_ID=demo             user the app records decisions for
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Optional
+
+from utils.features import DEFAULT_ACCOUNT_BALANCE, MIN_ACCOUNT_BALANCE
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+DEFAULT_STORE_PATH = BASE_DIR / "data" / "feature_store.sqlite3"
+STORE_PATH_ENV = "REGRET_GUARD_FEATURE_STORE_PATH"
+USER_ID_ENV = "REGRET_GUARD_USER_ID"
+WINDOWS: Dict[str, float] = {"24h": 24 * 3600.0, "7d": 7 * 24 * 3600.0}
+REGRET_EWMA_ALPHA = 0.3  # weight of the newest decision in regret_ewma
+
+_WINDOW_COLUMNS = "".join(f", spend_{w} REAL NOT NULL, purchases_{w} INTEGER NOT NULL, cutoff_{w} REAL NOT NULL" for w in WINDOWS)
+
+
+@dataclass(frozen=True)
+class UserFeatures:
+    user_id: str
+    account_balance: float = DEFAULT_ACCOUNT_BALANCE
+    spend_24h: float = 0.0
+    purchases_24h: int = 0
+    spend_7d: float = 0.0
+    purchases_7d: int = 0
+    n_purchases: int = 0
+    total_spend: float = 0.0
+    n_stops: int = 0
+    stopped_amount: float = 0.0
+    regret_mean: Optional[float] = None
+    regret_ewma: Optional[float] = None
+    last_regret: Optional[float] = None
+
+    @property
+    def overdrawn(self) -> bool:
+        return self.account_balance <= 0
+
+    @property
+    def model_balance(self) -> float:
+        """The balance to score with: the real one, floored at MIN_ACCOUNT_BALANCE when (nearly) empty."""
+        return max(self.account_balance, MIN_ACCOUNT_BALANCE)
+
+    @property
+    def stop_rate(self) -> float:
+        decisions = self.n_purchases + self.n_stops
+        return self.n_stops / decisions if decisions else 0.0
+
+
+def default_user_id() -> str:
+    return os.getenv(USER_ID_ENV, "demo")
+
+
+class FeatureStore:
+    """SQLite-backed event log plus one aggregate row per user (thread-safe)."""
+
+    def __init__(self, path: Path = DEFAULT_STORE_PATH, initial_balance: float = DEFAULT_ACCOUNT_BALANCE):
+        self.path = Path(path)
+        self.initial_balance = float(initial_balance)
+        self._lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, timeout=5.0)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS events ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT, user_id TEXT NOT NULL, ts REAL NOT NULL,"
+            " kind TEXT NOT NULL, amount REAL NOT NULL, regret_score REAL);"
+            "CREATE INDEX IF NOT EXISTS events_user_kind_ts ON events (user_id, kind, ts);"
+            "CREATE TABLE IF NOT EXISTS user_features ("
+            " user_id TEXT PRIMARY KEY, balance REAL NOT NULL,"
+            " n_purchases INTEGER NOT NULL, total_spend REAL NOT NULL,"
+            " n_stops INTEGER NOT NULL, stopped_amount REAL NOT NULL,"
+            " regret_count INTEGER NOT NULL, regret_sum REAL NOT NULL, regret_ewma REAL, last_regret REAL,"
+            f" updated_at REAL NOT NULL{_WINDOW_COLUMNS});"
+        )
+        self._conn.commit()
+
+    # -- internals (caller holds the lock and commits) --
+
+    def _new_row(self, user_id: str, now: float) -> Dict[str, object]:
+        row: Dict[str, object] = {
+            "user_id": user_id, "balance": self.initial_balance, "n_purchases": 0, "total_spend": 0.0,
+            "n_stops": 0, "stopped_amount": 0.0, "regret_count": 0, "regret_sum": 0.0,
+            "regret_ewma": None, "last_regret": None, "updated_at": now,
+        }
+        for w, seconds in WINDOWS.items():
+            row.update({f"spend_{w}": 0.0, f"purchases_{w}": 0, f"cutoff_{w}": now - seconds})
+        return row
+
+    def _row(self, user_id: str, now: float) -> Dict[str, object]:
+        cur = self._conn.execute("SELECT * FROM user_features WHERE user_id = ?", (user_id,))
+        values = cur.fetchone()
+        if values is None:
+            return self._new_row(user_id, now)
+        return dict(zip((c[0] for c in cur.description), values))
+
+    @staticmethod
+    def _apply(row: Dict[str, object], ts: float, kind: str, amount: float, regret_score: Optional[float]) -> None:
+        """Fold one event into the aggregates (windows only if `ts` is past their cutoff)."""
+        if kind == "purchase":
+            row["balance"] -= amount
+            row["n_purchases"] += 1
+            row["total_spend"] += amount
+            for w in WINDOWS:
+                if ts >= row[f"cutoff_{w}"]:  # backfilled events may already be outside the window
+                    row[f"spend_{w}"] += amount
+                    row[f"purchases_{w}"] += 1
+        else:
+            row["n_stops"] += 1
+            row["stopped_amount"] += amount
+        if regret_score is not None:
+            previous = row["regret_ewma"]
+            row["regret_count"] += 1
+            row["regret_sum"] += regret_score
+            row["regret_ewma"] = (
+                regret_score if previous is None else REGRET_EWMA_ALPHA * regret_score + (1 - REGRET_EWMA_ALPHA) * previous
+            )
+            row["last_regret"] = regret_score
+
+    def _expire(self, row: Dict[str, object], now: float) -> bool:
+        """
+        Drop purchases that left each window since its last cutoff. True if any
+        did; if none did, the stored row stays valid and need not be rewritten.
+        """
+        changed = False
+        for w, seconds in WINDOWS.items():
+            cutoff = now - seconds
+            if cutoff <= row[f"cutoff_{w}"]:
+                continue
+            spent, count = self._conn.execute(
+                "SELECT COALESCE(SUM(amount), 0), COUNT(*) FROM events"
+                " WHERE user_id = ? AND kind = 'purchase' AND ts >= ? AND ts < ?",
+                (row["user_id"], row[f"cutoff_{w}"], cutoff),
+            ).fetchone()
+            row[f"cutoff_{w}"] = cutoff
+            if count:
+                row[f"spend_{w}"] = max(row[f"spend_{w}"] - spent, 0.0)
+                row[f"purchases_{w}"] -= count
+                changed = True
+        return changed
+
+    def _save(self, row: Dict[str, object]) -> None:
+        columns = list(row)
+        self._conn.execute(
+            f"INSERT OR REPLACE INTO user_features ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+            [row[c] for c in columns],
+        )
+
+    @staticmethod
+    def _to_features(row: Dict[str, object]) -> UserFeatures:
+        return UserFeatures(
+            user_id=row["user_id"],
+            account_balance=row["balance"],
+            spend_24h=row["spend_24h"],
+            purchases_24h=row["purchases_24h"],
+            spend_7d=row["spend_7d"],
+            purchases_7d=row["purchases_7d"],
+            n_purchases=row["n_purchases"],
+            total_spend=row["total_spend"],
+            n_stops=row["n_stops"],
+            stopped_amount=row["stopped_amount"],
+            regret_mean=row["regret_sum"] / row["regret_count"] if row["regret_count"] else None,
+            regret_ewma=row["regret_ewma"],
+            last_regret=row["last_regret"],
+        )
+
+    # -- public API --
+
+    def record(
+        self,
+        user_id: str,
+        kind: str,
+        amount: float,
+        regret_score: Optional[float] = None,
+        ts: Optional[float] = None,
+    ) -> UserFeatures:
+        """Append one decision ("purchase" or "stop") and update the user's aggregates."""
+        if kind not in ("purchase", "stop"):
+            raise ValueError(f"kind must be 'purchase' or 'stop', got {kind!r}")
+        now = time.time()
+        ts = now if ts is None else float(ts)
+        with self._lock, self._conn:
+            row = self._row(user_id, now)
+            self._expire(row, now)
+            self._conn.execute(
+                "INSERT INTO events (user_id, ts, kind, amount, regret_score) VALUES (?, ?, ?, ?, ?)",
+                (user_id, ts, kind, float(amount), regret_score),
+            )
+            self._apply(row, ts, kind, float(amount), regret_score)
+            row["updated_at"] = now
+            self._save(row)
+        return self._to_features(row)
+
+    def record_purchase(self, user_id: str, amount: float, regret_score: Optional[float] = None) -> UserFeatures:
+        return self.record(user_id, "purchase", amount, regret_score)
+
+    def record_stop(self, user_id: str, amount: float, regret_score: Optional[float] = None) -> UserFeatures:
+        return self.record(user_id, "stop", amount, regret_score)
+
+    def features(self, user_id: str, now: Optional[float] = None) -> UserFeatures:
+        """Current features: one primary-key lookup, plus expiry of purchases that left a window."""
+        now = time.time() if now is None else now
+        with self._lock, self._conn:
+            row = self._row(user_id, now)
+            if row["regret_count"] or row["n_purchases"] or row["n_stops"]:
+                if self._expire(row, now):
+                    self._save(row)
+        return self._to_features(row)
+
+    def recompute(self, user_id: str, now: Optional[float] = None) -> UserFeatures:
+        """The same features rebuilt from the raw event log (slow; for audits and tests)."""
+        now = time.time() if now is None else now
+        row = self._new_row(user_id, now)  # windows start at `now`'s cutoffs
+        with self._lock:
+            events = self._conn.execute(
+                "SELECT ts, kind, amount, regret_score FROM events WHERE user_id = ? ORDER BY id", (user_id,)
+            ).fetchall()
+        for ts, kind, amount, regret_score in events:
+            self._apply(row, ts, kind, amount, regret_score)
+        return self._to_features(row)
+
+
+_STORE: Optional[FeatureStore] = None
+_STORE_LOCK = threading.Lock()
+
+
+def get_feature_store() -> Optional[FeatureStore]:
+    """The process-wide store, or None if its file cannot be opened (the app then uses defaults)."""
+    global _STORE
+    path = Path(os.getenv(STORE_PATH_ENV, str(DEFAULT_STORE_PATH)))
+    with _STORE_LOCK:
+        if _STORE is None or _STORE.path != path:
+            try:
+                _STORE = FeatureStore(path)
+            except (sqlite3.Error, OSError):
+                return None
+        return _STORE
+
+
+def user_features(user_id: Optional[str] = None) -> UserFeatures:
+    """Features for `user_id` (default REGRET_GUARD_USER_ID); defaults if the store is unavailable."""
+    user_id = user_id or default_user_id()
+    store = get_feature_store()
+    if store is None:
+        return UserFeatures(user_id=user_id)
+    try:
+        return store.features(user_id)
+    except sqlite3.Error:
+        return UserFeatures(user_id=user_id)
@@ -0,0 +1,129 @@
+"""
+Shared feature engineering for training and inference.
+
+train_model.py, app.py and the batch scorer all build the model input through
+RegretFeatureTransformer, so the engineered features and the column order can
+never drift apart. The transformer is pickled inside regret_bundle.pkl.
+"""
+
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Union
+
+import numpy as np
+
+BASE_FEATURES: List[str] = [
+    "price",
+    "account_balance",
+    "mood_score",
+    "is_limited_offer",
+    "sleep_hours",
+    "merchant_risk_score",
+]
+ENGINEERED_FEATURES: List[str] = ["relative_price", "impulsivity_index"]
+FEATURES: List[str] = BASE_FEATURES + ENGINEERED_FEATURES
+
+# The UI (and older bundles) call the risk input category_risk; the training CSV merchant_risk_score.
+COLUMN_ALIASES: Dict[str, str] = {
+    "category_risk": "merchant_risk_score",
+    "merchant_risk_score": "category_risk",
+}
+
+# Hard-coded balance of the demo account shown in the app.
+DEFAULT_ACCOUNT_BALANCE = 2840.50
+# Smallest balance the model sees. An empty or overdrawn account is floored here,
+# so any purchase reads as many times the balance (the high-risk end).
+MIN_ACCOUNT_BALANCE = 1.0
+
+ArrayLike = Union[float, int, np.ndarray, Sequence[float]]
+
+
+def relative_price(price: ArrayLike, account_balance: ArrayLike) -> Any:
+    """Share of the account balance the purchase would take (scalar, array or Series)."""
+    return price / np.maximum(account_balance, MIN_ACCOUNT_BALANCE)
+
+
+def impulsivity_index(mood_score: ArrayLike, sleep_hours: ArrayLike, is_limited_offer: ArrayLike) -> Any:
+    """Low mood, little sleep and a limited-time offer all push the index up."""
+    return (11 - mood_score) * 0.3 + (11 - sleep_hours) * 0.3 + (is_limited_offer * 1.5)
+
+
+def _column(data: Mapping[str, Any], name: str) -> Optional[np.ndarray]:
+    if name in data:
+        return np.asarray(data[name], dtype=np.float64)
+    alias = COLUMN_ALIASES.get(name)
+    if alias is not None and alias in data:
+        return np.asarray(data[alias], dtype=np.float64)
+    return None
+
+
+class RegretFeatureTransformer:
+    """
+    Turn raw transaction inputs into the model's float32 feature matrix.
+
+    `transform` accepts a DataFrame, or a mapping of column name → scalar / array,
+    and always returns a 2-D float32 array with columns in `self.features` order.
+    Engineered features are recomputed from the raw inputs (any precomputed
+    relative_price / impulsivity_index columns are ignored).
+    """
+
+    def __init__(self, features: Optional[Sequence[str]] = None):
+        self.features: List[str] = list(features) if features is not None else list(FEATURES)
+
+    def _raw_columns(self, data: Mapping[str, Any]) -> Dict[str, np.ndarray]:
+        needed = [f for f in self.features if f not in ENGINEERED_FEATURES]
+        for name in ("price", "account_balance", "mood_score", "sleep_hours", "is_limited_offer"):
+            if name not in needed:
+                needed.append(name)
+        raw = {}
+        for name in needed:
+            col = _column(data, name)
+            if col is None:
+                raise KeyError(f"Missing feature column '{name}'. Found: {list(data.keys())}.")
+            raw[name] = np.atleast_1d(col)
+        return raw
+
+    def transform(self, data: Mapping[str, Any]) -> np.ndarray:
+        raw = self._raw_columns(data)
+        engineered = {
+            "relative_price": relative_price(raw["price"], raw["account_balance"]),
+            "impulsivity_index": impulsivity_index(
+                raw["mood_score"], raw["sleep_hours"], raw["is_limited_offer"]
+            ),
+        }
+        n_rows = max(len(c) for c in raw.values())
+        X = np.empty((n_rows, len(self.features)), dtype=np.float32)
+        for j, name in enumerate(self.features):
+            X[:, j] = engineered[name] if name in engineered else raw[name]
+        return X
+
+    def transform_row(self, **values: float) -> np.ndarray:
+        """Build a single (1, n_features) float32 row from keyword inputs, without pandas."""
+        row = np.empty((1, len(self.features)), dtype=np.float32)
+        price = float(values["price"])
+        balance = float(values.get("account_balance", DEFAULT_ACCOUNT_BALANCE))
+        mood = float(values["mood_score"])
+        sleep = float(values["sleep_hours"])
+        limited = float(values["is_limited_offer"])
+        engineered = {
+            "relative_price": relative_price(price, balance),
+            "impulsivity_index": impulsivity_index(mood, sleep, limited),
+        }
+        for j, name in enumerate(self.features):
+            if name in engineered:
+                row[0, j] = engineered[name]
+            elif name == "account_balance":
+                row[0, j] = balance
+            elif name in values:
+                row[0, j] = values[name]
+            elif COLUMN_ALIASES.get(name) in values:
+                row[0, j] = values[COLUMN_ALIASES[name]]
+            else:
+                raise KeyError(f"Missing feature '{name}'.")
+        return row
+
+
+def get_transformer(bundle: Mapping[str, Any]) -> RegretFeatureTransformer:
+    """Return the bundle's transformer (older bundles only carry a feature list)."""
+    transformer = bundle.get("transformer")
+    if transformer is None:
+        transformer = RegretFeatureTransformer(bundle["features"])
+    return transformer
@@ -0,0 +1,213 @@
+"""
+Array-backed RandomForest evaluator.
+
+`FlatForest.from_sklearn` flattens every tree of a fitted RandomForestRegressor
+into five contiguous NumPy arrays (split feature, threshold, left/right child,
+leaf value) plus one root offset per tree. `predict` then walks all trees for a
+whole batch at once with vectorized gathers, so scoring needs neither sklearn
+nor per-tree Python calls. Predictions match sklearn to floating-point tolerance.
+
+It is built for the app's small requests: a single row scores in well under a
+millisecond and ~1k rows about as fast as sklearn. Large batches are gather-bound
+and run a few times slower than sklearn's compiled traversal, so the headless
+batch scorer keeps using the pickled sklearn forest (regret_bundle.pkl).
+"""
+
+import hashlib
+import json
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+_BLOCK_ROWS = 4096  # rows evaluated together; bounds the (rows × trees) working set
+_LEVELS_PER_CHECK = 4  # tree levels walked between dropping finished (row, tree) lanes
+
+
+class FlatForest:
+    """A regression forest stored as flat node arrays (leaves point at themselves)."""
+
+    def __init__(
+        self,
+        feature: np.ndarray,
+        threshold: np.ndarray,
+        left: np.ndarray,
+        right: np.ndarray,
+        value: np.ndarray,
+        roots: np.ndarray,
+        max_depth: int,
+        n_features: int,
+        feature_importances: Optional[np.ndarray] = None,
+    ):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.value = value
+        self.roots = roots
+        self.max_depth = int(max_depth)
+        self.n_features_in_ = int(n_features)
+        self.feature_importances_ = (
+            feature_importances if feature_importances is not None else np.zeros(n_features)
+        )
+        self._children: Optional[np.ndarray] = None
+        self._is_leaf: Optional[np.ndarray] = None
+        self._fingerprint: Optional[str] = None
+
+    @property
+    def n_estimators(self) -> int:
+        return len(self.roots)
+
+    @property
+    def n_nodes(self) -> int:
+        return len(self.feature)
+
+    def fingerprint(self) -> str:
+        """SHA-256 of the node arrays: equal only for the same trees, however the forest was stored."""
+        if self._fingerprint is None:
+            h = hashlib.sha256()
+            for arr, dtype in (
+                (self.feature, np.int32),
+                (self.threshold, np.float64),
+                (self.left, np.int32),
+                (self.right, np.int32),
+                (self.value, np.float64),
+                (self.roots, np.int32),
+            ):
+                h.update(np.ascontiguousarray(arr, dtype=dtype).tobytes())
+            self._fingerprint = h.hexdigest()
+        return self._fingerprint
+
+    @classmethod
+    def from_sklearn(cls, model: Any) -> "FlatForest":
+        """Flatten a fitted sklearn forest (or a single regression tree) of one output."""
+        estimators = getattr(model, "estimators_", None) or [model]
+        features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+        offset = 0
+        max_depth = 0
+        for est in estimators:
+            tree = est.tree_
+            n = tree.node_count
+            is_leaf = tree.children_left == -1
+            idx = np.arange(n, dtype=np.int32) + offset
+            features.append(np.where(is_leaf, 0, tree.feature).astype(np.int32))
+            # Leaves point back at themselves (left == right == own index); that is how predict spots them.
+            thresholds.append(np.where(is_leaf, np.inf, tree.threshold).astype(np.float64))
+            lefts.append(np.where(is_leaf, idx, tree.children_left + offset).astype(np.int32))
+            rights.append(np.where(is_leaf, idx, tree.children_right + offset).astype(np.int32))
+            values.append(tree.value.reshape(n, -1)[:, 0].astype(np.float64))
+            roots.append(offset)
+            max_depth = max(max_depth, tree.max_depth)
+            offset += n
+        return cls(
+            feature=np.concatenate(features),
+            threshold=np.concatenate(thresholds),
+            left=np.concatenate(lefts),
+            right=np.concatenate(rights),
+            value=np.concatenate(values),
+            roots=np.asarray(roots, dtype=np.int32),
+            max_depth=max_depth,
+            n_features=model.n_features_in_,
+            feature_importances=getattr(model, "feature_importances_", None),
+        )
+
+    def _links(self):
+        # Built on first use (a memory-mapped forest stays untouched until it scores):
+        # children[2 * node + go_right] is the next node; leaves link to themselves.
+        if self._children is None:
+            self._is_leaf = self.left == np.arange(self.n_nodes, dtype=self.left.dtype)
+            self._children = np.stack([self.left, self.right], axis=1).ravel().astype(np.int64)
+        return self._children, self._is_leaf
+
+    def _predict_block(self, X: np.ndarray) -> np.ndarray:
+        children, is_leaf = self._links()
+        n_rows, n_cols = X.shape
+        flat_x = X.ravel()
+        # One lane per (tree, row), tree-major, so consecutive gathers stay inside one
+        # tree's nodes. Lanes advance _LEVELS_PER_CHECK levels between leaf checks;
+        # a lane that reaches its leaf early just stays there.
+        nodes = np.repeat(self.roots.astype(np.int64), n_rows)
+        x_offset = np.tile(np.arange(n_rows, dtype=np.int64) * n_cols, self.n_estimators)
+        lanes = np.arange(nodes.size)
+        current = nodes
+        while lanes.size:
+            for _ in range(_LEVELS_PER_CHECK):
+                go_right = ~(flat_x[x_offset + self.feature[current]] <= self.threshold[current])
+                current = children[2 * current + go_right]
+            nodes[lanes] = current
+            running = ~is_leaf[current]
+            lanes, current, x_offset = lanes[running], current[running], x_offset[running]
+        return self.value[nodes].reshape(self.n_estimators, n_rows).mean(axis=0)
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        # sklearn evaluates splits on float32 inputs; do the same so thresholds agree exactly.
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        if X.shape[1] != self.n_features_in_:
+            raise ValueError(f"X has {X.shape[1]} features, but the forest expects {self.n_features_in_}.")
+        if X.shape[0] <= _BLOCK_ROWS:
+            return self._predict_block(X)
+        return np.concatenate(
+            [self._predict_block(X[i : i + _BLOCK_ROWS]) for i in range(0, X.shape[0], _BLOCK_ROWS)]
+        )
+
+    def save(
+        self,
+        path: Path,
+        features: Optional[Sequence[str]] = None,
+        mae: Optional[float] = None,
+        meta: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        """Write the forest (and optionally the feature list / MAE / JSON metadata) to a compressed .npz file."""
+        np.savez_compressed(
+            path,
+            feature=self.feature,
+            threshold=self.threshold,
+            left=self.left,
+            right=self.right,
+            value=self.value,
+            roots=self.roots,
+            max_depth=np.int32(self.max_depth),
+            n_features=np.int32(self.n_features_in_),
+            feature_importances=self.feature_importances_,
+            features=np.asarray(list(features) if features is not None else [], dtype=str),
+            mae=np.float64(mae if mae is not None else np.nan),
+            meta=np.asarray(json.dumps(meta or {})),
+        )
+
+    @classmethod
+    def load(cls, path: Path) -> "FlatForest":
+        with np.load(path) as data:
+            return cls(
+                feature=data["feature"],
+                threshold=data["threshold"],
+                left=data["left"],
+                right=data["right"],
+                value=data["value"],
+                roots=data["roots"],
+                max_depth=int(data["max_depth"]),
+                n_features=int(data["n_features"]),
+                feature_importances=data["feature_importances"],
+            )
+
+
+def load_flat_bundle(path: Path) -> Dict[str, Any]:
+    """
+    Load a .npz written by FlatForest.save into the same dict shape as
+    regret_bundle.pkl ({"model", "features", "transformer", "mae"}).
+    """
+    from utils.features import RegretFeatureTransformer
+
+    with np.load(path) as data:
+        features: List[str] = [str(f) for f in data["features"]]
+        mae = float(data["mae"])
+        meta = json.loads(str(data["meta"])) if "meta" in data.files else {}
+    forest = FlatForest.load(path)
+    return {
+        "model": forest,
+        "features": features,
+        "transformer": RegretFeatureTransformer(features),
+        "mae": mae,
+        "meta": meta,
+    }
@@ -0,0 +1,64 @@
+"""
+Import-time budgets for the app's heavy dependencies.
+
+streamlit, sklearn and cohere each take hundreds of milliseconds to import.
+The app imports them through `timed_import` only when a view actually needs
+them, so the cost shows up where it is paid and a slow import gets flagged.
+"""
+
+import importlib
+import os
+import sys
+import time
+import warnings
+from types import ModuleType
+from typing import Dict
+
+# Budgets in milliseconds; override one with e.g. REGRET_GUARD_IMPORT_BUDGET_SKLEARN_MS=500
+IMPORT_BUDGETS_MS: Dict[str, float] = {
+    "streamlit": 1500.0,
+    "sklearn": 1000.0,
+    "cohere": 1000.0,
+}
+
+_IMPORT_TIMES_MS: Dict[str, float] = {}
+
+
+def _budget_ms(name: str) -> float:
+    top = name.split(".")[0]
+    env = os.getenv(f"REGRET_GUARD_IMPORT_BUDGET_{top.upper()}_MS")
+    try:
+        return float(env) if env else IMPORT_BUDGETS_MS.get(top, float("inf"))
+    except ValueError:
+        return IMPORT_BUDGETS_MS.get(top, float("inf"))
+
+
+def timed_import(name: str) -> ModuleType:
+    """Import `name`, record how long it took and warn if it blew its budget."""
+    if name in sys.modules:
+        return sys.modules[name]
+    start = time.perf_counter()
+    module = importlib.import_module(name)
+    elapsed_ms = (time.perf_counter() - start) * 1000.0
+    _IMPORT_TIMES_MS[name] = elapsed_ms
+    budget = _budget_ms(name)
+    if elapsed_ms > budget:
+        warnings.warn(
+            f"Importing {name} took {elapsed_ms:.0f} ms (budget {budget:.0f} ms).",
+            RuntimeWarning,
+            stacklevel=2,
+        )
+    return module
+
+
+def import_report() -> Dict[str, Dict[str, object]]:
+    """Which budgeted modules are loaded in this process and what they cost."""
+    report = {}
+    for top in IMPORT_BUDGETS_MS:
+        timings = [ms for name, ms in _IMPORT_TIMES_MS.items() if name.split(".")[0] == top]
+        report[top] = {
+            "loaded": top in sys.modules,
+            "import_ms": max(timings) if timings else None,
+            "budget_ms": _budget_ms(top),
+        }
+    return report
@@ -0,0 +1,138 @@
+"""
+Persistent, content-addressed cache for LLM responses.
+
+Entries are keyed by a SHA-256 of (model, temperature, prompt) and stored in a
+local SQLite file, so identical Analyst / Negotiator prompts are answered from
+disk across users, reruns and processes. Entries expire after a TTL and the
+least-recently-used ones (to within ACCESS_RESOLUTION_SECONDS) are evicted once
+the cache holds `max_entries`.
+
+Configuration (environment):
+    REGRET_GUARD_LLM_CACHE=0                  disable the cache
+    REGRET_GUARD_LLM_CACHE_PATH=...           SQLite file (default data/.cache/llm_cache.sqlite3)
+    REGRET_GUARD_LLM_CACHE_TTL_SECONDS=...    default 7 days
+    REGRET_GUARD_LLM_CACHE_MAX_ENTRIES=...    default 10000
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+DEFAULT_CACHE_PATH = BASE_DIR / "data" / ".cache" / "llm_cache.sqlite3"
+DEFAULT_TTL_SECONDS = 7 * 24 * 3600
+DEFAULT_MAX_ENTRIES = 10_000
+# last_access is only rewritten when older than this, so a hot entry costs a
+# read, not a write + commit, per hit; LRU order is kept to the minute
+ACCESS_RESOLUTION_SECONDS = 60.0
+
+
+def cache_key(prompt: str, model: str, temperature: float) -> str:
+    payload = json.dumps({"model": model, "temperature": round(float(temperature), 4), "prompt": prompt})
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    """SQLite-backed response cache with TTL expiry and LRU eviction (thread-safe)."""
+
+    def __init__(
+        self,
+        path: Path = DEFAULT_CACHE_PATH,
+        ttl_seconds: float = DEFAULT_TTL_SECONDS,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+    ):
+        self.path = Path(path)
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, timeout=5.0)
+        # WAL lets several app processes read while one writes
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY, value TEXT NOT NULL,"
+            " created_at REAL NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_lru ON responses (last_access)")
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created_at, last_access FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or now - row[1] > self.ttl_seconds:
+                if row is not None:
+                    self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    self._conn.commit()
+                self.misses += 1
+                return None
+            if now - row[2] > ACCESS_RESOLUTION_SECONDS:
+                self._conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+                self._conn.commit()
+            self.hits += 1
+            return row[0]
+
+    def set(self, key: str, value: str) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, value, created_at, last_access) VALUES (?, ?, ?, ?)",
+                (key, value, now, now),
+            )
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()
+            if count > self.max_entries:
+                self._conn.execute(
+                    "DELETE FROM responses WHERE key IN "
+                    "(SELECT key FROM responses ORDER BY last_access ASC LIMIT ?)",
+                    (count - self.max_entries,),
+                )
+            self._conn.commit()
+
+    def purge_expired(self) -> int:
+        with self._lock:
+            cur = self._conn.execute(
+                "DELETE FROM responses WHERE created_at < ?", (time.time() - self.ttl_seconds,)
+            )
+            self._conn.commit()
+            return cur.rowcount
+
+    def stats(self) -> Dict[str, object]:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits / total) if total else None,
+            "path": str(self.path),
+        }
+
+
+_CACHE: Optional[LLMCache] = None
+_CACHE_LOCK = threading.Lock()
+
+
+def get_llm_cache() -> Optional[LLMCache]:
+    """The process-wide cache, or None when disabled / the file cannot be opened."""
+    global _CACHE
+    if os.getenv("REGRET_GUARD_LLM_CACHE", "1").strip().lower() in ("0", "false", "no", "off"):
+        return None
+    with _CACHE_LOCK:
+        if _CACHE is None:
+            try:
+                _CACHE = LLMCache(
+                    path=Path(os.getenv("REGRET_GUARD_LLM_CACHE_PATH", str(DEFAULT_CACHE_PATH))),
+                    ttl_seconds=float(os.getenv("REGRET_GUARD_LLM_CACHE_TTL_SECONDS", DEFAULT_TTL_SECONDS)),
+                    max_entries=int(os.getenv("REGRET_GUARD_LLM_CACHE_MAX_ENTRIES", DEFAULT_MAX_ENTRIES)),
+                )
+            except (sqlite3.Error, OSError, ValueError):
+                return None
+        return _CACHE
@@ -1,37 +1,133 @@
+import asyncio
+import contextvars
+import functools
+import hashlib
+import itertools
 import json
+import math
 import os
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
-from typing import Any, Dict, Optional
+from typing import Any, Callable, Dict, Generator, Iterator, List, Optional, Tuple
 
 import streamlit as st
 
-try:
-    from cohere import Client as CohereClient
-except ImportError:
-    CohereClient = None  # type: ignore[misc, assignment]
+from utils.failure_points import lookup as lookup_failure_points
+from utils.import_budget import timed_import
+from utils.llm_cache import cache_key, get_llm_cache
+from utils.retry import CircuitBreaker, RetryPolicy, call_with_retry
+from utils.tracing import approx_tokens, record_span, span, traced
 
+COHERE_MODEL = "command-r-plus"
 
-def _get_cohere_client() -> Any:
-    """
-    Create a Cohere client using a key loaded from Streamlit secrets or the environment.
-    """
-    if CohereClient is None:
-        raise ImportError(
-            "The 'cohere' package is not installed. Install it with:  pip install cohere"
-        )
-    api_key = None
+
+def _cohere_client_class() -> Any:
+    """Import cohere on first use (it is slow to import and only needed for the RAG chain)."""
     try:
-        api_key = st.secrets.get("COHERE_API_KEY", None)
+        return timed_import("cohere").Client
+    except ImportError:
+        return None
+
+
+def _secret_or_env(name: str) -> Optional[str]:
+    value = None
+    try:
+        value = st.secrets.get(name, None)
     except Exception:
-        api_key = None
+        value = None
+    return value or os.getenv(name)
+
+
+# Process-wide client registry: one client (and one keep-alive HTTP pool) per
+# (api key, base URL), shared by every step, rerun and session.
+_CLIENTS: Dict[Tuple[str, Optional[str]], Any] = {}
+_CLIENTS_LOCK = threading.Lock()
+_CLIENT_STATS = {"hits": 0, "misses": 0}
 
-    api_key = api_key or os.getenv("COHERE_API_KEY")
+# Keep-alive pool for the Cohere HTTP client (connections are reused across calls).
+HTTP_POOL_LIMITS = {"max_connections": 20, "max_keepalive_connections": 10, "keepalive_expiry": 60.0}
+HTTP_TIMEOUT_SECONDS = 60.0
+
+
+def _make_http_client() -> Any:
+    try:
+        httpx = timed_import("httpx")
+    except ImportError:
+        return None
+    return httpx.Client(limits=httpx.Limits(**HTTP_POOL_LIMITS), timeout=HTTP_TIMEOUT_SECONDS)
+
+
+def _get_cohere_client() -> Any:
+    """
+    Return the shared Cohere client for the configured key and base URL, creating
+    it (with a pooled keep-alive HTTP session) on first use.
+
+    COHERE_API_KEY comes from Streamlit secrets or the environment; COHERE_BASE_URL
+    (optional, same sources) points the client at another endpoint, e.g. a local
+    stub server in tests.
+    """
+    api_key = _secret_or_env("COHERE_API_KEY")
     if not api_key:
         raise RuntimeError(
             "COHERE_API_KEY not found. Please add it to st.secrets or your environment."
         )
+    base_url = _secret_or_env("COHERE_BASE_URL")
+    registry_key = (api_key, base_url)
 
-    return CohereClient(api_key=api_key)
+    with _CLIENTS_LOCK:
+        client = _CLIENTS.get(registry_key)
+        if client is not None:
+            _CLIENT_STATS["hits"] += 1
+            return client
+
+        CohereClient = _cohere_client_class()
+        if CohereClient is None:
+            raise ImportError(
+                "The 'cohere' package is not installed. Install it with:  pip install cohere"
+            )
+        kwargs: Dict[str, Any] = {"api_key": api_key}
+        if base_url:
+            kwargs["base_url"] = base_url
+        http_client = _make_http_client()
+        if http_client is not None:
+            kwargs["httpx_client"] = http_client
+        try:
+            client = CohereClient(**kwargs)
+        except TypeError:
+            # Older SDKs have no httpx_client; drop the pool but keep the endpoint
+            if http_client is not None:
+                http_client.close()
+            kwargs.pop("httpx_client", None)
+            try:
+                client = CohereClient(**kwargs)
+            except TypeError:
+                if base_url:
+                    # Never fall back to the default endpoint when another was configured
+                    raise RuntimeError(
+                        "COHERE_BASE_URL is set but the installed cohere SDK does not accept base_url. "
+                        "Upgrade it with:  pip install -U cohere"
+                    ) from None
+                raise
+        _CLIENTS[registry_key] = client
+        _CLIENT_STATS["misses"] += 1
+        return client
+
+
+def client_pool_stats() -> Dict[str, object]:
+    """How often _get_cohere_client reused a pooled client instead of building one."""
+    with _CLIENTS_LOCK:
+        hits, misses = _CLIENT_STATS["hits"], _CLIENT_STATS["misses"]
+        total = hits + misses
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": (hits / total) if total else None,
+            "clients": len(_CLIENTS),
+        }
 
 
 @dataclass
@@ -48,64 +144,427 @@ class RegretAssessment:
         }
 
 
-def _cohere_generate(client: Any, prompt: str, temperature: float = 0.2) -> str:
+# Cohere call styles in probe order: (method, pass per-request options). The
+# first style that works for a client class is remembered, so later calls make
+# exactly one request per attempt.
+_API_STYLES = [
+    ("generate", True),
+    ("generate", False),
+    ("chat_v1", True),
+    ("chat_v1", False),
+    ("chat_v2", True),
+    ("chat_v2", False),
+]
+_DETECTED_STYLES: Dict[type, Tuple[str, bool]] = {}
+_STYLES_LOCK = threading.Lock()
+
+# Transient upstream failures worth another attempt; everything else is fatal.
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+# Responses meaning "this endpoint / parameter is not available", used only while probing.
+_UNSUPPORTED_STATUS = {400, 404, 405, 422}
+
+LLM_RETRY_POLICY = RetryPolicy()
+COHERE_BREAKER = CircuitBreaker()
+
+
+def _is_retryable(exc: BaseException) -> bool:
+    status = getattr(exc, "status_code", None)
+    if status is not None:
+        return status in RETRYABLE_STATUS
+    if isinstance(exc, (TimeoutError, ConnectionError)):
+        return True
+    httpx = sys.modules.get("httpx")
+    return httpx is not None and isinstance(
+        exc, (httpx.TimeoutException, httpx.NetworkError, httpx.RemoteProtocolError)
+    )
+
+
+def _is_unsupported(exc: BaseException) -> bool:
+    """Probing only: once a style is detected, a 400/422 is a real bad request and propagates."""
+    return isinstance(exc, (TypeError, AttributeError)) or getattr(exc, "status_code", None) in _UNSUPPORTED_STATUS
+
+
+def _call_style(
+    client: Any, method: str, with_options: bool, prompt: str, temperature: float, timeout: float
+) -> str:
+    kwargs: Dict[str, Any] = {"model": COHERE_MODEL, "temperature": temperature}
+    if with_options:
+        # Retries are ours (call_with_retry); the SDK's own would multiply them.
+        kwargs["request_options"] = {"timeout_in_seconds": max(1, math.ceil(timeout)), "max_retries": 0}
+
+    if method == "generate":
+        response = client.generate(prompt=prompt, max_tokens=1024, **kwargs)
+        return response.generations[0].text.strip()
+    if method == "chat_v1":
+        response = client.chat(message=prompt, **kwargs)
+        return (getattr(response, "text", None) or str(response)).strip()
+
+    response = client.chat(messages=[{"role": "user", "content": prompt}], **kwargs)
+    if hasattr(response, "text"):
+        return response.text.strip()
+    content = response.message.content
+    if isinstance(content, list) and len(content) > 0:
+        return getattr(content[0], "text", str(content[0])).strip()
+    return str(content).strip()
+
+
+def _detect_style(client: Any, prompt: str, temperature: float, timeout: float) -> Tuple[Tuple[str, bool], str]:
+    """Probe the call styles in order; return the first that works and its text."""
+    last_error: Optional[BaseException] = None
+    for style in _API_STYLES:
+        try:
+            text = _call_style(client, *style, prompt, temperature, timeout)
+        except Exception as e:
+            if not _is_unsupported(e):
+                raise
+            last_error = e
+            continue
+        return style, text
+    if getattr(last_error, "status_code", None) is not None:
+        # Every style answered with an HTTP error: the request itself was rejected
+        raise last_error
+    raise RuntimeError(
+        "Cohere API call failed. Ensure COHERE_API_KEY is set and the cohere package supports generate or chat."
+    ) from last_error
+
+
+def _cohere_attempt(client: Any, prompt: str, temperature: float, timeout: float) -> str:
     """
-    Call Cohere and return the generated text.
-    Tries generate() first (v1), then chat() (v1 or v2).
+    One Cohere request. The API style (generate(), v1 chat() or v2 chat()) is
+    detected on the first call per client class and cached, so later calls make
+    exactly one request.
     """
-    # 1) Legacy generate (v1 Client)
-    try:
-        response = client.generate(
-            model="command-r-plus",
-            prompt=prompt,
-            temperature=temperature,
-            max_tokens=1024,
-        )
-        return response.generations[0].text.strip()
-    except (AttributeError, TypeError, Exception):
-        pass
+    style = _DETECTED_STYLES.get(type(client))
+    if style is not None:
+        return _call_style(client, *style, prompt, temperature, timeout)
+    style, text = _detect_style(client, prompt, temperature, timeout)
+    with _STYLES_LOCK:
+        _DETECTED_STYLES[type(client)] = style
+    return text
+
+
+def _event_text(event: Any) -> str:
+    """Text carried by one streamed event (v1 "text-generation" or v2 "content-delta")."""
+    kind = getattr(event, "event_type", None) or getattr(event, "type", None)
+    if kind == "text-generation":
+        return getattr(event, "text", "") or ""
+    if kind == "content-delta":
+        try:
+            return event.delta.message.content.text or ""
+        except AttributeError:
+            return ""
+    return ""
+
+
+def _open_stream(
+    client: Any, method: str, with_options: bool, prompt: str, temperature: float, timeout: float
+) -> Iterator[str]:
+    kwargs: Dict[str, Any] = {"model": COHERE_MODEL, "temperature": temperature}
+    if with_options:
+        kwargs["request_options"] = {"timeout_in_seconds": max(1, math.ceil(timeout)), "max_retries": 0}
+    if method == "generate":
+        events = client.generate_stream(prompt=prompt, max_tokens=1024, **kwargs)
+    elif method == "chat_v1":
+        events = client.chat_stream(message=prompt, **kwargs)
+    else:
+        events = client.chat_stream(messages=[{"role": "user", "content": prompt}], **kwargs)
+    for event in events:
+        text = _event_text(event)
+        if text:
+            yield text
 
-    # 2) v1 chat (message=, response.text)
+
+def _cohere_open_stream(client: Any, prompt: str, temperature: float, timeout: float) -> Iterator[str]:
+    """
+    Open a stream with the streaming twin of the detected API style and read its
+    first chunk (probing the styles on first use, like _cohere_attempt).
+    """
+    known = _DETECTED_STYLES.get(type(client))
+    last_error: Optional[BaseException] = None
+    for style in [known] if known is not None else _API_STYLES:
+        chunks = _open_stream(client, *style, prompt, temperature, timeout)
+        try:
+            first = next(chunks, "")
+        except Exception as e:
+            if known is not None or not _is_unsupported(e):
+                raise
+            last_error = e
+            continue
+        with _STYLES_LOCK:
+            _DETECTED_STYLES[type(client)] = style
+        return itertools.chain([first], chunks)
+    raise RuntimeError("Cohere streaming failed: no supported generate_stream / chat_stream API.") from last_error
+
+
+class CohereBackend:
+    """The production backend: the pooled Cohere client from _get_cohere_client."""
+
+    name = "cohere"
+    model = COHERE_MODEL
+
+    def generate(self, prompt: str, temperature: float, timeout: float) -> str:
+        return _cohere_attempt(_get_cohere_client(), prompt, temperature, timeout)
+
+    def stream(self, prompt: str, temperature: float, timeout: float) -> Iterator[str]:
+        return _cohere_open_stream(_get_cohere_client(), prompt, temperature, timeout)
+
+
+# A backend makes one attempt per call: generate(prompt, temperature, timeout) -> str
+# and stream(...) -> Iterator[str]. Retries, the circuit breaker and the response
+# cache are applied here, identically for every backend.
+LLM_BACKEND_ENV = "REGRET_GUARD_LLM_BACKEND"
+_BACKENDS: Dict[str, Any] = {}
+_BREAKERS: Dict[str, CircuitBreaker] = {CohereBackend.name: COHERE_BREAKER}
+_BACKENDS_LOCK = threading.Lock()
+
+
+def get_llm_backend() -> Any:
+    """The backend named by REGRET_GUARD_LLM_BACKEND: "cohere" (default) or "mock" (utils/mock_llm.py)."""
+    name = os.getenv(LLM_BACKEND_ENV, CohereBackend.name).strip().lower()
+    with _BACKENDS_LOCK:
+        backend = _BACKENDS.get(name)
+        if backend is None:
+            if name == "mock":
+                from utils.mock_llm import MockLLMBackend
+
+                backend = MockLLMBackend.from_env()
+            elif name == CohereBackend.name:
+                backend = CohereBackend()
+            else:
+                raise ValueError(f"{LLM_BACKEND_ENV} must be 'cohere' or 'mock', got {name!r}")
+            _BACKENDS[name] = backend
+            _BREAKERS.setdefault(name, CircuitBreaker())
+        return backend
+
+
+def _backend_generate(backend: Any, prompt: str, temperature: float) -> str:
+    """
+    Generate text with `backend`. Timeouts, 429s and 5xx responses are retried
+    under LLM_RETRY_POLICY behind the backend's circuit breaker. Other errors
+    (bad key, bad request) are raised at once.
+    """
+    return call_with_retry(
+        lambda timeout: backend.generate(prompt, temperature, timeout),
+        LLM_RETRY_POLICY,
+        _is_retryable,
+        _BREAKERS[backend.name],
+    )
+
+
+def _backend_stream(backend: Any, prompt: str, temperature: float) -> Iterator[str]:
+    """
+    Stream generated text from `backend` chunk by chunk. Retries (same policy and
+    breaker as _backend_generate) only cover opening the stream and the first
+    chunk; once text has been yielded, an error propagates to the caller.
+    """
+
+    def first_chunk(timeout: float) -> Tuple[str, Iterator[str]]:
+        chunks = iter(backend.stream(prompt, temperature, timeout))
+        return next(chunks, ""), chunks
+
+    first, rest = call_with_retry(first_chunk, LLM_RETRY_POLICY, _is_retryable, _BREAKERS[backend.name])
+    if first:
+        yield first
+    yield from rest
+
+
+def _cached_response(cache: Any, key: str, parse: Optional[Callable[[str], Any]]) -> Tuple[Optional[str], Any]:
+    """(text, parsed) for a cache hit that still parses, else (None, None)."""
+    cached = cache.get(key) if cache is not None else None
+    if cached is None:
+        return None, None
     try:
-        response = client.chat(
-            model="command-r-plus",
-            message=prompt,
-            temperature=temperature,
-        )
-        return getattr(response, "text", None) or str(response).strip()
-    except Exception:
-        pass
+        return cached, (parse(cached) if parse is not None else cached)
+    except ValueError:  # stored before validation existed; regenerate and overwrite
+        return None, None
+
+
+def _generate(
+    prompt: str, temperature: float, parse: Optional[Callable[[str], Any]] = None, use_cache: bool = True
+) -> Any:
+    """
+    Generate text for `prompt`, answering from the persistent response cache when
+    the same (model, temperature, prompt) was seen before. The backend (and its
+    client) is only used on a cache miss.
+
+    With `parse`, returns parse(text) instead of the text. A response is cached
+    only after `parse` accepted it, so a malformed answer is never replayed.
+    use_cache=False always asks the backend and overwrites the cached entry.
+    """
+    backend = get_llm_backend()
+    with span("llm.generate", backend=backend.name, model=backend.model, prompt_tokens=approx_tokens(prompt)) as s:
+        cache = get_llm_cache()
+        key = cache_key(prompt, backend.model, temperature)
+        cached, result = _cached_response(cache, key, parse) if use_cache else (None, None)
+        s.set(cache_hit=cached is not None)
+        if cached is not None:
+            s.set(response_tokens=approx_tokens(cached))
+            return result
+        text = _backend_generate(backend, prompt, temperature)
+        s.set(response_tokens=approx_tokens(text))
+        result = parse(text) if parse is not None else text
+        if cache is not None and text:
+            cache.set(key, text)
+        return result
 
-    # 3) ClientV2-style: if client has chat(messages=...)
+
+def _generate_stream(
+    prompt: str, temperature: float, parse: Optional[Callable[[str], Any]] = None
+) -> Generator[str, None, Any]:
+    """
+    Streaming variant of _generate; a cache hit is yielded as a single chunk.
+    The generator's return value is parse(full text) (the text without `parse`),
+    and the response is cached only after `parse` accepted it.
+    """
+    backend = get_llm_backend()
+    # Timed by hand: a `with span` block must not stay open across yields
+    start = time.perf_counter()
+    attrs: Dict[str, Any] = {"backend": backend.name, "model": backend.model, "prompt_tokens": approx_tokens(prompt)}
+    cache = get_llm_cache()
+    key = cache_key(prompt, backend.model, temperature)
+    cached, result = _cached_response(cache, key, parse)
+    attrs["cache_hit"] = cached is not None
+    if cached is not None:
+        record_span("llm.generate_stream", (time.perf_counter() - start) * 1000.0, response_tokens=approx_tokens(cached), **attrs)
+        yield cached
+        return result
+    parts = []
+    error = None
     try:
-        response = client.chat(
-            model="command-r-plus",
-            messages=[{"role": "user", "content": prompt}],
-            temperature=temperature,
+        for chunk in _backend_stream(backend, prompt, temperature):
+            if not parts:
+                attrs["first_token_ms"] = round((time.perf_counter() - start) * 1000.0, 3)
+            parts.append(chunk)
+            yield chunk
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+        raise
+    except GeneratorExit:  # the consumer stopped reading (e.g. its deadline passed)
+        error = "GeneratorExit: stream abandoned"
+        raise
+    finally:
+        text = "".join(parts).strip()
+        record_span(
+            "llm.generate_stream", (time.perf_counter() - start) * 1000.0, error=error,
+            response_tokens=approx_tokens(text), **attrs,
         )
-        if hasattr(response, "text"):
-            return response.text.strip()
-        if hasattr(response, "message") and hasattr(response.message, "content"):
-            content = response.message.content
-            if isinstance(content, list) and len(content) > 0:
-                return getattr(content[0], "text", str(content[0])).strip()
-            return str(content).strip()
-    except Exception:
-        pass
+    result = parse(text) if parse is not None else text
+    if cache is not None and text:
+        cache.set(key, text)
+    return result
 
-    raise RuntimeError(
-        "Cohere API call failed. Ensure COHERE_API_KEY is set and the cohere package supports generate or chat."
-    )
+
+class IncrementalJSONObject:
+    """
+    Incremental parser for a flat JSON object of scalar values that arrives in
+    chunks. After each `feed`, `values` holds every completed field and
+    `partial` holds string values that are still being streamed. Text before the
+    opening brace (e.g. a markdown fence) is skipped.
+    """
+
+    def __init__(self) -> None:
+        self.values: Dict[str, Any] = {}
+        self.partial: Dict[str, str] = {}
+        self._buf = ""
+        self._pos = 0
+        self._state = "start"
+        self._key: Optional[str] = None
+        self._chars: List[str] = []
+
+    @property
+    def done(self) -> bool:
+        return self._state == "done"
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return self.values.get(key, self.partial.get(key, default))
+
+    def _read_escape(self) -> Optional[str]:
+        seq_len = 6 if self._buf[self._pos + 1 : self._pos + 2] == "u" else 2
+        seq = self._buf[self._pos : self._pos + seq_len]
+        if len(seq) < seq_len:
+            return None  # escape split across chunks
+        self._pos += seq_len
+        try:
+            return json.loads(f'"{seq}"')
+        except json.JSONDecodeError:
+            return seq
+
+    def feed(self, chunk: str) -> None:
+        self._buf += chunk
+        buf = self._buf
+        while self._pos < len(buf) and self._state != "done":
+            c = buf[self._pos]
+            state = self._state
+            if state in ("key_str", "value_str"):
+                if c == "\\":
+                    char = self._read_escape()
+                    if char is None:
+                        break
+                    self._chars.append(char)
+                    continue
+                self._pos += 1
+                if c != '"':
+                    self._chars.append(c)
+                elif state == "key_str":
+                    self._key, self._state = "".join(self._chars), "colon"
+                else:
+                    self.values[self._key] = "".join(self._chars)
+                    self.partial.pop(self._key, None)
+                    self._state = "after"
+            elif state == "scalar":
+                if c in ",}" or c.isspace():
+                    raw = "".join(self._chars)
+                    try:
+                        self.values[self._key] = json.loads(raw)
+                    except json.JSONDecodeError:
+                        self.values[self._key] = raw
+                    self._state = "after"
+                else:
+                    self._chars.append(c)
+                    self._pos += 1
+            elif state == "value":
+                if c == '"':
+                    self._state, self._chars = "value_str", []
+                    self._pos += 1
+                elif c.isspace():
+                    self._pos += 1
+                else:
+                    self._state, self._chars = "scalar", []
+            else:
+                self._pos += 1
+                if state == "start" and c == "{":
+                    self._state = "key"
+                elif state == "key" and c == '"':
+                    self._state, self._chars = "key_str", []
+                elif state == "colon" and c == ":":
+                    self._state = "value"
+                elif state == "after" and c == ",":
+                    self._state = "key"
+                elif state in ("key", "after") and c == "}":
+                    self._state = "done"
+        if self._state == "value_str":
+            self.partial[self._key] = "".join(self._chars)
 
 
-def _analyst_step(complaints_text: str) -> str:
+def _analyst_step(complaints_text: str, use_table: bool = True, use_cache: bool = True) -> str:
     """
     Step 1 – The Analyst:
     Summarise the core failure points appearing in the complaints.
+    The result depends only on `complaints_text`. It is shared across users via
+    the cache, or answered from the table precomputed by utils/failure_points.py.
     """
-    client = _get_cohere_client()
+    with span("llm.analyst") as s:
+        # Only summaries written by the model this backend serves: a table filled
+        # by another backend (e.g. the mock) must not answer for Cohere
+        precomputed = lookup_failure_points(complaints_text, get_llm_backend().model) if use_table else None
+        s.set(precomputed=precomputed is not None)
+        if precomputed is not None:
+            return precomputed
+        return _generate(_analyst_prompt(complaints_text), temperature=0.2, use_cache=use_cache)
 
-    prompt = (
+
+def _analyst_prompt(complaints_text: str) -> str:
+    return (
         "You are The Analyst inside the Regret Guard AI team. "
         "Your job is to read raw customer complaints and extract the 3–5 "
         "most important 'Core Failure Points' as bullet points, grouped by theme. "
@@ -128,20 +587,9 @@ def _analyst_step(complaints_text: str) -> str:
         "Summarise the Core Failure Points."
     )
 
-    return _cohere_generate(client, prompt, temperature=0.2)
-
-
-def _negotiator_step(
-    product_query: str, user_reason: str, core_failure_points: str
-) -> RegretAssessment:
-    """
-    Step 2 – The Negotiator:
-    Combines the user's reason to buy + failure points into a structured
-    regret probability and counter‑argument.
-    """
-    client = _get_cohere_client()
 
-    prompt = (
+def _negotiator_prompt(product_query: str, user_reason: str, core_failure_points: str) -> str:
+    return (
         "You are The Negotiator inside Regret Guard AI. "
         "Your tone is calm, protective, and slightly skeptical – like a financial therapist "
         "who wants to prevent future regret.\n\n"
@@ -179,8 +627,9 @@ def _negotiator_step(
         )
     )
 
-    raw = _cohere_generate(client, prompt, temperature=0.25)
 
+@traced("llm.parse_json")
+def _parse_assessment(raw: str, core_failure_points: str) -> RegretAssessment:
     try:
         parsed = json.loads(raw)
     except json.JSONDecodeError:
@@ -198,23 +647,279 @@ def _negotiator_step(
     )
 
 
+@traced("llm.negotiator")
+def _negotiator_step(
+    product_query: str, user_reason: str, core_failure_points: str
+) -> RegretAssessment:
+    """
+    Step 2 – The Negotiator:
+    Combines the user's reason to buy + failure points into a structured
+    regret probability and counter‑argument.
+    """
+    prompt = _negotiator_prompt(product_query, user_reason, core_failure_points)
+    return _generate(prompt, temperature=0.25, parse=functools.partial(_parse_assessment, core_failure_points=core_failure_points))
+
+
+def _single_call_prompt(product_query: str, user_reason: str, complaints_text: str) -> str:
+    return (
+        "You are Regret Guard AI: an analyst and a negotiator in one. "
+        "Your tone is calm, protective, and slightly skeptical – like a financial therapist "
+        "who wants to prevent future regret.\n\n"
+        "1. Read the raw customer complaints and extract the 3–5 most important "
+        "'Core Failure Points' (durability, price/value, reliability, delivery, customer support, "
+        "expectation mismatch).\n"
+        "2. Weigh them against the user's reason to buy and estimate how likely the user is "
+        "to regret this purchase.\n\n"
+        "You MUST respond with ONLY valid JSON (no markdown, no extra text) with exactly these keys:\n"
+        '"regret_probability": <0-100 integer>, '
+        '"core_failure_points": "short summary", '
+        '"counter_argument": "short but sharp warning"\n\n'
+        "Example input:\n"
+        '{"product": "Impulse gaming console in a flash sale", '
+        '"user_reason": "All my friends are buying it tonight and it\'s 40% off.", '
+        '"complaints": "- Got bored after a week.\\n- Same three games over and over.\\n- Way over my budget in hindsight."}\n\n'
+        "Example output:\n"
+        '{"regret_probability": 78, '
+        '"core_failure_points": "Low long‑term usage, repetitive experience, and clear budget strain.", '
+        '"counter_argument": "Right now you are driven by FOMO and a time‑limited discount. '
+        'Most people like you stopped using this console quickly. If you wait a month and still want it, the decision will be calmer and safer."}\n\n'
+        "Now respond with JSON only for this input:\n"
+        + json.dumps(
+            {"product": product_query, "user_reason": user_reason, "complaints": complaints_text},
+            indent=2,
+        )
+    )
+
+
+@traced("llm.parse_json")
+def _validate_structured(raw: str) -> RegretAssessment:
+    """Parse a single-call response and check it against the assessment schema."""
+    start, end = raw.find("{"), raw.rfind("}")
+    if start == -1 or end <= start:
+        raise ValueError("single-call response contains no JSON object")
+    parsed = json.loads(raw[start : end + 1])
+    probability = parsed.get("regret_probability")
+    if isinstance(probability, bool) or not isinstance(probability, (int, float)) or not 0 <= probability <= 100:
+        raise ValueError(f"regret_probability must be a number in 0-100, got {probability!r}")
+    for key in ("core_failure_points", "counter_argument"):
+        if not isinstance(parsed.get(key), str) or not parsed[key].strip():
+            raise ValueError(f"{key} must be a non-empty string")
+    return RegretAssessment(
+        core_failure_points=parsed["core_failure_points"],
+        regret_probability=float(probability),
+        counter_argument=parsed["counter_argument"],
+    )
+
+
+@traced("llm.single_call")
+def _single_call_step(product_query: str, user_reason: str, complaints_text: str) -> RegretAssessment:
+    """The whole chain in one request: failure points, probability and counter-argument."""
+    prompt = _single_call_prompt(product_query, user_reason, complaints_text)
+    return _generate(prompt, temperature=0.25, parse=_validate_structured)
+
+
+# "two-step" (Analyst → Negotiator), "single" (one structured call) or "ab"
+# (each session is assigned one of the two by a stable hash, for quality A/B tests).
+CHAIN_MODES = ("two-step", "single")
+CHAIN_MODE = os.getenv("REGRET_GUARD_CHAIN_MODE", "two-step").strip().lower()
+
+
+def chain_mode_for(unit_id: Optional[str] = None) -> str:
+    """
+    The chain mode for an A/B unit (e.g. a session id) under REGRET_GUARD_CHAIN_MODE.
+    Without a unit id, an "ab" call gets a random arm: one shared hash would put
+    every id-less call in the same bucket.
+    """
+    if CHAIN_MODE == "ab":
+        if not unit_id:
+            return random.choice(CHAIN_MODES)
+        bucket = int(hashlib.sha256(unit_id.encode("utf-8")).hexdigest(), 16) % 2
+        return CHAIN_MODES[bucket]
+    return CHAIN_MODE if CHAIN_MODE in CHAIN_MODES else "two-step"
+
+
 def run_regret_chain(
-    product_query: str, user_reason: str, complaints_text: str
+    product_query: str, user_reason: str, complaints_text: str, mode: Optional[str] = None
 ) -> Dict[str, object]:
     """
-    Public entry point for the two‑step Regret Guard chain.
+    Public entry point for the Regret Guard chain.
 
+    Two-step mode (default):
     1. The Analyst → summarises complaints into core failure points.
     2. The Negotiator → combines user context + failure points and
        outputs a regret probability and counter‑argument.
+
+    Single mode asks for all three fields in one schema-validated JSON response.
+    The result's "chain_mode" records which mode ran.
+    """
+    mode = mode or chain_mode_for()
+    if not complaints_text.strip():
+        return {
+            "core_failure_points": "",
+            "regret_probability": None,
+            "counter_argument": "",
+            "chain_mode": mode,
+        }
+
+    if mode == "single":
+        assessment = _single_call_step(product_query, user_reason, complaints_text)
+    else:
+        core_failure_points = _analyst_step(complaints_text)
+        assessment = _negotiator_step(product_query, user_reason, core_failure_points)
+    return {**assessment.to_dict(), "chain_mode": mode}
+
+
+# Per-step deadlines for the async chain (seconds); override via environment.
+ANALYST_TIMEOUT_SECONDS = float(os.getenv("REGRET_GUARD_ANALYST_TIMEOUT_S", "20"))
+NEGOTIATOR_TIMEOUT_SECONDS = float(os.getenv("REGRET_GUARD_NEGOTIATOR_TIMEOUT_S", "20"))
+
+
+# Steps run here rather than on the loop's default executor: asyncio.run() joins
+# the default executor on exit, which would hold the caller until a timed-out
+# step finished anyway. This pool is never joined, so a deadline really ends the wait.
+_STEP_EXECUTOR = ThreadPoolExecutor(max_workers=16, thread_name_prefix="regret-llm-step")
+
+
+async def _run_step(name: str, timeout: float, func: Any, *args: Any) -> Any:
+    """Run a blocking chain step on a worker thread with a deadline."""
+    loop = asyncio.get_running_loop()
+    call = functools.partial(contextvars.copy_context().run, func, *args)  # keep the trace id
+    try:
+        return await asyncio.wait_for(loop.run_in_executor(_STEP_EXECUTOR, call), timeout)
+    except asyncio.TimeoutError:
+        raise TimeoutError(f"{name} step timed out after {timeout:g}s") from None
+
+
+async def analyst_step_async(
+    complaints_text: str, timeout: float = ANALYST_TIMEOUT_SECONDS, use_table: bool = True, use_cache: bool = True
+) -> str:
+    """The Analyst step off the calling thread, with a timeout."""
+    return await _run_step("Analyst", timeout, _analyst_step, complaints_text, use_table, use_cache)
+
+
+async def run_regret_chain_async(
+    product_query: str,
+    user_reason: str,
+    complaints_text: str,
+    core_failure_points: Optional[str] = None,
+    analyst_timeout: float = ANALYST_TIMEOUT_SECONDS,
+    negotiator_timeout: float = NEGOTIATOR_TIMEOUT_SECONDS,
+    mode: Optional[str] = None,
+) -> Dict[str, object]:
+    """
+    Async version of run_regret_chain with a deadline per step.
+
+    Pass `core_failure_points` when the Analyst step already ran (e.g. it was
+    started as soon as the product query was known) to go straight to the
+    Negotiator. A step that misses its deadline raises TimeoutError. In single
+    mode the one call gets the Negotiator's deadline.
     """
+    mode = mode or chain_mode_for()
     if not complaints_text.strip():
         return {
             "core_failure_points": "",
             "regret_probability": None,
             "counter_argument": "",
+            "chain_mode": mode,
+        }
+    if mode == "single":
+        assessment = await _run_step(
+            "Single-call", negotiator_timeout, _single_call_step, product_query, user_reason, complaints_text
+        )
+        return {**assessment.to_dict(), "chain_mode": mode}
+    if core_failure_points is None:
+        core_failure_points = await analyst_step_async(complaints_text, analyst_timeout)
+    assessment = await _run_step(
+        "Negotiator", negotiator_timeout, _negotiator_step, product_query, user_reason, core_failure_points
+    )
+    return {**assessment.to_dict(), "chain_mode": mode}
+
+
+def run_regret_chain_stream(
+    product_query: str,
+    user_reason: str,
+    complaints_text: str,
+    core_failure_points: Optional[str] = None,
+    mode: Optional[str] = None,
+) -> Iterator[Dict[str, object]]:
+    """
+    Streaming version of run_regret_chain for progressive rendering.
+
+    Yields snapshots with the same keys as run_regret_chain plus "done". While
+    the Negotiator (or the single call) streams, `regret_probability` appears as
+    soon as the model has written it and `counter_argument` grows chunk by
+    chunk. The last snapshot (done=True) is the fully parsed result.
+    """
+    mode = mode or chain_mode_for()
+    if not complaints_text.strip():
+        yield {
+            "core_failure_points": "",
+            "regret_probability": None,
+            "counter_argument": "",
+            "chain_mode": mode,
+            "done": True,
+        }
+        return
+    if mode == "single":
+        prompt = _single_call_prompt(product_query, user_reason, complaints_text)
+        core_failure_points = ""
+        parse: Callable[[str], RegretAssessment] = _validate_structured
+    else:
+        if core_failure_points is None:
+            core_failure_points = _analyst_step(complaints_text)
+        prompt = _negotiator_prompt(product_query, user_reason, core_failure_points)
+        parse = functools.partial(_parse_assessment, core_failure_points=core_failure_points)
+    parser = IncrementalJSONObject()
+    stream = _generate_stream(prompt, temperature=0.25, parse=parse)
+    while True:
+        try:
+            chunk = next(stream)
+        except StopIteration as finished:  # the return value is the parsed (and now cached) response
+            assessment = finished.value
+            break
+        parser.feed(chunk)
+        probability = parser.values.get("regret_probability")
+        yield {
+            "core_failure_points": parser.get("core_failure_points") or core_failure_points,
+            "regret_probability": float(probability) if isinstance(probability, (int, float)) else None,
+            "counter_argument": parser.get("counter_argument", ""),
+            "chain_mode": mode,
+            "done": False,
         }
+    yield {**assessment.to_dict(), "chain_mode": mode, "done": True}
+
 
-    core_failure_points = _analyst_step(complaints_text)
-    assessment = _negotiator_step(product_query, user_reason, core_failure_points)
-    return assessment.to_dict()
+async def run_regret_chain_stream_async(
+    on_snapshot: Callable[[Dict[str, object]], None],
+    product_query: str,
+    user_reason: str,
+    complaints_text: str,
+    core_failure_points: Optional[str] = None,
+    analyst_timeout: float = ANALYST_TIMEOUT_SECONDS,
+    negotiator_timeout: float = NEGOTIATOR_TIMEOUT_SECONDS,
+    mode: Optional[str] = None,
+) -> Dict[str, object]:
+    """
+    run_regret_chain_stream with the same per-step deadlines as
+    run_regret_chain_async. Every snapshot is passed to `on_snapshot`; the
+    final result (without "done") is returned. When the streamed step misses its
+    deadline it raises TimeoutError, and the abandoned stream stops publishing
+    snapshots at its next chunk.
+    """
+    mode = mode or chain_mode_for()
+    if mode != "single" and core_failure_points is None and complaints_text.strip():
+        core_failure_points = await analyst_step_async(complaints_text, analyst_timeout)
+    stop = threading.Event()
+
+    def consume() -> Dict[str, object]:
+        snapshot: Dict[str, object] = {}
+        for snapshot in run_regret_chain_stream(product_query, user_reason, complaints_text, core_failure_points, mode):
+            if stop.is_set():
+                raise TimeoutError("stream abandoned after its deadline")
+            on_snapshot(snapshot)
+        return {k: v for k, v in snapshot.items() if k != "done"}
+
+    try:
+        return await _run_step("Single-call" if mode == "single" else "Negotiator", negotiator_timeout, consume)
+    finally:
+        stop.set()
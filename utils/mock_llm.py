@@ -0,0 +1,159 @@
+"""
+Deterministic local stand-in for the Cohere backend, for load tests.
+
+Select it with REGRET_GUARD_LLM_BACKEND=mock. It needs no API key or network
+access, and it answers Analyst, Negotiator and single-call prompts with output
+that passes the chain's parsers. The same prompt always gets the same text.
+Latency, streaming token rate and injected failures follow a profile, so
+throughput, timeouts, retries and cache hit rates of the checkout path can be
+measured offline.
+
+Configuration (environment):
+    REGRET_GUARD_MOCK_LLM_PROFILE=typical    fast | typical | slow | flaky
+    REGRET_GUARD_MOCK_LLM_LATENCY_MS=...     time to first token (overrides the profile)
+    REGRET_GUARD_MOCK_LLM_TOKENS_PER_S=...   generation speed after the first token
+    REGRET_GUARD_MOCK_LLM_ERROR_RATE=...     share of attempts failing with 429/503
+    REGRET_GUARD_MOCK_LLM_SEED=0             seed for latency jitter and error injection
+"""
+
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+from dataclasses import dataclass, replace
+from typing import Dict, Iterator, List
+
+_TOKEN_RE = re.compile(r"\S+\s*|\s+")
+
+
+@dataclass(frozen=True)
+class MockProfile:
+    latency_ms: float  # time to first token
+    jitter_ms: float
+    tokens_per_second: float
+    error_rate: float
+
+
+PROFILES: Dict[str, MockProfile] = {
+    "fast": MockProfile(latency_ms=20, jitter_ms=5, tokens_per_second=5000, error_rate=0.0),
+    "typical": MockProfile(latency_ms=700, jitter_ms=250, tokens_per_second=60, error_rate=0.01),
+    "slow": MockProfile(latency_ms=3000, jitter_ms=1500, tokens_per_second=15, error_rate=0.02),
+    "flaky": MockProfile(latency_ms=700, jitter_ms=500, tokens_per_second=60, error_rate=0.25),
+}
+
+
+class MockLLMError(RuntimeError):
+    """Injected upstream failure; carries a status_code like the Cohere SDK's ApiError."""
+
+    def __init__(self, status_code: int):
+        super().__init__(f"mock LLM returned HTTP {status_code}")
+        self.status_code = status_code
+
+
+_THEMES = [
+    ("Durability & build quality", "several buyers report it breaking or failing within weeks"),
+    ("Battery life mismatch", "real-world battery life is far below what is advertised"),
+    ("Connectivity", "pairing drops and disconnects are a recurring frustration"),
+    ("Price vs value", "it feels cheap for what it costs"),
+    ("Comfort & fit", "buyers find it uncomfortable over longer use"),
+    ("Customer support", "returns and warranty claims are slow or refused"),
+    ("Expectation mismatch", "the product does not match its photos or description"),
+]
+
+
+def _digest(prompt: str) -> int:
+    return int(hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:12], 16)
+
+
+def mock_response(prompt: str) -> str:
+    """The deterministic answer for `prompt` (Analyst bullets or assessment JSON)."""
+    seed = _digest(prompt)
+    themes = [_THEMES[(seed + 3 * i) % len(_THEMES)] for i in range(3)]
+    if "You are The Negotiator" in prompt or "an analyst and a negotiator" in prompt:
+        probability = 15 + seed % 71
+        tone = (
+            "This looks like a considered purchase; the complaints are mostly one-time hassles."
+            if probability < 40
+            else "Other buyers with similar motivation regretted this. Wait a few days and check if you still want it."
+        )
+        return json.dumps(
+            {
+                "regret_probability": probability,
+                "core_failure_points": "; ".join(name for name, _ in themes) + ".",
+                "counter_argument": tone,
+            }
+        )
+    return "Core Failure Points:\n" + "\n".join(f"• {name}: {detail}." for name, detail in themes)
+
+
+class MockLLMBackend:
+    """LLM backend with simulated latency, token streaming and failures (thread-safe)."""
+
+    name = "mock"
+    model = "mock-regret-guard"
+
+    def __init__(self, profile: MockProfile, seed: int = 0):
+        self.profile = profile
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.errors = 0
+
+    @classmethod
+    def from_env(cls) -> "MockLLMBackend":
+        name = os.getenv("REGRET_GUARD_MOCK_LLM_PROFILE", "typical").strip().lower()
+        if name not in PROFILES:
+            raise ValueError(f"REGRET_GUARD_MOCK_LLM_PROFILE must be one of {sorted(PROFILES)}, got {name!r}")
+        profile = PROFILES[name]
+        overrides = {
+            "latency_ms": os.getenv("REGRET_GUARD_MOCK_LLM_LATENCY_MS"),
+            "tokens_per_second": os.getenv("REGRET_GUARD_MOCK_LLM_TOKENS_PER_S"),
+            "error_rate": os.getenv("REGRET_GUARD_MOCK_LLM_ERROR_RATE"),
+        }
+        profile = replace(profile, **{k: float(v) for k, v in overrides.items() if v})
+        return cls(profile, seed=int(os.getenv("REGRET_GUARD_MOCK_LLM_SEED", "0")))
+
+    def _start_attempt(self, timeout: float) -> float:
+        """Draw this attempt's first-token latency, or raise the injected failure."""
+        with self._lock:
+            self.calls += 1
+            failed = self._rng.random() < self.profile.error_rate
+            status = self._rng.choice((429, 503))
+            jitter = self._rng.uniform(-1.0, 1.0) * self.profile.jitter_ms
+        latency = max(self.profile.latency_ms + jitter, 0.0) / 1000.0
+        if failed:
+            with self._lock:
+                self.errors += 1
+            time.sleep(min(latency, timeout))
+            raise MockLLMError(status)
+        return latency
+
+    def _sleep_or_timeout(self, seconds: float, remaining: float) -> float:
+        if seconds > remaining:
+            time.sleep(max(remaining, 0.0))
+            raise TimeoutError("mock LLM request timed out")
+        time.sleep(seconds)
+        return remaining - seconds
+
+    def generate(self, prompt: str, temperature: float, timeout: float) -> str:
+        text = mock_response(prompt)
+        latency = self._start_attempt(timeout)
+        n_tokens = len(_TOKEN_RE.findall(text))
+        self._sleep_or_timeout(latency + n_tokens / self.profile.tokens_per_second, timeout)
+        return text
+
+    def stream(self, prompt: str, temperature: float, timeout: float) -> Iterator[str]:
+        tokens: List[str] = _TOKEN_RE.findall(mock_response(prompt))
+        latency = self._start_attempt(timeout)
+        remaining = self._sleep_or_timeout(latency, timeout)
+        for i, token in enumerate(tokens):
+            if i:
+                remaining = self._sleep_or_timeout(1.0 / self.profile.tokens_per_second, remaining)
+            yield token
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            return {"calls": self.calls, "errors": self.errors, "profile": self.profile.__dict__}
@@ -0,0 +1,81 @@
+"""
+Model bundle loading shared by the app, the batch scorer and the scoring server.
+
+A bundle is a dict {"model", "features", "transformer", "mae"}. `model` is either
+a fitted sklearn forest (regret_bundle.pkl) or a FlatForest (*.npz); both expose
+`predict` and `feature_importances_`. Nothing here imports sklearn or pandas
+unless a pickle has to be unpickled.
+"""
+
+import warnings
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+DEFAULT_BUNDLE_PATH = Path("data/regret_bundle.pkl")
+MODEL_DIR = Path("data/regret_model")
+FOREST_PATH = Path("data/regret_forest.npz")
+FALLBACK_PATH = Path("data/regret_fallback.npz")
+
+# Tried in order by load_model_bundle: memory-mapped model directory, flat forest
+# (no sklearn), pickle, prebuilt fallback.
+MODEL_CANDIDATES: List[Path] = [MODEL_DIR, FOREST_PATH, DEFAULT_BUNDLE_PATH, FALLBACK_PATH]
+
+
+def load_bundle(bundle_path: Path = DEFAULT_BUNDLE_PATH) -> Dict[str, Any]:
+    """
+    Load a model bundle written by train_model.py: a memory-mapped model
+    directory (utils/model_store.py), a .npz flat forest (both scored without
+    importing sklearn) or regret_bundle.pkl.
+    """
+    bundle_path = Path(bundle_path)
+    if not bundle_path.exists():
+        raise FileNotFoundError(
+            f"{bundle_path} not found. Train the model first with:  python train_model.py"
+        )
+    if bundle_path.is_dir():
+        from utils.model_store import load_model_dir
+
+        return load_model_dir(bundle_path)
+    if bundle_path.suffix == ".npz":
+        from utils.flat_forest import load_flat_bundle
+
+        return load_flat_bundle(bundle_path)
+    import joblib
+
+    return joblib.load(bundle_path)
+
+
+def load_model_bundle(base_dir: Optional[Path] = None) -> Dict[str, Any]:
+    """
+    Load the best available model for the app. Falls back to training the small
+    synthetic model in-process only if no artifact (not even the prebuilt
+    data/regret_fallback.npz) can be read.
+    """
+    base_dir = Path(base_dir) if base_dir is not None else BASE_DIR
+    for candidate in MODEL_CANDIDATES:
+        path = base_dir / candidate
+        if not path.exists():
+            continue
+        try:
+            bundle = load_bundle(path)
+        except Exception:
+            continue
+        bundle["source"] = str(candidate)
+        return bundle
+
+    from utils.import_budget import timed_import
+
+    bundle = timed_import("train_model").build_fallback_bundle()
+    bundle["source"] = "in-process fallback"
+    return bundle
+
+
+def predict_array(model: Any, X: np.ndarray) -> np.ndarray:
+    """Run `model.predict` on a feature matrix already in the bundle's column order."""
+    with warnings.catch_warnings():
+        # Bundles trained on a DataFrame warn when given a bare array; the column order is ours.
+        warnings.filterwarnings("ignore", message="X does not have valid feature names")
+        return model.predict(X)
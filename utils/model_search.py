@@ -0,0 +1,187 @@
+"""
+Hyperparameter search that trades accuracy against inference cost.
+
+Candidates are sampled from SEARCH_SPACE and fitted in parallel worker
+processes, then evaluated one at a time in the parent. Each candidate gets a
+validation MAE, single-row and batch latency of the FlatForest scorer the app
+serves from, and the size of its serialized forest. Latency is measured
+serially so that concurrent fits do not distort it.
+
+`choose` keeps the candidates within the latency budget, finds the best MAE
+among them, and picks the fastest candidate whose MAE is within `mae_tolerance`
+of that best. A much smaller forest with practically the same accuracy
+therefore wins over the most accurate one.
+"""
+
+import io
+import itertools
+import os
+import random
+import statistics
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from utils.flat_forest import FlatForest
+
+SEARCH_SPACE: Dict[str, List[Any]] = {
+    "n_estimators": [25, 50, 100, 200],
+    "max_depth": [None, 8, 12, 16, 24],
+    "min_samples_leaf": [1, 2, 5, 10, 20],
+    "max_features": [1.0, 0.6, "sqrt"],
+}
+# What train_model.py used before the search existed; always evaluated for reference
+BASELINE: Dict[str, Any] = {"n_estimators": 100, "max_depth": None, "min_samples_leaf": 1, "max_features": 1.0}
+BATCH_ROWS = 1000
+
+_WORKER_DATA: Optional[Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]] = None
+
+
+def sample_candidates(n: int, seed: int = 0) -> List[Dict[str, Any]]:
+    """The baseline plus up to `n - 1` distinct random points of SEARCH_SPACE (the whole grid if it is smaller)."""
+    keys = list(SEARCH_SPACE)
+    grid = [dict(zip(keys, values)) for values in itertools.product(*SEARCH_SPACE.values())]
+    others = [c for c in grid if c != BASELINE]
+    return [dict(BASELINE)] + random.Random(seed).sample(others, min(max(n - 1, 0), len(others)))
+
+
+def _init_worker(X_fit: np.ndarray, y_fit: np.ndarray, X_val: np.ndarray, y_val: np.ndarray) -> None:
+    # The matrices are sent once per worker process instead of once per candidate
+    global _WORKER_DATA
+    _WORKER_DATA = (X_fit, y_fit, X_val, y_val)
+
+
+def _fit_candidate(params: Dict[str, Any]) -> Dict[str, Any]:
+    from sklearn.ensemble import RandomForestRegressor
+    from sklearn.metrics import mean_absolute_error
+
+    X_fit, y_fit, X_val, y_val = _WORKER_DATA
+    started = time.perf_counter()
+    model = RandomForestRegressor(**params, random_state=42, n_jobs=1).fit(X_fit, y_fit)
+    fit_s = time.perf_counter() - started
+    flat = FlatForest.from_sklearn(model)
+    return {
+        "params": params,
+        "mae": float(mean_absolute_error(y_val, flat.predict(X_val))),
+        "fit_s": fit_s,
+        "forest": flat,
+    }
+
+
+def _median_ms(fn: Any, rounds: int) -> float:
+    samples = []
+    for _ in range(rounds):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1000.0)
+    return statistics.median(samples)
+
+
+def measure_forest(forest: FlatForest, X: np.ndarray, single_rounds: int = 200, batch_rounds: int = 5) -> Dict[str, float]:
+    """Single-row and batch prediction latency plus serialized size of `forest`."""
+    rows = [X[i : i + 1] for i in range(min(len(X), 50))]
+    forest.predict(rows[0])  # warm up
+    cycle = itertools.cycle(rows)
+    batch = X[:BATCH_ROWS]
+    buf = io.BytesIO()
+    forest.save(buf)
+    batch_ms = _median_ms(lambda: forest.predict(batch), batch_rounds)
+    return {
+        "single_row_ms": _median_ms(lambda: forest.predict(next(cycle)), single_rounds),
+        "batch_ms": batch_ms,
+        "batch_rows": len(batch),
+        "rows_per_s": len(batch) / (batch_ms / 1000.0) if batch_ms > 0 else float("inf"),
+        "size_bytes": buf.getbuffer().nbytes,
+        "n_nodes": forest.n_nodes,
+    }
+
+
+def pareto_front(results: Sequence[Dict[str, Any]], objectives: Sequence[str] = ("mae", "single_row_ms", "size_bytes")) -> List[int]:
+    """Indices of candidates that no other candidate beats on every objective (all minimised)."""
+    front = []
+    for i, a in enumerate(results):
+        dominated = any(
+            all(b[k] <= a[k] for k in objectives) and any(b[k] < a[k] for k in objectives)
+            for j, b in enumerate(results)
+            if j != i
+        )
+        if not dominated:
+            front.append(i)
+    return front
+
+
+def choose(results: Sequence[Dict[str, Any]], latency_budget_ms: Optional[float], mae_tolerance: float) -> Tuple[int, bool]:
+    """(index of the chosen candidate, whether any candidate met the budget)."""
+    eligible = [i for i, r in enumerate(results) if latency_budget_ms is None or r["single_row_ms"] <= latency_budget_ms]
+    within_budget = bool(eligible)
+    if not eligible:  # nothing fits: take the fastest so the caller can still export something
+        eligible = [min(range(len(results)), key=lambda i: results[i]["single_row_ms"])]
+    best_mae = min(results[i]["mae"] for i in eligible)
+    good_enough = [i for i in eligible if results[i]["mae"] <= best_mae * (1.0 + mae_tolerance)]
+    return min(good_enough, key=lambda i: (results[i]["single_row_ms"], results[i]["size_bytes"])), within_budget
+
+
+def run_search(
+    X_train: np.ndarray,
+    y_train: np.ndarray,
+    n_candidates: int = 24,
+    workers: Optional[int] = None,
+    latency_budget_ms: Optional[float] = None,
+    mae_tolerance: float = 0.01,
+    seed: int = 0,
+) -> Dict[str, Any]:
+    """
+    Search on the training rows (80% fit / 20% validation) and return a report:
+    {"meta", "candidates" (sorted by MAE, with a "pareto" flag), "chosen"}.
+    """
+    from sklearn.model_selection import train_test_split
+
+    X_fit, X_val, y_fit, y_val = train_test_split(X_train, y_train, test_size=0.2, random_state=seed)
+    candidates = sample_candidates(n_candidates, seed)
+    workers = workers or os.cpu_count() or 1
+    started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(X_fit, y_fit, X_val, y_val)) as pool:
+        fitted = list(pool.map(_fit_candidate, candidates))
+    search_s = time.perf_counter() - started
+
+    results = []
+    for r in fitted:
+        forest = r.pop("forest")
+        results.append({**r, **measure_forest(forest, X_val)})
+    results.sort(key=lambda r: r["mae"])
+    front = set(pareto_front(results))
+    for i, r in enumerate(results):
+        r["pareto"] = i in front
+    chosen, within_budget = choose(results, latency_budget_ms, mae_tolerance)
+    return {
+        "meta": {
+            "candidates": len(results),
+            "workers": workers,
+            "search_s": search_s,
+            "fit_rows": len(y_fit),
+            "validation_rows": len(y_val),
+            "latency_budget_ms": latency_budget_ms,
+            "mae_tolerance": mae_tolerance,
+            "within_budget": within_budget,
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        },
+        "candidates": results,
+        "chosen": chosen,
+    }
+
+
+def format_report(report: Dict[str, Any]) -> str:
+    """The Pareto frontier as a plain-text table (chosen candidate marked with *)."""
+    lines = [f"{'':2}{'MAE':>7} {'1-row ms':>9} {'rows/s':>9} {'size KB':>9} {'nodes':>8}  params"]
+    for i, r in enumerate(report["candidates"]):
+        if not r["pareto"] and i != report["chosen"]:
+            continue
+        mark = "* " if i == report["chosen"] else "  "
+        params = ", ".join(f"{k}={v}" for k, v in r["params"].items())
+        lines.append(
+            f"{mark}{r['mae']:7.3f} {r['single_row_ms']:9.3f} {r['rows_per_s']:9.0f} "
+            f"{r['size_bytes'] / 1024:9.0f} {r['n_nodes']:8d}  {params}"
+        )
+    return "\n".join(lines)
@@ -0,0 +1,171 @@
+"""
+Versioned, memory-mappable model artifact.
+
+A model directory holds one uncompressed .npy file per FlatForest array plus a
+small meta.json sidecar:
+
+    data/regret_model/
+        meta.json        schema_version, features, mae, training_data_sha256, ...
+        feature.npy  threshold.npy  left.npy  right.npy  value.npy  roots.npy
+        feature_importances.npy
+
+Arrays are opened with np.load(mmap_mode="r"), so every worker process maps the
+same pages from the OS page cache instead of holding a private copy of the trees.
+Memory use stays flat as replicas are added.
+
+`data/regret_model` itself is a symlink to a versioned sibling directory
+(`.regret_model-<timestamp>-<suffix>`). A retrain writes a new version and
+repoints the link with one atomic rename, so the path never goes missing and a
+reader always sees one complete version. The previous version is kept for
+readers that are still opening it; older ones are removed.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional, Sequence
+
+import numpy as np
+
+from utils.flat_forest import FlatForest
+
+SCHEMA_VERSION = 1
+META_FILE = "meta.json"
+# .npy file name → FlatForest attribute
+_ARRAYS = {
+    "feature": "feature",
+    "threshold": "threshold",
+    "left": "left",
+    "right": "right",
+    "value": "value",
+    "roots": "roots",
+    "feature_importances": "feature_importances_",
+}
+
+
+def file_sha256(path: Path, chunk_size: int = 1 << 20, limit: Optional[int] = None) -> str:
+    """Hash a (possibly large) file in chunks; with `limit`, only its first `limit` bytes."""
+    digest = hashlib.sha256()
+    remaining = limit
+    with open(path, "rb") as f:
+        while remaining is None or remaining > 0:
+            block = f.read(chunk_size if remaining is None else min(chunk_size, remaining))
+            if not block:
+                break
+            digest.update(block)
+            if remaining is not None:
+                remaining -= len(block)
+    return digest.hexdigest()
+
+
+def save_model_dir(
+    forest: FlatForest,
+    model_dir: Path,
+    features: Sequence[str],
+    mae: Optional[float] = None,
+    training_data_sha256: Optional[str] = None,
+) -> Path:
+    """
+    Write `forest` as a new version next to `model_dir` and atomically repoint
+    the `model_dir` symlink at it (see the module docstring).
+    """
+    model_dir = Path(model_dir)
+    model_dir.parent.mkdir(parents=True, exist_ok=True)
+    stamp = time.strftime("%Y%m%d%H%M%S", time.gmtime())
+    version_dir = Path(tempfile.mkdtemp(prefix=f".{model_dir.name}-{stamp}-", dir=model_dir.parent))
+    os.chmod(version_dir, 0o755)  # mkdtemp is owner-only; workers may run as other users
+    meta: Dict[str, Any] = {
+        "schema_version": SCHEMA_VERSION,
+        "features": list(features),
+        "mae": mae,
+        "training_data_sha256": training_data_sha256,
+        "n_estimators": forest.n_estimators,
+        "n_nodes": forest.n_nodes,
+        "max_depth": forest.max_depth,
+        "n_features": forest.n_features_in_,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "arrays": {},
+    }
+    try:
+        for name, attr in _ARRAYS.items():
+            arr = np.ascontiguousarray(getattr(forest, attr))
+            np.save(version_dir / f"{name}.npy", arr)
+            meta["arrays"][name] = {"dtype": str(arr.dtype), "shape": list(arr.shape)}
+        with open(version_dir / META_FILE, "w", encoding="utf-8") as f:
+            json.dump(meta, f, indent=2)
+        previous = _point_link(model_dir, version_dir)
+    except Exception:
+        shutil.rmtree(version_dir, ignore_errors=True)
+        raise
+    _remove_old_versions(model_dir, keep={version_dir.name, previous})
+    return model_dir
+
+
+def _point_link(model_dir: Path, version_dir: Path) -> Optional[str]:
+    """Atomically repoint the `model_dir` symlink at `version_dir`; returns the previous target's name."""
+    previous = os.readlink(model_dir) if model_dir.is_symlink() else None
+    if model_dir.exists() and not model_dir.is_symlink():
+        # A plain directory from an older export: move it aside once (a rename
+        # cannot replace a directory with a symlink)
+        legacy = model_dir.with_name(f".{model_dir.name}-legacy-{os.getpid()}")
+        os.replace(model_dir, legacy)
+        previous = legacy.name
+    tmp_link = model_dir.with_name(f".{model_dir.name}-link-{os.getpid()}")
+    if tmp_link.is_symlink():
+        tmp_link.unlink()
+    os.symlink(version_dir.name, tmp_link, target_is_directory=True)  # relative: data/ stays relocatable
+    os.replace(tmp_link, model_dir)
+    return previous
+
+
+def _remove_old_versions(model_dir: Path, keep: set) -> None:
+    for path in model_dir.parent.glob(f".{model_dir.name}-*"):
+        if path.name not in keep and path.is_dir() and not path.is_symlink():
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def read_meta(model_dir: Path) -> Dict[str, Any]:
+    with open(Path(model_dir) / META_FILE, encoding="utf-8") as f:
+        meta = json.load(f)
+    version = meta.get("schema_version")
+    if version != SCHEMA_VERSION:
+        raise ValueError(
+            f"{model_dir} has schema version {version}; this code reads version {SCHEMA_VERSION}. "
+            "Re-export it with:  python train_model.py"
+        )
+    return meta
+
+
+def load_model_dir(model_dir: Path, mmap: bool = True) -> Dict[str, Any]:
+    """
+    Open a model directory as a bundle dict ({"model", "features", "transformer",
+    "mae", "meta"}). With mmap=True the tree arrays are read-only memory maps.
+    """
+    from utils.features import RegretFeatureTransformer
+
+    model_dir = Path(model_dir).resolve()  # pin one version even if the link is repointed meanwhile
+    meta = read_meta(model_dir)
+    mode = "r" if mmap else None
+    arrays = {name: np.load(model_dir / f"{name}.npy", mmap_mode=mode) for name in _ARRAYS}
+    forest = FlatForest(
+        feature=arrays["feature"],
+        threshold=arrays["threshold"],
+        left=arrays["left"],
+        right=arrays["right"],
+        value=arrays["value"],
+        roots=np.asarray(arrays["roots"]),
+        max_depth=meta["max_depth"],
+        n_features=meta["n_features"],
+        feature_importances=np.asarray(arrays["feature_importances"]),
+    )
+    return {
+        "model": forest,
+        "features": meta["features"],
+        "transformer": RegretFeatureTransformer(meta["features"]),
+        "mae": meta.get("mae"),
+        "meta": meta,
+    }
@@ -0,0 +1,143 @@
+"""
+Retry policy and circuit breaker for upstream API calls.
+
+`call_with_retry` retries only errors the caller marks as retryable. It uses
+exponential backoff with full jitter and honours both a per-attempt timeout and
+an overall deadline. A shared `CircuitBreaker` stops sending traffic upstream
+after repeated failures. Callers then fail fast instead of piling more retries
+onto a struggling API.
+"""
+
+import random
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling upstream while the circuit breaker is open."""
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    max_attempts: int = 3
+    base_delay: float = 0.5  # seconds; doubled per attempt
+    max_delay: float = 4.0
+    attempt_timeout: float = 15.0  # per attempt, passed to the call
+    deadline: float = 19.0  # whole call, including backoff sleeps
+
+    def backoff(self, attempt: int, rng: Callable[[], float] = random.random) -> float:
+        """Full-jitter delay before retry number `attempt` (1-based)."""
+        return rng() * min(self.max_delay, self.base_delay * (2 ** (attempt - 1)))
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker (thread-safe).
+
+    closed → open after `failure_threshold` failures in a row. After
+    `reset_timeout` seconds one trial call is let through (half-open). The
+    circuit closes again if it succeeds and reopens if it fails.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            if time.monotonic() - self._opened_at >= self.reset_timeout:
+                return "half-open"
+            return "open"
+
+    def before_call(self) -> None:
+        with self._lock:
+            if self._opened_at is None:
+                return
+            waited = time.monotonic() - self._opened_at
+            if waited < self.reset_timeout or self._trial_in_flight:
+                raise CircuitOpenError(
+                    f"upstream circuit open after {self._failures} consecutive failures; "
+                    f"retrying in {max(self.reset_timeout - waited, 0):.0f}s"
+                )
+            self._trial_in_flight = True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def release_trial(self) -> None:
+        """End a half-open trial that never reached upstream, without scoring it."""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._trial_in_flight or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+            self._trial_in_flight = False
+
+    def stats(self) -> Dict[str, object]:
+        return {"state": self.state, "consecutive_failures": self._failures}
+
+
+def call_with_retry(
+    func: Callable[[float], T],
+    policy: RetryPolicy,
+    is_retryable: Callable[[BaseException], bool],
+    breaker: Optional[CircuitBreaker] = None,
+    sleep: Callable[[float], None] = time.sleep,
+) -> T:
+    """
+    Call `func(timeout)` until it succeeds, a non-retryable error is raised, the
+    attempts run out or the deadline passes. `timeout` is the time each attempt
+    may take: the per-attempt timeout, capped by the remaining deadline.
+    Non-retryable errors propagate immediately. One with an HTTP `status_code`
+    is an answer from upstream, so it closes the breaker rather than trips it;
+    any other (a missing API key, an import or programming error) says nothing
+    about upstream and only frees the half-open trial slot.
+    """
+    start = time.monotonic()
+    attempt = 0
+    while True:
+        attempt += 1
+        remaining = policy.deadline - (time.monotonic() - start)
+        if breaker is not None:
+            breaker.before_call()
+        try:
+            result = func(max(min(policy.attempt_timeout, remaining), 0.1))
+        except Exception as e:
+            if not is_retryable(e):
+                if breaker is not None:
+                    if getattr(e, "status_code", None) is not None:
+                        # Upstream answered (a bad request, not an outage)
+                        breaker.record_success()
+                    else:
+                        # Local failure: don't count it, but don't leave the
+                        # half-open trial hanging so later calls are refused
+                        breaker.release_trial()
+                raise
+            if breaker is not None:
+                breaker.record_failure()
+            delay = policy.backoff(attempt)
+            elapsed = time.monotonic() - start
+            if attempt >= policy.max_attempts or elapsed + delay >= policy.deadline:
+                raise
+            sleep(delay)
+            continue
+        if breaker is not None:
+            breaker.record_success()
+        return result
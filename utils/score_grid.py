@@ -0,0 +1,276 @@
+"""
+Precomputed regret-score lookup grid for the checkout sliders.
+
+Apart from the purchase size, every model input the app collects is discrete
+or bounded:
+- mood: 10 values;
+- merchant risk: 5 options;
+- FOMO toggle: 0/1;
+- sleep: a 3–11 h slider.
+
+The purchase size is indexed as relative price (price / balance), the
+feature the forest relies on most. The balance then needs no axis of its own,
+and the grid keeps working as the user's balance changes. `ScoreGrid.build`
+evaluates the model once over a quantized grid of these inputs, at a reference
+balance. Relative price is sampled log-spaced and sleep in 0.25 h steps. The
+scores are stored as one float16 array (~0.8 MB). `lookup` is then O(1): an
+exact index on the discrete axes and bilinear interpolation along sleep and
+log relative price. That is cheap enough for a live risk preview on every
+slider rerun.
+
+Like the surrogate (utils/surrogate.py), the grid records its p99 error
+against the forest as `margin`. It is measured at random balances across the
+training range, so it also covers the small effect price and balance have on
+their own. The grid also records the SHA-256 of the forest it was built from
+(FlatForest.fingerprint, as the surrogate does), so `load_score_grid` skips a
+stale grid.
+
+Usage (rebuild from the current model artifacts without retraining):
+    python -m utils.score_grid
+"""
+
+import bisect
+import json
+import math
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from utils.features import DEFAULT_ACCOUNT_BALANCE, MIN_ACCOUNT_BALANCE, RegretFeatureTransformer
+from utils.model_loader import BASE_DIR, predict_array
+from utils.surrogate import band, forest_fingerprint, near_edge
+
+GRID_PATH = Path("data/regret_grid.npz")
+MOOD_VALUES = np.arange(1, 11, dtype=np.float64)
+RISK_VALUES = np.array([0.05, 0.15, 0.25, 0.30, 0.55])  # the app's merchant risk options
+FOMO_VALUES = np.array([0.0, 1.0])
+SLEEP_VALUES = np.linspace(3.0, 11.0, 33)  # 0.25 h steps over the slider range
+REL_PRICE_VALUES = np.geomspace(1e-4, 20.0, 128)  # price / balance; training data spans ~0.002–14
+EVAL_BALANCE_RANGE = (100.0, 6000.0)  # balances the fidelity check samples (the training range)
+_AXES = ("mood_score", "merchant_risk_score", "is_limited_offer", "sleep_hours", "relative_price")
+
+
+def _exact_index(values: np.ndarray, x: np.ndarray) -> np.ndarray:
+    """Index of each x on a discrete axis, -1 where x is not one of the grid values."""
+    idx = np.clip(np.searchsorted(values, x - 1e-9), 0, len(values) - 1)
+    return np.where(np.isclose(values[idx], x), idx, -1)
+
+
+def _bracket(values: np.ndarray, x: np.ndarray):
+    """Lower cell index and interpolation weight of each x on a continuous axis (NaN weight outside)."""
+    i = np.clip(np.searchsorted(values, x, side="right") - 1, 0, len(values) - 2)
+    t = (x - values[i]) / (values[i + 1] - values[i])
+    inside = (x >= values[0]) & (x <= values[-1])
+    return i, np.where(inside, t, np.nan)
+
+
+def _list_index(values: List[float], x: float) -> Optional[int]:
+    i = bisect.bisect_left(values, x - 1e-9)
+    return i if i < len(values) and abs(values[i] - x) <= 1e-9 else None
+
+
+def _list_bracket(values: List[float], x: float) -> Optional[Tuple[int, float]]:
+    if not values[0] <= x <= values[-1]:
+        return None
+    i = min(bisect.bisect_right(values, x) - 1, len(values) - 2)
+    return i, (x - values[i]) / (values[i + 1] - values[i])
+
+
+def _relative_price(price: Any, account_balance: Any) -> Any:
+    return price / np.maximum(account_balance, MIN_ACCOUNT_BALANCE)
+
+
+class ScoreGrid:
+    """Model scores over (mood, risk, fomo, sleep, relative price), built at a reference balance."""
+
+    def __init__(
+        self,
+        scores: np.ndarray,
+        mood_values: np.ndarray = MOOD_VALUES,
+        risk_values: np.ndarray = RISK_VALUES,
+        fomo_values: np.ndarray = FOMO_VALUES,
+        sleep_values: np.ndarray = SLEEP_VALUES,
+        rel_price_values: np.ndarray = REL_PRICE_VALUES,
+        account_balance: float = DEFAULT_ACCOUNT_BALANCE,
+        meta: Optional[Dict[str, Any]] = None,
+    ):
+        self.scores = scores
+        self.mood_values = np.asarray(mood_values, dtype=np.float64)
+        self.risk_values = np.asarray(risk_values, dtype=np.float64)
+        self.fomo_values = np.asarray(fomo_values, dtype=np.float64)
+        self.sleep_values = np.asarray(sleep_values, dtype=np.float64)
+        self.rel_price_values = np.asarray(rel_price_values, dtype=np.float64)
+        self._log_rel_price = np.log(self.rel_price_values)
+        self.account_balance = float(account_balance)  # reference balance the scores were computed at
+        self.meta: Dict[str, Any] = dict(meta or {})
+        # Axis values as Python lists for the scalar lookup path
+        self._axes = [a.tolist() for a in (self.mood_values, self.risk_values, self.fomo_values, self.sleep_values, self._log_rel_price)]
+
+    @classmethod
+    def build(cls, model: Any, features: Any, account_balance: float = DEFAULT_ACCOUNT_BALANCE) -> "ScoreGrid":
+        """Evaluate `model` on every grid point (one batched predict) at `account_balance`."""
+        mesh = np.meshgrid(MOOD_VALUES, RISK_VALUES, FOMO_VALUES, SLEEP_VALUES, REL_PRICE_VALUES, indexing="ij")
+        columns = {name: axis.ravel() for name, axis in zip(_AXES, mesh)}
+        columns["account_balance"] = np.full(mesh[0].size, account_balance)
+        columns["price"] = columns.pop("relative_price") * account_balance
+        X = RegretFeatureTransformer(features).transform(columns)
+        scores = predict_array(model, X).reshape(mesh[0].shape).astype(np.float16)
+        return cls(scores, account_balance=account_balance, meta={"features": list(features)})
+
+    def lookup_many(
+        self,
+        price: Any,
+        mood_score: Any,
+        is_limited_offer: Any,
+        sleep_hours: Any,
+        merchant_risk_score: Any,
+        account_balance: Any = DEFAULT_ACCOUNT_BALANCE,
+    ) -> np.ndarray:
+        """Vectorized lookup; NaN for inputs the grid does not cover."""
+        price, mood, fomo, sleep, risk, balance = np.broadcast_arrays(
+            *(np.asarray(v, dtype=np.float64) for v in (price, mood_score, is_limited_offer, sleep_hours, merchant_risk_score, account_balance))
+        )
+        m, r, f = _exact_index(self.mood_values, mood), _exact_index(self.risk_values, risk), _exact_index(self.fomo_values, fomo)
+        s, ts = _bracket(self.sleep_values, sleep)
+        p, tp = _bracket(self._log_rel_price, np.log(np.maximum(_relative_price(price, balance), 1e-12)))
+        covered = (m >= 0) & (r >= 0) & (f >= 0) & ~np.isnan(ts) & ~np.isnan(tp)
+        m, r, f = np.maximum(m, 0), np.maximum(r, 0), np.maximum(f, 0)
+        ts, tp = np.nan_to_num(ts), np.nan_to_num(tp)
+        g = self.scores
+        value = (
+            (1 - ts) * (1 - tp) * g[m, r, f, s, p].astype(np.float64)
+            + (1 - ts) * tp * g[m, r, f, s, p + 1]
+            + ts * (1 - tp) * g[m, r, f, s + 1, p]
+            + ts * tp * g[m, r, f, s + 1, p + 1]
+        )
+        return np.where(covered, value, np.nan)
+
+    def lookup(
+        self,
+        price: float,
+        mood_score: float,
+        is_limited_offer: float,
+        sleep_hours: float,
+        merchant_risk_score: float,
+        account_balance: float = DEFAULT_ACCOUNT_BALANCE,
+    ) -> Optional[float]:
+        """
+        Score for one set of slider values, or None if it is off the grid. Plain
+        Python on purpose: for a single point NumPy's per-call overhead dominates.
+        """
+        m = _list_index(self._axes[0], mood_score)
+        r = _list_index(self._axes[1], merchant_risk_score)
+        f = _list_index(self._axes[2], float(is_limited_offer))
+        sleep_cell = _list_bracket(self._axes[3], sleep_hours)
+        rel_price = price / max(account_balance, MIN_ACCOUNT_BALANCE)
+        price_cell = _list_bracket(self._axes[4], math.log(rel_price)) if rel_price > 0 else None
+        if m is None or r is None or f is None or sleep_cell is None or price_cell is None:
+            return None
+        (s, ts), (p, tp) = sleep_cell, price_cell
+        g = self.scores[m, r, f]
+        # float() first: arithmetic on float16 scalars would round every step
+        g00, g01, g10, g11 = float(g[s, p]), float(g[s, p + 1]), float(g[s + 1, p]), float(g[s + 1, p + 1])
+        return (1 - ts) * ((1 - tp) * g00 + tp * g01) + ts * ((1 - tp) * g10 + tp * g11)
+
+    def evaluate(self, model: Any, features: Any, n_samples: int = 5000, seed: int = 0) -> Dict[str, float]:
+        """Fidelity against `model` at random off-grid points and balances; sets meta["margin"] (p99 error)."""
+        rng = np.random.default_rng(seed)
+        balance = np.exp(rng.uniform(*np.log(EVAL_BALANCE_RANGE), n_samples))
+        inputs = {
+            "price": np.exp(rng.uniform(self._log_rel_price[0], self._log_rel_price[-1], n_samples)) * balance,
+            "mood_score": rng.choice(self.mood_values, n_samples),
+            "is_limited_offer": rng.choice(self.fomo_values, n_samples),
+            "sleep_hours": rng.uniform(self.sleep_values[0], self.sleep_values[-1], n_samples),
+            "merchant_risk_score": rng.choice(self.risk_values, n_samples),
+            "account_balance": balance,
+        }
+        truth = predict_array(model, RegretFeatureTransformer(features).transform(inputs))
+        approx = self.lookup_many(**inputs)
+        abs_err = np.abs(approx - truth)
+        margin = float(np.quantile(abs_err, 0.99))
+        guarded = np.where(near_edge(approx, margin), truth, approx)
+        fidelity = {
+            "margin": margin,
+            "mae_vs_forest": float(abs_err.mean()),
+            "max_abs_error": float(abs_err.max()),
+            "band_agreement": float(np.mean(band(approx) == band(truth))),
+            "guarded_band_agreement": float(np.mean(band(guarded) == band(truth))),
+            "forest_fallback_rate": float(np.mean(near_edge(approx, margin))),
+            "eval_points": n_samples,
+        }
+        self.meta.update(fidelity)
+        return fidelity
+
+    def save(self, path: Path = GRID_PATH, teacher: Any = None) -> None:
+        meta = dict(self.meta, created_at=time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()))
+        if teacher is not None:
+            meta["teacher_sha256"] = forest_fingerprint(teacher)
+        np.savez_compressed(
+            path,
+            scores=self.scores,
+            mood_values=self.mood_values,
+            risk_values=self.risk_values,
+            fomo_values=self.fomo_values,
+            sleep_values=self.sleep_values,
+            rel_price_values=self.rel_price_values,
+            account_balance=np.float64(self.account_balance),
+            meta=np.asarray(json.dumps(meta)),
+        )
+
+    @classmethod
+    def load(cls, path: Path = GRID_PATH) -> "ScoreGrid":
+        with np.load(path) as data:
+            return cls(
+                scores=data["scores"],
+                mood_values=data["mood_values"],
+                risk_values=data["risk_values"],
+                fomo_values=data["fomo_values"],
+                sleep_values=data["sleep_values"],
+                rel_price_values=data["rel_price_values"],
+                account_balance=float(data["account_balance"]),
+                meta=json.loads(str(data["meta"])),
+            )
+
+
+def load_score_grid(bundle: Dict[str, Any], base_dir: Optional[Path] = None) -> Optional[ScoreGrid]:
+    """The grid built from `bundle["model"]`, or None if there is none (or it is stale)."""
+    path = (Path(base_dir) if base_dir is not None else BASE_DIR) / GRID_PATH
+    if not path.exists():
+        return None
+    try:
+        grid = ScoreGrid.load(path)
+        if grid.meta.get("features") != list(bundle["features"]) or "margin" not in grid.meta:
+            return None
+        if grid.meta.get("teacher_sha256") != forest_fingerprint(bundle["model"]):
+            return None
+    except Exception:
+        return None
+    return grid
+
+
+def build_and_save(model: Any, features: Any, path: Path = GRID_PATH) -> ScoreGrid:
+    grid = ScoreGrid.build(model, features)
+    grid.evaluate(model, features)
+    grid.save(path, teacher=model)
+    return grid
+
+
+def main() -> None:
+    from utils.model_loader import load_model_bundle
+
+    bundle = load_model_bundle()
+    started = time.perf_counter()
+    grid = build_and_save(bundle["model"], bundle["features"], BASE_DIR / GRID_PATH)
+    m = grid.meta
+    print(
+        f"Success: {grid.scores.size} grid scores from {bundle.get('source')} in {time.perf_counter() - started:.1f}s "
+        f"written to {GRID_PATH}. Fidelity: MAE vs forest {m['mae_vs_forest']:.2f}, band agreement "
+        f"{m['band_agreement']:.1%} ({m['guarded_band_agreement']:.1%} with the forest used within "
+        f"{m['margin']:.1f} of a band edge, {m['forest_fallback_rate']:.0%} of lookups)"
+    )
+
+
+if __name__ == "__main__":
+    main()
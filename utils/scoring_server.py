@@ -0,0 +1,262 @@
+"""
+Low-latency HTTP/JSON scoring service with micro-batching.
+
+Concurrent single-transaction requests are collected for up to `max_wait_ms`
+(or until `max_batch_size` rows are waiting) and scored together with one
+`model.predict` call, so the per-call overhead of scikit-learn is paid once per
+batch instead of once per payment. Only the standard library's asyncio is used.
+
+Endpoints:
+    POST /score     {"price": 59.99, "mood_score": 5, "sleep_hours": 7,
+                     "is_limited_offer": 0, "merchant_risk_score": 0.25,
+                     "account_balance": 2840.50}   → {"regret_score": 14.2}
+    GET  /metrics   latency percentiles (p50/p99) and the batch-size histogram
+    GET  /healthz   liveness check
+
+Usage:
+    python -m utils.scoring_server --port 8502 --max-wait-ms 2
+"""
+
+import argparse
+import asyncio
+import json
+import time
+from collections import Counter, deque
+from pathlib import Path
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from utils.features import get_transformer
+from utils.model_loader import DEFAULT_BUNDLE_PATH, load_bundle, predict_array
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8502
+MAX_BODY_BYTES = 64 * 1024
+
+_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 413: "Payload Too Large", 500: "Internal Server Error"}
+
+
+class ScoringStats:
+    """Rolling request latencies and a power-of-two histogram of batch sizes."""
+
+    def __init__(self, window: int = 10_000):
+        self.latencies_ms: Deque[float] = deque(maxlen=window)
+        self.batch_sizes: Counter = Counter()
+        self.requests = 0
+        self.batches = 0
+
+    def record_batch(self, size: int) -> None:
+        self.batches += 1
+        bucket = 1
+        while bucket < size:
+            bucket *= 2
+        self.batch_sizes[bucket] += 1
+
+    def record_latency(self, ms: float) -> None:
+        self.requests += 1
+        self.latencies_ms.append(ms)
+
+    def snapshot(self) -> Dict[str, object]:
+        lat = np.fromiter(self.latencies_ms, dtype=np.float64)
+        p50, p99 = (np.percentile(lat, [50, 99]).tolist() if lat.size else (None, None))
+        return {
+            "requests": self.requests,
+            "batches": self.batches,
+            "mean_batch_size": (self.requests / self.batches) if self.batches else None,
+            "latency_ms": {"p50": p50, "p99": p99, "window": int(lat.size)},
+            "batch_size_histogram": {f"<={k}": v for k, v in sorted(self.batch_sizes.items())},
+        }
+
+
+class MicroBatcher:
+    """Queue single rows and score them in batches on a worker thread."""
+
+    def __init__(
+        self,
+        bundle: Dict[str, Any],
+        max_wait_ms: float = 2.0,
+        max_batch_size: int = 256,
+        stats: Optional[ScoringStats] = None,
+    ):
+        self.model = bundle["model"]
+        self.transformer = get_transformer(bundle)
+        self.max_wait = max_wait_ms / 1000.0
+        self.max_batch_size = max_batch_size
+        self.stats = stats or ScoringStats()
+        self._queue: "asyncio.Queue[Tuple[np.ndarray, asyncio.Future]]" = asyncio.Queue()
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def score(self, payload: Dict[str, Any]) -> float:
+        row = self.transformer.transform_row(**payload)
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((row, future))
+        return await future
+
+    async def _collect(self) -> List[Tuple[np.ndarray, asyncio.Future]]:
+        batch = [await self._queue.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - time.perf_counter()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect()
+            X = np.vstack([row for row, _ in batch])
+            try:
+                # predict releases the GIL for most of its work; keep the event loop free meanwhile
+                scores = await loop.run_in_executor(None, predict_array, self.model, X)
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            self.stats.record_batch(len(batch))
+            for (_, future), score in zip(batch, scores):
+                if not future.done():
+                    future.set_result(float(score))
+
+
+def _response(status: int, body: Dict[str, object], keep_alive: bool) -> bytes:
+    payload = json.dumps(body).encode("utf-8")
+    head = (
+        f"HTTP/1.1 {status} {_REASONS.get(status, '')}\r\n"
+        "Content-Type: application/json\r\n"
+        f"Content-Length: {len(payload)}\r\n"
+        f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+    )
+    return head.encode("latin-1") + payload
+
+
+async def _read_request(reader: asyncio.StreamReader) -> Optional[Tuple[str, str, Dict[str, str], bytes]]:
+    request_line = await reader.readline()
+    if not request_line:
+        return None
+    parts = request_line.decode("latin-1").split()
+    if len(parts) < 2:
+        raise ValueError("Malformed request line")
+    method, path = parts[0].upper(), parts[1]
+    headers: Dict[str, str] = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    length = int(headers.get("content-length", "0") or 0)
+    if length > MAX_BODY_BYTES:
+        raise OverflowError("Request body too large")
+    body = await reader.readexactly(length) if length else b""
+    return method, path, headers, body
+
+
+class ScoringServer:
+    """asyncio HTTP front end for a MicroBatcher."""
+
+    def __init__(self, batcher: MicroBatcher):
+        self.batcher = batcher
+
+    async def _dispatch(self, method: str, path: str, body: bytes) -> Tuple[int, Dict[str, object]]:
+        if path == "/healthz":
+            return 200, {"status": "ok"}
+        if path == "/metrics":
+            return 200, self.batcher.stats.snapshot()
+        if path != "/score":
+            return 404, {"error": f"Unknown path {path}"}
+        if method != "POST":
+            return 405, {"error": "Use POST /score"}
+        start = time.perf_counter()
+        try:
+            payload = json.loads(body or b"{}")
+            if not isinstance(payload, dict):
+                raise ValueError("Body must be a JSON object")
+            score = await self.batcher.score(payload)
+        except (ValueError, KeyError, TypeError) as e:
+            return 400, {"error": str(e)}
+        except Exception as e:  # a scoring failure must not drop the connection without a response
+            return 500, {"error": f"{type(e).__name__}: {e}"}
+        self.batcher.stats.record_latency((time.perf_counter() - start) * 1000.0)
+        return 200, {"regret_score": score}
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                try:
+                    request = await _read_request(reader)
+                except OverflowError as e:
+                    writer.write(_response(413, {"error": str(e)}, keep_alive=False))
+                    break
+                except (ValueError, asyncio.IncompleteReadError) as e:
+                    writer.write(_response(400, {"error": str(e)}, keep_alive=False))
+                    break
+                if request is None:
+                    break
+                method, path, headers, body = request
+                keep_alive = headers.get("connection", "keep-alive").lower() != "close"
+                status, result = await self._dispatch(method, path, body)
+                writer.write(_response(status, result, keep_alive))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+
+async def serve(
+    host: str = DEFAULT_HOST,
+    port: int = DEFAULT_PORT,
+    bundle_path: Path = DEFAULT_BUNDLE_PATH,
+    max_wait_ms: float = 2.0,
+    max_batch_size: int = 256,
+) -> None:
+    """Load the bundle and serve until cancelled."""
+    batcher = MicroBatcher(load_bundle(bundle_path), max_wait_ms, max_batch_size)
+    batcher.start()
+    server = await asyncio.start_server(ScoringServer(batcher).handle, host, port)
+    print(f"Regret Guard scoring server listening on http://{host}:{port} (max_wait_ms={max_wait_ms}, max_batch_size={max_batch_size})")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await batcher.stop()
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Serve Regret Guard scores over HTTP with micro-batching.")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--bundle", type=Path, default=DEFAULT_BUNDLE_PATH)
+    parser.add_argument("--max-wait-ms", type=float, default=2.0, help="How long to hold a batch open for more rows")
+    parser.add_argument("--max-batch-size", type=int, default=256)
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(serve(args.host, args.port, args.bundle, args.max_wait_ms, args.max_batch_size))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+Distilled surrogate for the instant first score.
+
+`distill` fits one shallow regression tree to the forest's own predictions
+(not to the labels). The tree is exported as a single-tree FlatForest, so
+scoring it needs no sklearn and walks one tree instead of hundreds.
+Most checkouts land well inside a risk band (0–20 / 20–40 / >40). For those, the
+surrogate's score is enough. Only when it falls within `margin` of a band edge
+does `guarded_predict` ask the full forest. `margin` is the 99th percentile of
+|surrogate − forest| on held-out calibration rows.
+
+The fidelity metrics and the identity of the forest the surrogate was distilled
+from (a SHA-256 of its node arrays) are stored in the .npz metadata. `load_surrogate` ignores a surrogate
+that belongs to a different forest (e.g. after a retrain without distillation).
+"""
+
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+from utils.flat_forest import FlatForest, load_flat_bundle
+from utils.model_loader import BASE_DIR, predict_array
+
+SURROGATE_PATH = Path("data/regret_surrogate.npz")
+BAND_EDGES = (20.0, 40.0)  # same bands as the evaluator screen
+
+
+def forest_fingerprint(model: Any) -> str:
+    """FlatForest.fingerprint of a FlatForest or a fitted sklearn forest (identifies the teacher)."""
+    if not isinstance(model, FlatForest):
+        model = FlatForest.from_sklearn(model)
+    return model.fingerprint()
+
+
+def band(score: np.ndarray) -> np.ndarray:
+    """Risk band index per score: 0 = low, 1 = medium, 2 = high."""
+    return np.searchsorted(BAND_EDGES, score, side="left")
+
+
+def near_edge(score: np.ndarray, margin: float) -> np.ndarray:
+    return np.min(np.abs(np.subtract.outer(np.atleast_1d(score), BAND_EDGES)), axis=1) <= margin
+
+
+def distill(
+    model: Any,
+    X_fit: np.ndarray,
+    X_eval: np.ndarray,
+    max_depth: int = 10,
+    min_samples_leaf: int = 5,
+) -> Tuple[FlatForest, Dict[str, float]]:
+    """
+    Fit the surrogate on the forest's predictions for `X_fit`. The first half of
+    `X_eval` calibrates the margin; fidelity to the forest is measured on the
+    second half.
+    """
+    from sklearn.tree import DecisionTreeRegressor
+
+    tree = DecisionTreeRegressor(max_depth=max_depth, min_samples_leaf=min_samples_leaf, random_state=42)
+    tree.fit(X_fit, predict_array(model, X_fit))
+    surrogate = FlatForest.from_sklearn(tree)
+
+    X_calib, X_eval = X_eval[: len(X_eval) // 2], X_eval[len(X_eval) // 2 :]
+    margin = float(np.quantile(np.abs(surrogate.predict(X_calib) - predict_array(model, X_calib)), 0.99))
+    teacher = predict_array(model, X_eval)
+    student = surrogate.predict(X_eval)
+    abs_err = np.abs(student - teacher)
+    guarded = np.where(near_edge(student, margin), teacher, student)
+    fidelity = {
+        "mae_vs_forest": float(abs_err.mean()),
+        "p99_abs_error": float(np.quantile(abs_err, 0.99)),
+        "band_agreement": float(np.mean(band(student) == band(teacher))),
+        # What the app actually shows: surrogate away from the edges, forest near them
+        "guarded_band_agreement": float(np.mean(band(guarded) == band(teacher))),
+        "forest_fallback_rate": float(np.mean(near_edge(student, margin))),
+        "eval_rows": int(len(X_eval)),
+    }
+    return surrogate, {"margin": margin, "max_depth": max_depth, "n_leaves": int(tree.get_n_leaves()), **fidelity}
+
+
+def save_surrogate(
+    surrogate: FlatForest,
+    features: Any,
+    fidelity: Dict[str, float],
+    teacher: Any,
+    path: Path = SURROGATE_PATH,
+) -> None:
+    surrogate.save(path, features=features, meta={**fidelity, "teacher_sha256": forest_fingerprint(teacher)})
+
+
+def load_surrogate(bundle: Dict[str, Any], base_dir: Optional[Path] = None) -> Optional[Dict[str, Any]]:
+    """The surrogate distilled from `bundle["model"]`, or None if there is none (or it is stale)."""
+    path = (Path(base_dir) if base_dir is not None else BASE_DIR) / SURROGATE_PATH
+    if not path.exists():
+        return None
+    try:
+        surrogate = load_flat_bundle(path)
+    except Exception:
+        return None
+    meta = surrogate.get("meta") or {}
+    if surrogate["features"] != list(bundle["features"]) or "margin" not in meta:
+        return None
+    try:
+        if meta.get("teacher_sha256") != forest_fingerprint(bundle["model"]):
+            return None
+    except AttributeError:
+        return None
+    return surrogate
+
+
+def guarded_predict(bundle: Dict[str, Any], X: np.ndarray) -> Tuple[float, bool]:
+    """
+    Score one row: the surrogate when it is clearly inside a band, the full
+    forest near a band edge (or without a surrogate). Returns (score, used_forest).
+    """
+    surrogate = bundle.get("surrogate")
+    if surrogate is not None:
+        score = float(surrogate["model"].predict(X)[0])
+        if not near_edge(score, surrogate["meta"]["margin"])[0]:
+            return score, False
+    return float(predict_array(bundle["model"], X)[0]), True
@@ -0,0 +1,236 @@
+"""
+Span-level latency tracing for the checkout path.
+
+    with span("llm.generate", model=...) as s:
+        ...
+        s.set(prompt_tokens=..., response_tokens=..., cache_hit=False)
+
+Every finished span is aggregated into Prometheus-style histograms and counters
+(`prometheus_text`). It is also kept in a short in-memory ring for the app's
+debug panel (`trace_spans`). Spans opened while a trace is active (`new_trace`)
+share its trace id. Work handed to threads keeps it via contextvars
+(`asyncio.to_thread`, or `contextvars.copy_context().run` for executors).
+
+Configuration (environment):
+    REGRET_GUARD_TRACING=0                 disable (spans become no-ops)
+    REGRET_GUARD_TRACE_FILE=path.jsonl     append every finished span as one JSON line
+    REGRET_GUARD_PROM_FILE=path.prom       keep a Prometheus textfile-collector file up to date
+"""
+
+import contextvars
+import functools
+import json
+import os
+import re
+import threading
+import time
+import uuid
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional, TypeVar
+
+# Histogram bucket upper bounds in seconds (Prometheus "le" labels)
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+_PROM_WRITE_INTERVAL_S = 1.0
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+F = TypeVar("F", bound=Callable[..., Any])
+
+_TRACE_ID: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("regret_guard_trace_id", default=None)
+_PARENT: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar("regret_guard_span", default=None)
+
+
+def approx_tokens(text: str) -> int:
+    """Rough token count (words and punctuation); the backends do not report usage."""
+    return len(_TOKEN_RE.findall(text or ""))
+
+
+def _enabled() -> bool:
+    return os.getenv("REGRET_GUARD_TRACING", "1").strip().lower() not in ("0", "false", "no", "off")
+
+
+class Span:
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "start", "duration_ms", "attrs", "error")
+
+    def __init__(self, name: str, attrs: Dict[str, Any]):
+        parent = _PARENT.get()
+        self.name = name
+        self.trace_id = _TRACE_ID.get()
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent.span_id if parent is not None else None
+        self.start = time.time()
+        self.duration_ms = 0.0
+        self.attrs = dict(attrs)
+        self.error: Optional[str] = None
+
+    def set(self, **attrs: Any) -> None:
+        self.attrs.update(attrs)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start": self.start,
+            "duration_ms": round(self.duration_ms, 3),
+            "error": self.error,
+            **self.attrs,
+        }
+
+
+class _NullSpan:
+    def set(self, **attrs: Any) -> None:
+        pass
+
+
+class Tracer:
+    """Aggregates finished spans (thread-safe)."""
+
+    def __init__(self, recent: int = 2000):
+        self._lock = threading.Lock()
+        self.recent: Deque[Span] = deque(maxlen=recent)
+        self._buckets: Dict[str, List[int]] = defaultdict(lambda: [0] * len(BUCKETS))
+        self._count: Dict[str, int] = defaultdict(int)
+        self._sum: Dict[str, float] = defaultdict(float)
+        self._errors: Dict[str, int] = defaultdict(int)
+        self._tokens: Dict[tuple, int] = defaultdict(int)
+        self._cache: Dict[tuple, int] = defaultdict(int)
+        self._last_prom_write = 0.0
+
+    def record(self, s: Span) -> None:
+        seconds = s.duration_ms / 1000.0
+        with self._lock:
+            self.recent.append(s)
+            buckets = self._buckets[s.name]
+            for i, bound in enumerate(BUCKETS):
+                if seconds <= bound:
+                    buckets[i] += 1
+            self._count[s.name] += 1
+            self._sum[s.name] += seconds
+            if s.error:
+                self._errors[s.name] += 1
+            for kind in ("prompt", "response"):
+                if f"{kind}_tokens" in s.attrs:
+                    self._tokens[(s.name, kind)] += int(s.attrs[f"{kind}_tokens"])
+            if "cache_hit" in s.attrs:
+                self._cache[(s.name, "hit" if s.attrs["cache_hit"] else "miss")] += 1
+        self._export(s)
+
+    def _export(self, s: Span) -> None:
+        trace_file = os.getenv("REGRET_GUARD_TRACE_FILE")
+        prom_file = os.getenv("REGRET_GUARD_PROM_FILE")
+        with self._lock:
+            if trace_file:
+                try:
+                    with open(trace_file, "a", encoding="utf-8") as f:
+                        f.write(json.dumps(s.to_dict(), default=str) + "\n")
+                except OSError:
+                    pass
+            due = prom_file and time.monotonic() - self._last_prom_write >= _PROM_WRITE_INTERVAL_S
+            if due:
+                self._last_prom_write = time.monotonic()
+        if due:
+            self.write_prometheus(Path(prom_file))
+
+    def prometheus_text(self) -> str:
+        lines = [
+            "# HELP regret_guard_span_duration_seconds Duration of instrumented checkout steps.",
+            "# TYPE regret_guard_span_duration_seconds histogram",
+        ]
+        with self._lock:
+            for name in sorted(self._count):
+                for bound, n in zip(BUCKETS, self._buckets[name]):
+                    lines.append(f'regret_guard_span_duration_seconds_bucket{{span="{name}",le="{bound}"}} {n}')
+                lines.append(f'regret_guard_span_duration_seconds_bucket{{span="{name}",le="+Inf"}} {self._count[name]}')
+                lines.append(f'regret_guard_span_duration_seconds_sum{{span="{name}"}} {self._sum[name]:.6f}')
+                lines.append(f'regret_guard_span_duration_seconds_count{{span="{name}"}} {self._count[name]}')
+            lines += ["# HELP regret_guard_span_errors_total Spans that ended with an exception.",
+                      "# TYPE regret_guard_span_errors_total counter"]
+            lines += [f'regret_guard_span_errors_total{{span="{n}"}} {v}' for n, v in sorted(self._errors.items())]
+            lines += ["# HELP regret_guard_llm_tokens_total Approximate prompt/response tokens.",
+                      "# TYPE regret_guard_llm_tokens_total counter"]
+            lines += [
+                f'regret_guard_llm_tokens_total{{span="{n}",kind="{k}"}} {v}' for (n, k), v in sorted(self._tokens.items())
+            ]
+            lines += ["# HELP regret_guard_cache_lookups_total Cache lookups by result.",
+                      "# TYPE regret_guard_cache_lookups_total counter"]
+            lines += [
+                f'regret_guard_cache_lookups_total{{span="{n}",result="{r}"}} {v}' for (n, r), v in sorted(self._cache.items())
+            ]
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path: Path) -> None:
+        """Atomically rewrite `path` (node_exporter textfile-collector format)."""
+        tmp = Path(f"{path}.{os.getpid()}.tmp")
+        try:
+            tmp.write_text(self.prometheus_text(), encoding="utf-8")
+            os.replace(tmp, path)
+        except OSError:
+            pass
+
+    def trace_spans(self, trace_id: str) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [s.to_dict() for s in self.recent if s.trace_id == trace_id]
+
+
+TRACER = Tracer()
+
+
+def new_trace() -> str:
+    """Start a trace in the current context; spans opened from here on share its id."""
+    trace_id = uuid.uuid4().hex
+    _TRACE_ID.set(trace_id)
+    return trace_id
+
+
+@contextmanager
+def span(name: str, **attrs: Any) -> Iterator[Any]:
+    """Time the enclosed block as one span; exceptions are recorded and re-raised."""
+    if not _enabled():
+        yield _NullSpan()
+        return
+    s = Span(name, attrs)
+    token = _PARENT.set(s)
+    start = time.perf_counter()
+    try:
+        yield s
+    except BaseException as e:
+        s.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        s.duration_ms = (time.perf_counter() - start) * 1000.0
+        _PARENT.reset(token)
+        TRACER.record(s)
+
+
+def traced(name: str) -> Callable[[F], F]:
+    """Decorator form of `span` for functions with many return paths."""
+
+    def decorate(func: F) -> F:
+        @functools.wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            with span(name):
+                return func(*args, **kwargs)
+
+        return wrapper  # type: ignore[return-value]
+
+    return decorate
+
+
+def record_span(name: str, duration_ms: float, error: Optional[str] = None, **attrs: Any) -> None:
+    """Record an already-timed span (for work that cannot sit in a `with` block, e.g. a generator)."""
+    if not _enabled():
+        return
+    s = Span(name, attrs)
+    s.duration_ms = duration_ms
+    s.error = error
+    TRACER.record(s)
+
+
+def prometheus_text() -> str:
+    return TRACER.prometheus_text()
+
+
+def trace_spans(trace_id: str) -> List[Dict[str, Any]]:
+    return TRACER.trace_spans(trace_id)
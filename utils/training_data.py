@@ -0,0 +1,87 @@
+"""
+Engineered training matrix with an on-disk cache.
+
+Parsing the transaction CSV and building features dominates retrain time once
+the forest is trained in parallel. `load_training_matrix` stores X and y as
+uncompressed .npy arrays under data/.cache/features/. Entries are keyed by the
+CSV's sha256 and the feature list, so a retrain on unchanged data skips both
+steps. Any change to the file, appends included, builds a new entry.
+"""
+
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Optional, Sequence, Tuple
+
+import numpy as np
+
+from utils.features import BASE_FEATURES, COLUMN_ALIASES, RegretFeatureTransformer
+from utils.model_store import file_sha256
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+CACHE_DIR = BASE_DIR / "data" / ".cache" / "features"
+TARGET = "regret_score"
+_KEEP_ENTRIES = 3  # older matrices (previous CSV versions) are pruned
+
+
+def _cache_key(csv_sha256: str, features: Sequence[str]) -> str:
+    feature_hash = hashlib.sha256(json.dumps(list(features)).encode("utf-8")).hexdigest()[:12]
+    return f"{csv_sha256[:24]}-{feature_hash}"
+
+
+def _read_and_transform(csv_path: Path, transformer: RegretFeatureTransformer) -> Tuple[np.ndarray, np.ndarray]:
+    import pandas as pd
+
+    wanted = set(BASE_FEATURES) | set(COLUMN_ALIASES) | {TARGET}
+    # Precomputed relative_price/impulsivity_index columns are recomputed by the transformer; skip parsing them
+    df = pd.read_csv(csv_path, usecols=lambda c: c in wanted)
+    X = transformer.transform(df)
+    y = df[TARGET].to_numpy(dtype=np.float64)
+    return X, y
+
+
+def _prune(cache_dir: Path) -> None:
+    entries = sorted(cache_dir.glob("*.X.npy"), key=lambda p: p.stat().st_mtime, reverse=True)
+    for stale in entries[_KEEP_ENTRIES:]:
+        stem = stale.name[: -len(".X.npy")]
+        for suffix in (".X.npy", ".y.npy"):
+            (cache_dir / f"{stem}{suffix}").unlink(missing_ok=True)
+
+
+def load_training_matrix(
+    csv_path: Path,
+    features: Sequence[str],
+    csv_sha256: Optional[str] = None,
+    cache_dir: Optional[Path] = CACHE_DIR,
+) -> Tuple[np.ndarray, np.ndarray, bool]:
+    """
+    (X, y, cache_hit) for the transactions in `csv_path`. Pass `csv_sha256` if
+    the caller already hashed the file; `cache_dir=None` disables the cache.
+    """
+    transformer = RegretFeatureTransformer(features)
+    if cache_dir is None:
+        X, y = _read_and_transform(Path(csv_path), transformer)
+        return X, y, False
+
+    cache_dir = Path(cache_dir)
+    key = _cache_key(csv_sha256 or file_sha256(Path(csv_path)), transformer.features)
+    x_path, y_path = cache_dir / f"{key}.X.npy", cache_dir / f"{key}.y.npy"
+    if x_path.exists() and y_path.exists():
+        try:
+            return np.load(x_path), np.load(y_path), True
+        except (OSError, ValueError):
+            pass  # unreadable entry: rebuild below
+
+    X, y = _read_and_transform(Path(csv_path), transformer)
+    try:
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        for path, arr in ((y_path, y), (x_path, X)):  # X last: its presence marks a complete entry
+            tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+            with open(tmp, "wb") as f:
+                np.save(f, arr)
+            os.replace(tmp, path)
+        _prune(cache_dir)
+    except OSError:
+        pass  # read-only checkout: train without caching
+    return X, y, False